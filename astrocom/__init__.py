@@ -2,6 +2,11 @@
 SynScan Python library to communicate with telescope mounts
 """
 
+import os
+
+### DEFINE CACHE DIRECTORY
+CACHE_DIR = os.environ.get('ASTROCOM_CACHE', os.path.join(os.path.expanduser('~'), '.astrocom'))
+
 ### DEFINE COLORS
 class COLORS:
 	GREEN = "\x1b[32;20m"
@@ -12,7 +17,12 @@ class COLORS:
 	RESET = '\033[0m'
 
 ### DEFINE LOGGER and EXCEPTION
+import json
+import queue
+import atexit
+import threading
 import logging
+import logging.handlers
 
 class _CustomFormatter(logging.Formatter):
     """
@@ -29,17 +39,88 @@ class _CustomFormatter(logging.Formatter):
         logging.CRITICAL: COLORS.RED + FORMAT + COLORS.RESET
     }
 
+    def __init__(self):
+        super().__init__(self.FORMAT)
+        self._formatters = {level:logging.Formatter(fmt) for level,fmt in self.FORMAT_LIST.items()} # built once
+
     def format(self, record):
-        log_fmt = self.FORMAT_LIST.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
+        formatter = self._formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
         return formatter.format(record)
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the fields given as `extra` to the logging call"""
+    
+    _RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message'}
+
+    def format(self, record):
+        entry = {'time':record.created, 'level':record.levelname, 'logger':record.name,
+                 'thread':record.threadName, 'message':record.getMessage()}
+        entry.update({k:v for k,v in vars(record).items() if k not in self._RECORD_ATTRS})
+        return json.dumps(entry, default=str)
+
 logger = logging.getLogger('astrocom')
 logger.setLevel(logging.DEBUG)
 _ch = logging.StreamHandler()
 _ch.setLevel(logging.DEBUG)
 _ch.setFormatter(_CustomFormatter())
-logger.addHandler(_ch)
+
+LOG_FLUSH_TIMEOUT = 5 # second
+
+class _LogListener(logging.handlers.QueueListener):
+    """Queue listener releasing the flush markers once the records before them are written"""
+    def handle(self, record):
+        flushed = getattr(record, 'flushed', None)
+        if flushed is not None:
+            flushed.set()
+        else:
+            super().handle(record)
+
+# Records are queued by the caller and written by a background thread (sinks)
+_log_queue = queue.SimpleQueue()
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_listener = _LogListener(_log_queue, _ch, respect_handler_level=True)
+logger.addHandler(_queue_handler)
+_listener.start()
+_listener_running = True
+
+def set_console_level(level):
+    """Set the level of the messages printed on the console (sinks are not affected)"""
+    _ch.setLevel(level)
+
+def add_log_sink(handler):
+    """Add a logging handler fed by the background thread (file, socket, JSON...)"""
+    _listener.handlers = _listener.handlers + (handler,)
+    return handler
+
+def remove_log_sink(handler):
+    _listener.handlers = tuple(h for h in _listener.handlers if h is not handler)
+
+def add_json_sink(stream=None, filename=None, level=logging.DEBUG):
+    """Write records as JSON lines to a stream or a file"""
+    handler = logging.FileHandler(filename) if filename is not None else logging.StreamHandler(stream)
+    handler.setLevel(level)
+    handler.setFormatter(JsonFormatter())
+    return add_log_sink(handler)
+
+def flush_log(timeout=LOG_FLUSH_TIMEOUT):
+    """Wait until all the queued records are written (safe from any thread)"""
+    if _listener_running:
+        flushed = threading.Event()
+        _log_queue.put_nowait(logging.makeLogRecord({'flushed':flushed}))
+        flushed.wait(timeout)
+
+@atexit.register
+def _stop_log():
+    """Write the queued records, then log synchronously (objects deleted at exit)"""
+    global _listener_running
+    if _listener_running:
+        _listener_running = False
+        _listener.stop()
+    logger.removeHandler(_queue_handler)
+    for h in _listener.handlers:
+        logger.addHandler(h)
 
 class AstrocomError(Exception):
 	"""Define a specific Exception to Astrocom"""
@@ -51,7 +132,26 @@ class AstrocomSuccess:
 		logger.info(*args)
 
 ### IMPORT MODULES
+from . import stats
+from . import clock
 from . import astro
+from . import horizon
+from . import record
+from . import catalog
+from . import query
+from . import ephemeris
+from . import sequence
+from . import eop
+from . import kernel
+from . import accuracy
+from . import transport
 from . import serialport
+from . import simulator
+from . import telemetry
+from . import trajectory
+from . import guiding
+from . import platesolve
+from . import skychart
+from . import server
 from . import interface
 
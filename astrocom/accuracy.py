@@ -0,0 +1,224 @@
+"""
+Accuracy versus speed of the coordinate paths.
+
+Every path (sideral time, RA-DEC to ALT-AZ, telescope conversions,
+sexagesimal helpers) is compared with astropy at fixed epochs, over a grid of
+the sky and several sites. Each engine is a way to configure astrocom.astro
+(plain astropy, precomputed Earth orientation table...), registered with
+`register_engine`, so that fast paths are adopted with known error bounds.
+"""
+
+import os
+import time
+import datetime
+import tempfile
+import contextlib
+import numpy as np
+from astrocom import astro
+from astrocom.astro import RaDec, MountPosition, degree_to_hms, hms_to_degree, degree_to_dms, dms_to_degree
+from astrocom.clock import FixedClock
+
+REFERENCE_SITES = [(1.44, 43.60), (-70.40, -24.63), (155.47, 19.82)] # (longitude, latitude) [degree]
+REFERENCE_DATES = [datetime.datetime(2024, 1, 15, 22, 0, 0),
+				datetime.datetime(2025, 6, 21, 2, 30, 0),
+				datetime.datetime(2026, 9, 30, 20, 15, 0)]
+NB_POINT = 500 # sky grid for array paths
+NB_SCALAR = 40 # points for the paths converting one coordinate per call
+
+ENGINES = {}
+
+
+def register_engine(name, engine):
+	"""
+	Register an engine: a function (utc, directory) returning a context manager
+	during which astrocom.astro uses this engine around the UTC datetime.
+	"""
+	ENGINES[name] = engine
+
+
+@contextlib.contextmanager
+def _astropy_engine(utc, directory):
+	"""Plain astropy transforms"""
+	previous_table = astro._EOP_TABLE
+	astro.use_eop_table(None)
+	previous = astro.use_backend('astropy')
+	try:
+		yield
+	finally:
+		astro.use_backend(previous)
+		astro.use_eop_table(previous_table)
+
+
+@contextlib.contextmanager
+def _eop_engine(utc, directory):
+	"""Earth orientation table precomputed around the epoch"""
+	from astrocom.eop import prepare_night
+	previous = astro._EOP_TABLE
+	table = prepare_night(utc - datetime.timedelta(minutes=10), utc + datetime.timedelta(minutes=10),
+						filename=os.path.join(directory, 'eop_%s.npz'%utc.strftime('%Y%m%d_%H%M')))
+	astro.use_eop_table(table)
+	try:
+		yield
+	finally:
+		astro.use_eop_table(previous)
+
+
+@contextlib.contextmanager
+def _numpy_engine(utc, directory):
+	"""Pure NumPy kernel (astrocom.kernel), without EOP table"""
+	previous_table = astro._EOP_TABLE
+	astro.use_eop_table(None)
+	previous = astro.use_backend('numpy')
+	try:
+		yield
+	finally:
+		astro.use_backend(previous)
+		astro.use_eop_table(previous_table)
+
+
+register_engine('astropy', _astropy_engine)
+register_engine('eop', _eop_engine)
+register_engine('numpy', _numpy_engine)
+
+
+class AccuracyResult:
+	"""Error and throughput of one path of one engine"""
+	def __init__(self, engine, path):
+		self.engine = engine
+		self.path = path
+		self.errors = [] # arcsec
+		self.nb_conversion = 0
+		self.duration = 0.0
+
+	def __repr__(self):
+		return '%-10s %-20s %10.4f" %10.4f" %12.0f conv/s'%(self.engine, self.path, self.max_error, self.rms_error, self.rate)
+
+	def add(self, errors, nb_conversion, duration):
+		self.errors.append(np.abs(np.ravel(errors)))
+		self.nb_conversion += nb_conversion
+		self.duration += duration
+
+	@property
+	def max_error(self):
+		return float(np.max(np.concatenate(self.errors)))
+
+	@property
+	def rms_error(self):
+		return float(np.sqrt(np.mean(np.concatenate(self.errors)**2)))
+
+	@property
+	def rate(self):
+		"""Conversions per second"""
+		return self.nb_conversion/max(self.duration, 1e-12)
+
+	def as_dict(self):
+		return {'engine':self.engine, 'path':self.path, 'max_error':self.max_error,
+				'rms_error':self.rms_error, 'rate':self.rate}
+
+
+def sky_grid(nb_point):
+	"""Quasi-uniform RA-DEC grid (Fibonacci sphere) [degree]"""
+	k = np.arange(nb_point) + 0.5
+	dec = np.degrees(np.arcsin(1 - 2*k/nb_point))
+	ra = (180*(1 + 5**0.5)*k) % 360
+	return ra, dec
+
+
+def angular_distance_arcsec(lon1, lat1, lon2, lat2):
+	"""Great-circle distance between two directions given in degrees [arcsec]"""
+	lon1, lat1, lon2, lat2 = [np.radians(x) for x in (lon1, lat1, lon2, lat2)]
+	s = np.sin((lat2-lat1)/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin((lon2-lon1)/2)**2
+	return np.degrees(2*np.arcsin(np.sqrt(np.clip(s, 0, 1))))*3600
+
+
+def wrap_arcsec(delta_deg):
+	"""Difference of angles [degree] wrapped to +/-180, in arcsec"""
+	return ((np.asarray(delta_deg) + 180) % 360 - 180)*3600
+
+
+def reference_sideral_time(longitude_deg, utc):
+	"""Apparent local sideral time from astropy [degree]"""
+	astro.init_astropy()
+	from astropy.coordinates import EarthLocation
+	from astropy.time import Time
+	from astropy import units as _u
+	t = Time(utc, scale='utc', location=EarthLocation(lat=0*_u.deg, lon=longitude_deg*_u.deg))
+	return t.sidereal_time('apparent').degree
+
+
+def reference_altaz(ra_deg, dec_deg, latitude_deg, longitude_deg, utc):
+	"""ALT-AZ from astropy [degree]"""
+	astro.init_astropy()
+	from astropy.coordinates import EarthLocation, AltAz, SkyCoord
+	from astropy.time import Time
+	from astropy import units as _u
+	loc = EarthLocation(lat=latitude_deg*_u.deg, lon=longitude_deg*_u.deg)
+	frame = AltAz(obstime=Time(utc, scale='utc', location=loc), location=loc)
+	sc = SkyCoord(ra=ra_deg*_u.deg, dec=dec_deg*_u.deg, frame='icrs').transform_to(frame)
+	return sc.alt.degree, sc.az.degree
+
+
+def _timed(fct, *args):
+	t0 = time.perf_counter()
+	ans = fct(*args)
+	return ans, time.perf_counter() - t0
+
+
+def _evaluate_engine(name, results, sites, dates, nb_point, nb_scalar, directory):
+	"""Run all the astro paths of one engine"""
+	ra, dec = sky_grid(nb_point)
+	for utc in dates:
+		st_ref = {lon:reference_sideral_time(lon, utc) for lon,_ in sites}
+		with ENGINES[name](utc, directory):
+			for lon, lat in sites:
+				st, dt = _timed(lambda: astro.sideral_time(lon, utc=utc).degree)
+				results[(name,'sideral_time')].add(wrap_arcsec(st - st_ref[lon]), 1, dt)
+				alt_ref, az_ref = reference_altaz(ra, dec, lat, lon, utc)
+				(alt, az), dt = _timed(astro.radec_to_altaz, ra, dec, lat, lon, utc)
+				results[(name,'radec_to_altaz')].add(angular_distance_arcsec(az, alt, az_ref, alt_ref), nb_point, dt)
+				mp = MountPosition(lon, lat, clock=FixedClock(utc))
+				for k in range(nb_scalar):
+					radec = RaDec(float(ra[k]), float(dec[k]))
+					tel, dt = _timed(mp.radec_to_telescope, radec)
+					ha_ref = st_ref[lon] - radec.ra_degree
+					error = angular_distance_arcsec(360*tel[0] + 90, 360*tel[1] + 90, ha_ref, radec.dec_degree)
+					results[(name,'radec_to_telescope')].add(error, 1, dt)
+					back, dt = _timed(mp.telescope_to_radec, tel)
+					error = angular_distance_arcsec(back.ra_degree, back.dec_degree, radec.ra_degree, radec.dec_degree)
+					results[(name,'telescope_to_radec')].add(error, 1, dt)
+
+
+def _evaluate_sexagesimal(results, nb_point):
+	"""Round trips through the sexagesimal helpers (engine independent)"""
+	ra, dec = sky_grid(nb_point)
+	t0 = time.perf_counter()
+	ra_back = np.array([hms_to_degree(degree_to_hms(x)) for x in ra])
+	results[('-','hms')].add(wrap_arcsec(ra_back - ra), nb_point, time.perf_counter() - t0)
+	t0 = time.perf_counter()
+	dec_back = np.array([dms_to_degree(degree_to_dms(x)) for x in dec])
+	results[('-','dms')].add((dec_back - dec)*3600, nb_point, time.perf_counter() - t0)
+
+
+def run_accuracy(engines=None, sites=REFERENCE_SITES, dates=REFERENCE_DATES, nb_point=NB_POINT, nb_scalar=NB_SCALAR):
+	"""
+	Compare the engines with astropy.
+	Return the list of AccuracyResult (errors in arcsec, rates in conversions per second).
+	"""
+	if engines is None:
+		engines = list(ENGINES.keys())
+	paths = ['sideral_time', 'radec_to_altaz', 'radec_to_telescope', 'telescope_to_radec']
+	results = {(e,p):AccuracyResult(e, p) for e in engines for p in paths}
+	results[('-','hms')] = AccuracyResult('-', 'hms')
+	results[('-','dms')] = AccuracyResult('-', 'dms')
+	with tempfile.TemporaryDirectory() as directory:
+		for name in engines:
+			_evaluate_engine(name, results, sites, dates, nb_point, min(nb_scalar, nb_point), directory)
+	_evaluate_sexagesimal(results, nb_point)
+	return list(results.values())
+
+
+def accuracy_report(results):
+	"""Format the results as a table"""
+	st = '%-10s %-20s %11s %11s %19s\n'%('ENGINE','PATH','MAX ERROR','RMS ERROR','THROUGHPUT')
+	st += '\n'.join(str(r) for r in results)
+	return st
@@ -4,19 +4,53 @@ Astronomical computations
 
 import os
 import re
+import logging
 import datetime
 import numpy as np
-from astropy.coordinates import EarthLocation, AltAz, SkyCoord
-from astropy.time import Time
-from astropy import units as _u
-from astropy.utils.iers import conf as _iers_config
 from astrocom import COLORS, AstrocomError, logger
-
-_iers_config.auto_max_age = None # remove error when too old IERS data
+from astrocom.stats import timed
+from astrocom.clock import DEFAULT_CLOCK, resolve_utc
 
 SIDERAL_DAY_SEC = 23*3600 + 56*60 + 4.09
 SOLAR_DAY_SEC = 24*3600
 
+_EOP_TABLE = None # precomputed Earth orientation table, see use_eop_table()
+_BACKEND = None # ALT-AZ kernel used instead of astropy transforms, see use_backend()
+BACKENDS = ['astropy', 'numpy']
+_ASTROPY_READY = False
+
+
+def init_astropy():
+	"""
+	Configure astropy before its first use. astropy is imported only by the
+	code paths using it: astropy.coordinates alone takes most of the import time.
+	"""
+	global _ASTROPY_READY
+	if not _ASTROPY_READY:
+		from astropy.utils.iers import conf
+		conf.auto_max_age = None # remove error when too old IERS data
+		_ASTROPY_READY = True
+
+
+class SideralTime:
+	"""Sideral time [degree] in [0,360[ (float or array), with the .degree and .hms of astropy Longitude"""
+	def __init__(self, degree):
+		self.degree = np.mod(degree, 360)
+
+	def __repr__(self):
+		return "SideralTime %s"%self.degree
+
+	@property
+	def hour(self):
+		return self.degree/15
+
+	@property
+	def hms(self):
+		"""(hour, minute, second), second as float"""
+		h_frac, h = np.modf(self.hour)
+		m_frac, m = np.modf(h_frac*60)
+		return h, m, m_frac*60
+
 
 class RaDec:
 	"""An object with sky coordinates RA-DEC"""
@@ -27,6 +61,10 @@ class RaDec:
 	def __repr__(self):
 		return "RaDec %s %s"%(self.ra_str,self.dec_str)
 	
+	def at(self, epoch):
+		"""Coordinates at the time of an Epoch (fixed, moving targets override it)"""
+		return self
+	
 	@property
 	def ra(self):
 		return self._ra
@@ -79,15 +117,74 @@ class RaDec:
 	def dec_str(self):
 		return "%3u°%02u'%02u"%self.dec
 		
-	def altaz(self, latitude_tpl, longitude_tpl):
+	def altaz(self, latitude_tpl, longitude_tpl, utc=None):
 		latitude_deg = dms_to_degree(latitude_tpl)
 		longitude_deg = dms_to_degree(longitude_tpl)
-		return radec_to_altaz(self.ra_degree, self.dec_degree, latitude_deg, longitude_deg)
+		return radec_to_altaz(self.ra_degree, self.dec_degree, latitude_deg, longitude_deg, utc=utc)
+
+
+class Epoch:
+	"""
+	Snapshot of one UTC time at a location.
+	Derived quantities (time, sideral time, ALT-AZ frame) are computed once and shared.
+	"""
+	def __init__(self, utc=None, longitude_deg=0.0, latitude_deg=0.0):
+		self.utc = resolve_utc(utc)
+		self.longitude_deg = longitude_deg
+		self.latitude_deg = latitude_deg
+		self._time = None
+		self._sideral_time = None
+		self._altaz_frame = None
+	
+	def __repr__(self):
+		return "Epoch %s UTC"%self.utc.isoformat()
+	
+	@property
+	def time(self):
+		"""Astropy Time at the location"""
+		if self._time is None:
+			init_astropy()
+			from astropy.coordinates import EarthLocation
+			from astropy.time import Time
+			from astropy import units as _u
+			observ_loc = EarthLocation(lat=self.latitude_deg*_u.deg, lon=self.longitude_deg*_u.deg)
+			self._time = Time(self.utc, scale='utc', location=observ_loc)
+		return self._time
+	
+	@property
+	def sideral_time(self):
+		"""Apparent sideral time at the location"""
+		if self._sideral_time is None:
+			self._sideral_time = sideral_time(self.longitude_deg, utc=self.utc)
+		return self._sideral_time
+	
+	@property
+	def altaz_frame(self):
+		"""Astropy ALT-AZ frame at the location"""
+		if self._altaz_frame is None:
+			from astropy.coordinates import AltAz
+			self._altaz_frame = AltAz(obstime=self.time, location=self.time.location)
+		return self._altaz_frame
+	
+	def radec_to_altaz(self, ra_deg, dec_deg):
+		"""Convert RA-DEC to ALT-AZ coordinates at this epoch"""
+		if (_EOP_TABLE is not None) and _EOP_TABLE.covers(self.utc):
+			return _EOP_TABLE.radec_to_altaz(ra_deg, dec_deg, self.latitude_deg, self.longitude_deg, self.utc)
+		if _BACKEND is not None:
+			return _BACKEND.radec_to_altaz(ra_deg, dec_deg, self.latitude_deg, self.longitude_deg, self.utc)
+		from astropy.coordinates import SkyCoord
+		from astropy import units as _u
+		sc = SkyCoord(ra=ra_deg*_u.deg, dec=dec_deg*_u.deg, frame='icrs')
+		sc_az = sc.transform_to(self.altaz_frame)
+		return sc_az.alt.value, sc_az.az.value
 
 
 class MountPosition:
-	"""MountPosition is located at (longitude,latitude) on Earth"""
-	def __init__(self, longitude, latitude):
+	"""
+	MountPosition is located at (longitude,latitude) on Earth.
+	The clock gives the current time (see astrocom.clock).
+	"""
+	def __init__(self, longitude, latitude, clock=DEFAULT_CLOCK):
 		# Data given as degrees
 		if type(longitude) in [float, int]:
 			longitude = degree_to_dms(longitude)
@@ -96,6 +193,7 @@ class MountPosition:
 		# Data given as tuple (default)
 		self._longitude = tuple(longitude)
 		self._latitude = tuple(latitude)
+		self.clock = clock
 	
 	def __repr__(self):
 		return "MountPosition %sN %sE"%(self.latitude_str,self.longitude_str)
@@ -139,14 +237,23 @@ class MountPosition:
 	@property
 	def sideral_time(self):
 		"""Get current sideral time"""
-		return sideral_time(self.longitude_degree)
+		return sideral_time(self.longitude_degree, utc=self.clock)
+	
+	def snapshot(self, utc=None):
+		"""Get an Epoch at the mount location (current time of the clock by default)"""
+		if utc is None:
+			utc = self.clock
+		return Epoch(utc, self.longitude_degree, self.latitude_degree)
 		
-	def radec_to_telescope(self, radec):
+	def radec_to_telescope(self, radec, epoch=None):
 		"""
 		Convert RaDec object into telescope coordinates.
 		Assume that (0,0) is North Pole for telescope.
 		"""
-		ha = self.sideral_time.degree - radec.ra_degree
+		if epoch is None:
+			epoch = self.snapshot()
+		radec = radec.at(epoch)
+		ha = epoch.sideral_time.degree - radec.ra_degree
 		ha_tel = ha - 90
 		dec_tel = radec.dec_degree - 90
 		west = False
@@ -156,14 +263,17 @@ class MountPosition:
 		#	west = True
 		tel_pos_0 = ha_tel/360
 		tel_pos_1 = dec_tel/360
-		logger.debug('radec %6.2f %6.2f  ->  telescope %6.2f %6.2f  (West=%s)'%(radec.ra_degree, radec.dec_degree, tel_pos_0, tel_pos_1, west))
+		if logger.isEnabledFor(logging.DEBUG): # skip the formatting on the goto path
+			logger.debug('radec %6.2f %6.2f  ->  telescope %6.2f %6.2f  (West=%s)', radec.ra_degree, radec.dec_degree, tel_pos_0, tel_pos_1, west)
 		return tel_pos_0, tel_pos_1
 		
-	def telescope_to_radec(self, tel_pos):
+	def telescope_to_radec(self, tel_pos, epoch=None):
 		"""
 		Convert telescope coordinates into RaDec object.
 		Assume that (0,0) is North Pole for telescope.
 		"""
+		if epoch is None:
+			epoch = self.snapshot()
 		ha_tel = 360*tel_pos[0]
 		dec_tel = 360*tel_pos[1]
 		west = False
@@ -173,8 +283,9 @@ class MountPosition:
 		#	west = True
 		ha = ha_tel + 90
 		dec = dec_tel + 90
-		ra = self.sideral_time.degree - ha
-		logger.debug('telescope %6.2f %6.2f  ->  radec %6.2f %6.2f  (West=%s)'%(tel_pos[0], tel_pos[1], ra, dec, west))
+		ra = epoch.sideral_time.degree - ha
+		if logger.isEnabledFor(logging.DEBUG):
+			logger.debug('telescope %6.2f %6.2f  ->  radec %6.2f %6.2f  (West=%s)', tel_pos[0], tel_pos[1], ra, dec, west)
 		return RaDec(ra, dec)
 		
 
@@ -204,6 +315,7 @@ class Star(RaDec):
 		
 
 
+@timed('astro.read_bsc')
 def read_bsc():
 	"""Read the simplified Bright Star Catalog"""
 	stars = []
@@ -231,32 +343,45 @@ def read_bsc():
 	return sorted(stars, key=lambda s:s.vmag) # sort by magnitude
 
 
-def catalog_brightest(catalog, nb_star, latitude_dms, longitude_dms, alt_min=20):
-	"""Get the brightest stars of the catalog"""
+def catalog_brightest(catalog, nb_star, latitude_dms, longitude_dms, alt_min=20, utc=None, horizon=None):
+	"""
+	Get the brightest stars of the catalog, above alt_min and the local horizon (HorizonMask) if given.
+	The catalog is sorted by magnitude, so only its bright prefix is read, by blocks.
+	"""
 	brightest = []
-	for star in catalog:
-		alt,az = star.altaz(latitude_dms, longitude_dms)
-		if alt >= alt_min:
-			brightest += [star]
-			nb_star -= 1
-			if nb_star <= 0:
-				break
-	return brightest
-
-
-def catalog_str(catalog, nb_star, latitude_dms, longitude_dms, alt_min=20, bicolor=False):
+	utc = resolve_utc(utc) # same epoch for all blocks
+	latitude_deg = dms_to_degree(latitude_dms)
+	longitude_deg = dms_to_degree(longitude_dms)
+	block = max(2*nb_star, 32)
+	start = 0
+	while (len(brightest) < nb_star) and (start < len(catalog)):
+		stars = catalog[start:start+block]
+		ra = np.array([s.ra_degree for s in stars])
+		dec = np.array([s.dec_degree for s in stars])
+		alt, az = radec_to_altaz(ra, dec, latitude_deg, longitude_deg, utc=utc)
+		visible = alt >= alt_min
+		if horizon is not None:
+			visible &= horizon.visible(alt, az)
+		brightest += [stars[i] for i in np.flatnonzero(visible)]
+		start += block
+		block *= 2
+	return brightest[:nb_star]
+
+
+def catalog_str(catalog, nb_star, latitude_dms, longitude_dms, alt_min=20, bicolor=False, utc=None, horizon=None):
 	"""Get the brightest stars of the catalog as a string"""
 	st = '-'*(len(catalog[0].header)+10) + '\n'
 	st += catalog[0].header + '  %4s  %2s'%('ALT','AZ') + '\n'
 	st += '-'*(len(catalog[0].header)+10) + '\n'
 	clr = '' # no color by default
 	clr_reset = '' # no color by default
-	brightest = catalog_brightest(catalog, nb_star, latitude_dms, longitude_dms, alt_min=20)
+	utc = resolve_utc(utc)
+	brightest = catalog_brightest(catalog, nb_star, latitude_dms, longitude_dms, alt_min=alt_min, utc=utc, horizon=horizon)
 	for i in range(len(brightest)):
 		if bicolor:
 			clr_reset = COLORS.RESET
 			clr = [COLORS.BLUE,COLORS.RESET][i%2]
-		alt,az = brightest[i].altaz(latitude_dms, longitude_dms)
+		alt,az = brightest[i].altaz(latitude_dms, longitude_dms, utc=utc)
 		st += clr + brightest[i].__str__() + '  %3u°  %2s'%(alt,cardinal_point(az)) + clr_reset + '\n'
 	st += '-'*(len(catalog[0].header)+10)
 	return st
@@ -267,23 +392,76 @@ def print_catalog(*args, **kwargs):
 	print(catalog_str(*args, **kwargs))
 
 
-def sideral_time(longitude_deg):
-	"""Get the current sideral time from a longitude [degree]"""
+@timed('astro.sideral_time')
+def sideral_time(longitude_deg, utc=None):
+	"""Get the sideral time from a longitude [degree] at a UTC datetime or clock (default now)"""
+	utc = resolve_utc(utc)
+	if (_EOP_TABLE is not None) and _EOP_TABLE.covers(utc):
+		return _EOP_TABLE.sideral_time(longitude_deg, utc)
+	if _BACKEND is not None:
+		return SideralTime(_BACKEND.sideral_time(longitude_deg, utc))
+	init_astropy()
+	from astropy.coordinates import EarthLocation
+	from astropy.time import Time
+	from astropy import units as _u
 	observ_loc = EarthLocation(lat=0*_u.deg, lon=longitude_deg*_u.deg)
-	observ_time = Time(datetime.datetime.utcnow(), scale='utc', location=observ_loc)
-	return observ_time.sidereal_time('apparent')
-
-
-def radec_to_altaz(ra_deg, dec_deg, latitude_deg, longitude_deg):
-	"""Convert RA-DEC to ALT-AZ coordinates"""
+	observ_time = Time(utc, scale='utc', location=observ_loc)
+	return SideralTime(observ_time.sidereal_time('apparent').degree)
+
+
+@timed('astro.radec_to_altaz')
+def radec_to_altaz(ra_deg, dec_deg, latitude_deg, longitude_deg, utc=None):
+	"""
+	Convert RA-DEC to ALT-AZ coordinates at a UTC datetime or clock (default now).
+	Arrays of coordinates and of datetimes are broadcast together.
+	"""
+	utc = resolve_utc(utc)
+	if (_EOP_TABLE is not None) and _EOP_TABLE.covers(utc):
+		return _EOP_TABLE.radec_to_altaz(ra_deg, dec_deg, latitude_deg, longitude_deg, utc)
+	if _BACKEND is not None:
+		return _BACKEND.radec_to_altaz(ra_deg, dec_deg, latitude_deg, longitude_deg, utc)
+	init_astropy()
+	from astropy.coordinates import EarthLocation, AltAz, SkyCoord
+	from astropy.time import Time
+	from astropy import units as _u
 	observ_loc = EarthLocation(lat=latitude_deg*_u.deg, lon=longitude_deg*_u.deg)
-	observ_time = Time(datetime.datetime.utcnow(), scale='utc', location=observ_loc)
+	observ_time = Time(utc, scale='utc', location=observ_loc)
 	altaz_frame = AltAz(obstime=observ_time, location=observ_loc)
 	sc = SkyCoord(ra=ra_deg*_u.deg, dec=dec_deg*_u.deg, frame='icrs')
 	sc_az = sc.transform_to(altaz_frame)
 	return sc_az.alt.value, sc_az.az.value
 
 
+def use_eop_table(table):
+	"""
+	Use a precomputed Earth orientation table (see astrocom.eop) for the
+	times it covers; other times still use astropy. None to disable.
+	"""
+	global _EOP_TABLE
+	_EOP_TABLE = table
+
+
+def use_backend(backend='astropy', **kwargs):
+	"""
+	Select how ALT-AZ and sideral time are computed outside of the EOP table:
+	'astropy' (SkyCoord transforms), 'numpy' (astrocom.kernel.AltAzKernel,
+	kwargs are given to it) or any object with the same methods.
+	Return the previous backend (None for astropy).
+	"""
+	global _BACKEND
+	previous = _BACKEND
+	if (backend is None) or (backend == 'astropy'):
+		_BACKEND = None
+	elif backend == 'numpy':
+		from astrocom.kernel import AltAzKernel
+		_BACKEND = AltAzKernel(**kwargs)
+	elif isinstance(backend, str):
+		raise AstrocomError('Unknown astro backend <%s>, use one of %s'%(backend, BACKENDS))
+	else:
+		_BACKEND = backend
+	return previous
+
+
 def cardinal_point(az_deg):
 	"""Get cardinal point string from azimuth [°]"""
 	az_list = np.array([0, 45, 90, 135, 180, 225, 270, 315, 360])
@@ -0,0 +1,184 @@
+"""
+Large star catalogs (Hipparcos/Tycho scale) stored as memory-mapped columns.
+
+The source file (pipe-delimited or CSV) is parsed by blocks of lines, so that
+memory use while building depends on the block size and on one sort index.
+The store is a directory with one `.npy` file per column, sorted by magnitude.
+"""
+
+import os
+import json
+import itertools
+import numpy as np
+from astrocom import logger, AstrocomError
+from astrocom.astro import Star
+
+CHUNK_SIZE = 100000 # lines parsed at once
+STORE_DTYPES = {
+	'ra': np.float64, # degree
+	'dec': np.float64, # degree
+	'vmag': np.float32,
+	'id': np.int64,
+	'constell': 'U10',
+	'sptype': 'U8',
+	'name': 'U16'}
+
+# Columns of the simplified Bright Star Catalog shipped with astrocom
+BSC_FILE = os.path.dirname(__file__)+'/bsc_simplified.txt'
+BSC_FORMAT = {
+	'delimiter': '|',
+	'skip_header': 1,
+	'columns': {'id':0, 'constell':1, 'ra':(2,3,4), 'dec':(5,6,7,8), 'vmag':9, 'sptype':10, 'name':11},
+	'ra_unit': 'hour'}
+
+
+def _parse_float(strings):
+	"""Convert an array of strings to floats, empty strings become NaN"""
+	strings = np.char.strip(strings)
+	strings = np.where(strings == '', 'nan', strings)
+	return strings.astype(np.float64)
+
+
+def _parse_chunk(lines, delimiter, columns, ra_unit):
+	"""Parse a block of lines into a dictionary of column arrays"""
+	nb_field = 1 + max(c for spec in columns.values() for c in np.atleast_1d(spec))
+	fields = [l.rstrip('\r\n').split(delimiter) for l in lines]
+	table = np.array([f[:nb_field] for f in fields if len(f) >= nb_field], dtype=str).reshape(-1, nb_field)
+	chunk = {}
+	ra = columns['ra']
+	if type(ra) in [tuple, list]:
+		ra_val = _parse_float(table[:,ra[0]]) + _parse_float(table[:,ra[1]])/60 + _parse_float(table[:,ra[2]])/3600
+	else:
+		ra_val = _parse_float(table[:,ra])
+	if ra_unit == 'hour':
+		ra_val = ra_val * 15
+	chunk['ra'] = ra_val % 360
+	dec = columns['dec']
+	if type(dec) in [tuple, list]:
+		sign = np.where(np.char.find(table[:,dec[0]], '-') >= 0, -1.0, 1.0)
+		chunk['dec'] = sign*(_parse_float(table[:,dec[1]]) + _parse_float(table[:,dec[2]])/60 + _parse_float(table[:,dec[3]])/3600)
+	else:
+		chunk['dec'] = _parse_float(table[:,dec])
+	chunk['vmag'] = _parse_float(table[:,columns['vmag']])
+	if 'id' in columns:
+		ids = _parse_float(table[:,columns['id']])
+		chunk['id'] = np.where(np.isfinite(ids), ids, -1).astype(np.int64)
+	for name in ['constell', 'sptype', 'name']:
+		if name in columns:
+			txt = np.char.replace(table[:,columns[name]], ' ', '')
+			chunk[name] = txt.astype(STORE_DTYPES[name]) # truncated to the store width
+	valid = np.isfinite(chunk['ra']) & np.isfinite(chunk['dec']) & np.isfinite(chunk['vmag'])
+	return {k:v[valid] for k,v in chunk.items()}
+
+
+def build_catalog_store(source, path, delimiter='|', columns=None, skip_header=0, ra_unit='deg', chunk_size=CHUNK_SIZE):
+	"""
+	Build a magnitude-sorted columnar store from a text catalog.
+	`columns` maps store columns (ra, dec, vmag, id, constell, sptype, name) to field indices.
+	RA and DEC can be given as sexagesimal field tuples (h,m,s) and (sign,d,m,s).
+	"""
+	if columns is None:
+		raise AstrocomError('Catalog columns must be defined')
+	for name in ['ra', 'dec', 'vmag']:
+		if name not in columns:
+			raise AstrocomError('Catalog column <%s> is required'%name)
+	names = [n for n in STORE_DTYPES.keys() if (n in columns) or (n in ['ra','dec','vmag'])]
+	os.makedirs(path, exist_ok=True)
+	# First pass: append unsorted columns to raw temporary files
+	tmp = {n:open(os.path.join(path, n+'.tmp'), 'wb') for n in names}
+	count = 0
+	with open(source, 'r') as myfile:
+		for _ in range(skip_header):
+			next(myfile, None)
+		while True:
+			lines = list(itertools.islice(myfile, chunk_size))
+			if len(lines) == 0:
+				break
+			chunk = _parse_chunk(lines, delimiter, columns, ra_unit)
+			for n in names:
+				np.ascontiguousarray(chunk[n], dtype=STORE_DTYPES[n]).tofile(tmp[n])
+			count += len(chunk['ra'])
+	for f in tmp.values():
+		f.close()
+	# Second pass: sort by magnitude and write the memory-mapped columns by blocks
+	vmag = np.fromfile(os.path.join(path, 'vmag.tmp'), dtype=STORE_DTYPES['vmag'])
+	order = np.argsort(vmag, kind='stable')
+	del vmag
+	for n in names:
+		raw = np.memmap(os.path.join(path, n+'.tmp'), dtype=STORE_DTYPES[n], mode='r', shape=(count,)) if count else np.zeros(0, STORE_DTYPES[n])
+		out = np.lib.format.open_memmap(os.path.join(path, n+'.npy'), mode='w+', dtype=STORE_DTYPES[n], shape=(count,))
+		for i in range(0, count, chunk_size):
+			out[i:i+chunk_size] = raw[order[i:i+chunk_size]]
+		out.flush()
+		del out, raw
+		os.remove(os.path.join(path, n+'.tmp'))
+	with open(os.path.join(path, 'meta.json'), 'w') as myfile:
+		json.dump({'count':count, 'columns':names, 'source':os.path.abspath(source)}, myfile)
+	logger.info('Catalog store built with %u stars'%count)
+	return CatalogStore(path)
+
+
+class CatalogStore:
+	"""
+	Memory-mapped star catalog sorted by magnitude.
+	Behaves like the list returned by read_bsc: indexing and iteration give Star objects.
+	"""
+	def __init__(self, path):
+		self.path = path
+		try:
+			with open(os.path.join(path, 'meta.json'), 'r') as myfile:
+				self.meta = json.load(myfile)
+		except OSError:
+			raise AstrocomError('No catalog store in <%s>'%path)
+		self.columns = {}
+		for n in self.meta['columns']:
+			if self.meta['count'] > 0:
+				self.columns[n] = np.load(os.path.join(path, n+'.npy'), mmap_mode='r')
+			else:
+				self.columns[n] = np.zeros(0, STORE_DTYPES[n])
+
+	def __repr__(self):
+		return "CatalogStore %s (%u stars)"%(self.path, len(self))
+
+	def __len__(self):
+		return self.meta['count']
+
+	def __getitem__(self, idx):
+		if isinstance(idx, slice):
+			return [self._star(i) for i in range(*idx.indices(len(self)))]
+		if idx < 0:
+			idx += len(self)
+		if (idx < 0) or (idx >= len(self)):
+			raise IndexError('Catalog index out of range')
+		return self._star(idx)
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self._star(i)
+
+	def _star(self, i):
+		"""Build the Star object at index i"""
+		col = self.columns
+		hr = int(col['id'][i]) if 'id' in col else i
+		constell = str(col['constell'][i]) if 'constell' in col else ''
+		sptype = str(col['sptype'][i]) if 'sptype' in col else ''
+		name = str(col['name'][i]) if 'name' in col else ''
+		return Star(float(col['ra'][i]), float(col['dec'][i]), hr, float(col['vmag'][i]), constell, sptype, name=name)
+
+	def column(self, name):
+		"""Get a memory-mapped column"""
+		return self.columns[name]
+
+	def brighter_than(self, vmag):
+		"""Number of stars brighter than a magnitude (prefix of the store)"""
+		return int(np.searchsorted(self.columns['vmag'], vmag, side='right'))
+
+
+def catalog_arrays(catalog):
+	"""RA, DEC [degree] and magnitude arrays of a list of Star or of a CatalogStore"""
+	if hasattr(catalog, 'column'):
+		return np.asarray(catalog.column('ra')), np.asarray(catalog.column('dec')), np.asarray(catalog.column('vmag'))
+	ra = np.array([s.ra_degree for s in catalog])
+	dec = np.array([s.dec_degree for s in catalog])
+	vmag = np.array([s.vmag for s in catalog])
+	return ra, dec, vmag
@@ -0,0 +1,72 @@
+"""
+Clocks giving the UTC time used by astronomical computations.
+Any object with a `utcnow()` method returning a UTC datetime can be used as a clock.
+"""
+
+import time
+import datetime
+import numpy as np
+
+
+class RealClock:
+	"""Current UTC time of the computer"""
+	def __repr__(self):
+		return "RealClock"
+
+	def utcnow(self):
+		return datetime.datetime.utcnow()
+
+
+class FixedClock:
+	"""Clock frozen at a given UTC datetime, moved only on request"""
+	def __init__(self, utc):
+		self.utc = utc
+
+	def __repr__(self):
+		return "FixedClock %s"%self.utc.isoformat()
+
+	def utcnow(self):
+		return self.utc
+
+	def set(self, utc):
+		"""Set the clock at a UTC datetime"""
+		self.utc = utc
+
+	def advance(self, seconds):
+		"""Move the clock forward"""
+		self.utc = self.utc + datetime.timedelta(seconds=seconds)
+
+
+class SimulationClock:
+	"""Clock running `speed` times faster than real time from a start UTC datetime"""
+	def __init__(self, start=None, speed=1.0):
+		if start is None:
+			start = datetime.datetime.utcnow()
+		self.start = start
+		self.speed = speed
+		self._t0 = time.monotonic()
+
+	def __repr__(self):
+		return "SimulationClock x%g from %s"%(self.speed, self.start.isoformat())
+
+	def utcnow(self):
+		return self.start + datetime.timedelta(seconds=(time.monotonic()-self._t0)*self.speed)
+
+
+DEFAULT_CLOCK = RealClock()
+
+
+def resolve_utc(utc=None):
+	"""Get a UTC datetime from None (default clock), a clock object or a datetime (returned as is)"""
+	if utc is None:
+		return DEFAULT_CLOCK.utcnow()
+	if isinstance(utc, datetime.datetime): # datetime also has a utcnow classmethod
+		return utc
+	if hasattr(utc, 'utcnow'):
+		return utc.utcnow()
+	return utc
+
+
+def elapsed_seconds(utc, start):
+	"""Seconds elapsed from start (datetime64) for datetimes or arrays of datetimes"""
+	return (np.asarray(utc, dtype='datetime64[us]') - start) / np.timedelta64(1, 's')
@@ -0,0 +1,127 @@
+"""
+Earth orientation tables precomputed for a night.
+
+For each time of a fine grid, the table stores the apparent Greenwich sideral
+time, the bias-precession-nutation matrix, the polar motion matrix and the
+Earth velocity (annual aberration). Conversions then interpolate the table and
+use array arithmetic only, without astropy transforms nor IERS lookups.
+
+Accuracy against astropy is at the arcsecond level: diurnal aberration
+(<0.3"), light deflection and refraction are not included.
+"""
+
+import os
+import datetime
+import numpy as np
+from astrocom import AstrocomError, AstrocomSuccess, CACHE_DIR
+from astrocom.astro import SideralTime, init_astropy
+from astrocom.clock import elapsed_seconds
+
+EOP_STEP = 60 # second
+SPEED_OF_LIGHT_AU_DAY = 173.1446326846693
+
+
+def default_eop_filename(start):
+	"""Default file of the table starting at a UTC datetime"""
+	return os.path.join(CACHE_DIR, 'eop_%s.npz'%start.strftime('%Y%m%d_%H%M'))
+
+
+def prepare_night(start, end, longitude_deg=0.0, latitude_deg=0.0, step=EOP_STEP, filename=None):
+	"""
+	Precompute the Earth orientation table between two UTC datetimes and save it.
+	The site is only stored as information: the table can be used at any site.
+	"""
+	if end <= start:
+		raise AstrocomError('End of the night must be after its start')
+	init_astropy()
+	import erfa
+	from astropy.time import Time
+	from astropy import units as _u
+	from astropy.utils.iers import earth_orientation_table
+	nb = int(np.ceil((end-start).total_seconds()/step)) + 2 # one extra sample on each side of the interpolation
+	grid = Time([start + datetime.timedelta(seconds=k*step) for k in range(-1, nb)], scale='utc')
+	tt = grid.tt
+	ut1 = grid.ut1
+	tdb = grid.tdb
+	gast = np.unwrap(erfa.gst06a(ut1.jd1, ut1.jd2, tt.jd1, tt.jd2))
+	npb = erfa.pnm06a(tt.jd1, tt.jd2)
+	xp, yp = earth_orientation_table.get().pm_xy(grid)
+	pom = erfa.pom00(xp.to_value(_u.rad), yp.to_value(_u.rad), erfa.sp00(tt.jd1, tt.jd2))
+	_, pvb = erfa.epv00(tdb.jd1, tdb.jd2)
+	velocity = pvb['v'] / SPEED_OF_LIGHT_AU_DAY # in units of c
+	if filename is None:
+		filename = default_eop_filename(start)
+	os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+	np.savez(filename, start=np.datetime64(start - datetime.timedelta(seconds=step), 'us'), step=step,
+			gast=gast, npb=npb, pom=pom, velocity=velocity, site=np.array([longitude_deg, latitude_deg]))
+	AstrocomSuccess('Earth orientation table saved in <%s>'%filename)
+	return EopTable(filename)
+
+
+class EopTable:
+	"""Earth orientation table loaded from disk, interpolated at any time of the night"""
+	def __init__(self, filename):
+		self.filename = filename
+		with np.load(filename) as data:
+			self.start = data['start']
+			self.step = float(data['step'])
+			self.gast = data['gast']
+			self.npb = data['npb']
+			self.pom = data['pom']
+			self.velocity = data['velocity']
+			self.site = tuple(data['site'])
+		self.end = self.start + np.timedelta64(int(1e6*self.step*(len(self.gast)-1)), 'us')
+
+	def __repr__(self):
+		return "EopTable %s to %s"%(self.start, self.end)
+
+	def covers(self, utc):
+		"""Check if all the UTC datetimes are inside the table"""
+		t = elapsed_seconds(utc, self.start)
+		return bool(np.all(t >= 0) and np.all(t <= self.step*(len(self.gast)-1)))
+
+	def _interp(self, utc):
+		"""Interpolation index and weight"""
+		x = elapsed_seconds(utc, self.start) / self.step
+		i = np.clip(np.floor(x).astype(int), 0, len(self.gast)-2)
+		return i, x - i
+
+	def _lerp(self, table, i, w):
+		w = np.reshape(w, w.shape + (1,)*(table.ndim-1))
+		return table[i]*(1-w) + table[i+1]*w
+
+	def gast_rad(self, utc):
+		"""Greenwich apparent sideral time [rad]"""
+		i, w = self._interp(utc)
+		return self._lerp(self.gast, i, w)
+
+	def sideral_time(self, longitude_deg, utc):
+		"""Local apparent sideral time"""
+		return SideralTime(np.degrees(self.gast_rad(utc)) + longitude_deg)
+
+	def radec_to_altaz(self, ra_deg, dec_deg, latitude_deg, longitude_deg, utc):
+		"""Convert ICRS RA-DEC to ALT-AZ [degree], arrays of coordinates and times are broadcast"""
+		i, w = self._interp(utc)
+		ra = np.radians(ra_deg)
+		dec = np.radians(dec_deg)
+		ra, dec, i, w = np.broadcast_arrays(ra, dec, i, w)
+		p = np.stack((np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)), axis=-1)
+		# annual aberration (first order)
+		v = self._lerp(self.velocity, i, w)
+		p = p + v - np.sum(p*v, axis=-1, keepdims=True)*p
+		p /= np.linalg.norm(p, axis=-1, keepdims=True)
+		# celestial to terrestrial: POM * R3(GAST) * NPB
+		p = np.einsum('...ij,...j->...i', self._lerp(self.npb, i, w), p)
+		gast = self._lerp(self.gast, i, w)
+		x = np.cos(gast)*p[...,0] + np.sin(gast)*p[...,1]
+		y = -np.sin(gast)*p[...,0] + np.cos(gast)*p[...,1]
+		p = np.einsum('...ij,...j->...i', self._lerp(self.pom, i, w), np.stack((x, y, p[...,2]), axis=-1))
+		# terrestrial to local horizon
+		lat = np.radians(latitude_deg)
+		lon = np.radians(longitude_deg)
+		east = -np.sin(lon)*p[...,0] + np.cos(lon)*p[...,1]
+		north = -np.sin(lat)*np.cos(lon)*p[...,0] - np.sin(lat)*np.sin(lon)*p[...,1] + np.cos(lat)*p[...,2]
+		up = np.cos(lat)*np.cos(lon)*p[...,0] + np.cos(lat)*np.sin(lon)*p[...,1] + np.sin(lat)*p[...,2]
+		alt = np.degrees(np.arcsin(np.clip(up, -1, 1)))
+		az = np.degrees(np.arctan2(east, north)) % 360
+		return alt, az
@@ -0,0 +1,181 @@
+"""
+Sun, Moon and planets as goto targets.
+
+Positions are computed with astropy once per night and site, fitted to
+Chebyshev segments and cached on disk. The fit is done on the unit vector
+(no RA wrapping issue), evaluating it is a few multiply-adds (Clenshaw).
+Coordinates are topocentric (the Moon parallax reaches 1 degree) and
+astrometric on the ICRS axes, as the RA-DEC of the catalog stars: the
+aberration and light deflection of the apparent positions are removed, since
+the conversion to ALT-AZ applies them again.
+"""
+
+import os
+import datetime
+import numpy as np
+from astrocom import AstrocomError, CACHE_DIR
+from astrocom.astro import RaDec, init_astropy
+from astrocom.clock import DEFAULT_CLOCK, resolve_utc, elapsed_seconds
+
+BODIES = ['sun', 'moon', 'mercury', 'venus', 'mars', 'jupiter', 'saturn', 'uranus', 'neptune']
+EPHEMERIS_SEGMENT = {'moon':4*3600} # second, other bodies use EPHEMERIS_DEFAULT_SEGMENT
+EPHEMERIS_DEFAULT_SEGMENT = 24*3600
+EPHEMERIS_DEGREE = 12
+EPHEMERIS_DIR = os.path.join(CACHE_DIR, 'ephemeris')
+NIGHT_DURATION = 24*3600 # second, from noon to noon UTC
+EPHEMERIS_VERSION = 2 # in the cache file names, fits of older versions are not reused
+
+
+def night_start(utc):
+	"""Noon UTC before the night containing a UTC datetime"""
+	day = (utc - datetime.timedelta(hours=12)).date()
+	return datetime.datetime(day.year, day.month, day.day, 12, 0, 0)
+
+
+class ChebyshevEphemeris:
+	"""
+	Direction of a body as Chebyshev series on consecutive time segments.
+	coefficients : array (segment, xyz, degree+1)
+	"""
+	def __init__(self, body, start, segment, coefficients, site=(0.0, 0.0)):
+		self.body = body
+		self.start = np.datetime64(start, 'us')
+		self.segment = float(segment)
+		self.coefficients = np.asarray(coefficients)
+		self.site = tuple(site)
+
+	def __repr__(self):
+		return "ChebyshevEphemeris %s from %s (%u segments)"%(self.body, self.start, len(self.coefficients))
+
+	@property
+	def end(self):
+		return self.start + np.timedelta64(int(1e6*self.segment*len(self.coefficients)), 'us')
+
+	def covers(self, utc):
+		"""Check if all the UTC datetimes are inside the ephemeris"""
+		t = elapsed_seconds(utc, self.start)
+		return bool(np.all(t >= 0) and np.all(t <= self.segment*len(self.coefficients)))
+
+	def radec(self, utc):
+		"""RA-DEC [degree] at UTC datetimes"""
+		t = elapsed_seconds(utc, self.start) / self.segment
+		i = np.clip(np.floor(t).astype(int), 0, len(self.coefficients)-1)
+		x = 2*(t - i) - 1
+		c = self.coefficients[i]
+		x = x[..., np.newaxis]
+		b1 = np.zeros(c.shape[:-1])
+		b2 = np.zeros(c.shape[:-1])
+		for k in range(c.shape[-1]-1, 0, -1):
+			b1, b2 = c[...,k] + 2*x*b1 - b2, b1
+		p = c[...,0] + x*b1 - b2
+		ra = np.degrees(np.arctan2(p[...,1], p[...,0])) % 360
+		dec = np.degrees(np.arctan2(p[...,2], np.hypot(p[...,0], p[...,1])))
+		return ra, dec
+
+	def save(self, filename):
+		os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+		np.savez(filename, body=self.body, start=self.start, segment=self.segment,
+				coefficients=self.coefficients, site=np.array(self.site))
+
+	@classmethod
+	def load(cls, filename):
+		with np.load(filename) as data:
+			return cls(str(data['body']), data['start'], float(data['segment']), data['coefficients'], tuple(data['site']))
+
+
+def fit_ephemeris(body, start, end, longitude_deg, latitude_deg, segment=None, degree=EPHEMERIS_DEGREE):
+	"""Compute a body direction with astropy between two UTC datetimes and fit it"""
+	body = body.lower()
+	if body not in BODIES:
+		raise AstrocomError('Unknown solar system body <%s>'%body)
+	if segment is None:
+		segment = EPHEMERIS_SEGMENT.get(body, EPHEMERIS_DEFAULT_SEGMENT)
+	init_astropy()
+	from astropy.coordinates import EarthLocation, ICRS, UnitSphericalRepresentation, get_body
+	from astropy.time import Time
+	from astropy import units as _u
+	nb_segment = max(1, int(np.ceil((end-start).total_seconds()/segment)))
+	nb_node = 2*(degree+1)
+	x = np.cos(np.pi*(np.arange(nb_node)+0.5)/nb_node) # Chebyshev nodes in [-1,1]
+	offsets = (np.arange(nb_segment)[:,np.newaxis] + (x+1)/2)*segment
+	location = EarthLocation(lat=latitude_deg*_u.deg, lon=longitude_deg*_u.deg)
+	sc = get_body(body, Time(start, scale='utc') + offsets.ravel()*_u.s, location) # apparent (GCRS)
+	# without distance, the origin stays at the observer and only aberration and deflection are removed
+	sc = sc.realize_frame(sc.represent_as(UnitSphericalRepresentation)).transform_to(ICRS())
+	xyz = sc.cartesian.xyz.value.T.reshape(offsets.shape + (3,)) # (segment, node, xyz)
+	coefficients = np.empty((nb_segment, 3, degree+1))
+	for s in range(nb_segment):
+		coefficients[s] = np.polynomial.chebyshev.chebfit(x, xyz[s], degree).T
+	return ChebyshevEphemeris(body, start, segment, coefficients, site=(longitude_deg, latitude_deg))
+
+
+def night_ephemeris(body, longitude_deg, latitude_deg, utc=None, directory=EPHEMERIS_DIR):
+	"""Ephemeris of the night containing a UTC datetime or clock, from the disk cache when available"""
+	start = night_start(resolve_utc(utc))
+	filename = os.path.join(directory, '%s_%s_%+07.2f_%+06.2f_v%u.npz'%(body.lower(), start.strftime('%Y%m%d'), longitude_deg, latitude_deg, EPHEMERIS_VERSION))
+	if os.path.exists(filename):
+		return ChebyshevEphemeris.load(filename)
+	ephem = fit_ephemeris(body, start, start + datetime.timedelta(seconds=NIGHT_DURATION), longitude_deg, latitude_deg)
+	ephem.save(filename)
+	return ephem
+
+
+class BodyPosition(RaDec):
+	"""RA-DEC [degree] of a body at one UTC instant, kept without rounding to seconds"""
+	def __init__(self, ra_deg, dec_deg, utc=None):
+		super().__init__(ra_deg, dec_deg)
+		self._ra_degree = ra_deg
+		self._dec_degree = dec_deg
+		self.utc = utc
+
+	@property
+	def ra_degree(self):
+		return self._ra_degree
+
+	@property
+	def dec_degree(self):
+		return self._dec_degree
+
+
+class SolarSystemBody(BodyPosition):
+	"""
+	A moving target usable as RaDec. Its RA-DEC are the coordinates at creation
+	(clock time); at(epoch) evaluates them once at the time of an Epoch.
+	The ephemeris of the night is loaded (or computed) at the first use.
+	"""
+	def __init__(self, name, longitude_deg, latitude_deg, clock=DEFAULT_CLOCK, directory=EPHEMERIS_DIR):
+		if name.lower() not in BODIES:
+			raise AstrocomError('Unknown solar system body <%s>'%name)
+		self.name = name.lower()
+		self.longitude_deg = longitude_deg
+		self.latitude_deg = latitude_deg
+		self.clock = clock
+		self.directory = directory
+		self._ephemeris = None
+		utc = resolve_utc(clock)
+		super().__init__(*self.radec_degree(utc), utc=utc)
+
+	def __repr__(self):
+		return "%s %s %s"%(self.name.capitalize(), self.ra_str, self.dec_str)
+
+	def radec_degree(self, utc=None):
+		"""RA-DEC [degree] at a UTC datetime (clock time by default)"""
+		if utc is None:
+			utc = self.clock
+		utc = resolve_utc(utc)
+		if (self._ephemeris is None) or not self._ephemeris.covers(utc):
+			self._ephemeris = night_ephemeris(self.name, self.longitude_deg, self.latitude_deg, utc=utc, directory=self.directory)
+		ra, dec = self._ephemeris.radec(utc)
+		return float(ra), float(dec)
+
+	def at(self, epoch):
+		"""Position of the body at the time of an Epoch"""
+		return BodyPosition(*self.radec_degree(epoch.utc), utc=epoch.utc)
+
+
+def find_body(name, mount_position, directory=EPHEMERIS_DIR):
+	"""Get a SolarSystemBody at the mount location, None if the name is not a body"""
+	if name.lower() not in BODIES:
+		return None
+	return SolarSystemBody(name, mount_position.longitude_degree, mount_position.latitude_degree,
+						clock=mount_position.clock, directory=directory)
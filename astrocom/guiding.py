@@ -0,0 +1,300 @@
+"""
+Autoguiding from a stream of 2-D frames.
+
+A frame source is any iterable of (timestamp, frame) where frame is a 2-D
+numpy array. The guide star is found once on the full frame, then only a
+region of interest (ROI) around it is read: its sub-pixel centroid gives
+the RA-DEC error, turned into rate corrections of MountSW.set_track_rate
+(one step period command per axis, as long as the direction is kept).
+"""
+
+import os
+import glob
+import time
+import numpy as np
+from astrocom import logger, AstrocomError
+from astrocom.stats import Stats
+
+SIDERAL_RATE_ARCSEC = 15.041 # arcsec/second
+GUIDE_ROI = 32 # pixel, ROI width
+GUIDE_BUDGET = 0.05 # second, latency budget per frame
+GUIDE_MAX_RATE = 0.9 # maximal rate offset, in sideral rate
+
+
+### FRAME SOURCES
+class FileFrameSource:
+	"""Frames read from files (.npy or .fits) matching a glob pattern, in name order"""
+	def __init__(self, pattern, period=None):
+		self.filenames = sorted(glob.glob(pattern))
+		self.period = period # seconds between frames, None for file modification times
+
+	def __len__(self):
+		return len(self.filenames)
+
+	def _load(self, filename):
+		if filename.lower().endswith(('.fits', '.fit')):
+			from astropy.io import fits # only needed for FITS files
+			return np.asarray(fits.getdata(filename), dtype=float)
+		return np.load(filename)
+
+	def __iter__(self):
+		for i, filename in enumerate(self.filenames):
+			tstamp = os.path.getmtime(filename) if self.period is None else i*self.period
+			yield tstamp, self._load(filename)
+
+
+class SyntheticFrameSource:
+	"""
+	Frames of Gaussian stars drifting at a constant speed [pixel/second], with noise.
+	The offset of the mount corrections can be fed back with `shift`.
+	"""
+	def __init__(self, shape=(240, 320), stars=None, drift=(0.0, 0.0), fwhm=3.0, noise=5.0,
+				background=100.0, period=0.5, nb_frame=100, seed=0):
+		self.shape = shape
+		if stars is None: # (x, y, flux)
+			stars = [(shape[1]/2+0.3, shape[0]/2-0.2, 5e4), (shape[1]/4, shape[0]/3, 1e4)]
+		self.stars = np.array(stars, dtype=float)
+		self.drift = np.array(drift, dtype=float)
+		self.sigma = fwhm/2.3548
+		self.noise = noise
+		self.background = background
+		self.period = period
+		self.nb_frame = nb_frame
+		self.offset = np.zeros(2)
+		self._rng = np.random.default_rng(seed)
+
+	def shift(self, dx, dy):
+		"""Move all stars (e.g. as a reaction to a mount correction)"""
+		self.offset += (dx, dy)
+
+	def position(self, tstamp):
+		"""Position of the first star at a time"""
+		return self.stars[0,:2] + self.drift*tstamp + self.offset
+
+	def render(self, tstamp):
+		"""Render a frame (separable Gaussians)"""
+		x = np.arange(self.shape[1])
+		y = np.arange(self.shape[0])
+		pos = self.stars[:,:2] + self.drift*tstamp + self.offset
+		gx = np.exp(-0.5*((x[np.newaxis,:] - pos[:,0:1])/self.sigma)**2)
+		gy = np.exp(-0.5*((y[np.newaxis,:] - pos[:,1:2])/self.sigma)**2)
+		amplitude = self.stars[:,2]/(2*np.pi*self.sigma**2)
+		frame = np.einsum('s,sy,sx->yx', amplitude, gy, gx) + self.background
+		return frame + self._rng.normal(0, self.noise, self.shape)
+
+	def __iter__(self):
+		for i in range(self.nb_frame):
+			tstamp = i*self.period
+			yield tstamp, self.render(tstamp)
+
+
+### DETECTION and CENTROIDING
+def background_level(frame, step=4):
+	"""Background and noise from a subsampled frame (median and MAD)"""
+	sample = frame[::step, ::step]
+	median = np.median(sample)
+	return median, 1.4826*np.median(np.abs(sample - median))
+
+
+def detect_stars(frame, threshold=5.0, max_star=10, border=4):
+	"""
+	Find local maxima above threshold*noise.
+	Return an array (star, [x, y, peak]) sorted by decreasing peak.
+	"""
+	frame = np.asarray(frame, dtype=float)
+	median, noise = background_level(frame)
+	data = frame - median
+	core = data[1:-1,1:-1]
+	peak = core > threshold*max(noise, 1e-12)
+	for dy in (-1, 0, 1):
+		for dx in (-1, 0, 1):
+			if dx or dy:
+				peak &= core >= data[1+dy:data.shape[0]-1+dy, 1+dx:data.shape[1]-1+dx]
+	y, x = np.nonzero(peak)
+	y += 1
+	x += 1
+	keep = (x >= border) & (y >= border) & (x < frame.shape[1]-border) & (y < frame.shape[0]-border)
+	x, y = x[keep], y[keep]
+	order = np.argsort(data[y, x])[::-1][:max_star]
+	return np.stack((x[order], y[order], data[y[order], x[order]]), axis=-1).astype(float)
+
+
+def centroid(frame, x, y, radius=4):
+	"""
+	Sub-pixel centroids (center of mass above the local background) of boxes
+	centered on integer positions. x and y can be arrays.
+	"""
+	frame = np.asarray(frame, dtype=float)
+	x = np.atleast_1d(np.round(x).astype(int))
+	y = np.atleast_1d(np.round(y).astype(int))
+	offsets = np.arange(-radius, radius+1)
+	ix = np.clip(x[:,np.newaxis,np.newaxis] + offsets[np.newaxis,np.newaxis,:], 0, frame.shape[1]-1)
+	iy = np.clip(y[:,np.newaxis,np.newaxis] + offsets[np.newaxis,:,np.newaxis], 0, frame.shape[0]-1)
+	boxes = frame[iy, ix]
+	edge = np.concatenate((boxes[:,0,:], boxes[:,-1,:], boxes[:,:,0], boxes[:,:,-1]), axis=1)
+	boxes = np.clip(boxes - np.median(edge, axis=1)[:,np.newaxis,np.newaxis], 0, None)
+	flux = np.sum(boxes, axis=(1,2))
+	with np.errstate(invalid='ignore', divide='ignore'):
+		cx = x + np.sum(boxes*offsets[np.newaxis,np.newaxis,:], axis=(1,2))/flux
+		cy = y + np.sum(boxes*offsets[np.newaxis,:,np.newaxis], axis=(1,2))/flux
+	return cx, cy, flux
+
+
+### GUIDING
+class GuideCalibration:
+	"""
+	Camera orientation: pixel scale [arcsec/pixel], angle of the RA axis on
+	the sensor [degree] and DEC flip (e.g. after a meridian flip).
+	"""
+	def __init__(self, scale=1.0, angle=0.0, flip_dec=False):
+		self.scale = scale
+		self.angle = angle
+		self.flip_dec = flip_dec
+
+	def __repr__(self):
+		return "GuideCalibration %.2f\"/px %.1f°%s"%(self.scale, self.angle, ' flipped' if self.flip_dec else '')
+
+	def pixel_to_radec(self, dx, dy):
+		"""Convert a pixel offset to a RA-DEC offset [arcsec]"""
+		a = np.radians(self.angle)
+		ra = (np.cos(a)*dx + np.sin(a)*dy)*self.scale
+		dec = (-np.sin(a)*dx + np.cos(a)*dy)*self.scale
+		return ra, -dec if self.flip_dec else dec
+
+
+class Guider:
+	"""
+	Closed loop guiding of a MountSW from frames.
+	mode 'rate'  : corrections change the tracking rates, sent only when they change
+	mode 'pulse' : the maximal rate offset is applied during the time removing the
+	               error fraction (at most 80% of the frame period), then tracking resumes
+	"""
+	def __init__(self, mount, calibration=None, roi=GUIDE_ROI, gain_ra=0.7, gain_dec=0.5,
+				max_rate=GUIDE_MAX_RATE, budget=GUIDE_BUDGET, mode='rate', threshold=5.0):
+		if mode not in ['rate', 'pulse']:
+			raise AstrocomError('Unknown guiding mode <%s>'%mode)
+		self.mount = mount
+		self.calibration = GuideCalibration() if calibration is None else calibration
+		self.roi = roi
+		self.gain_ra = gain_ra
+		self.gain_dec = gain_dec
+		self.max_rate = max_rate
+		self.budget = budget
+		self.mode = mode
+		self.threshold = threshold
+		self.reference = None # locked position of the guide star [pixel]
+		self.position = None # last position of the guide star [pixel]
+		self.rates = (1.0, 0.0) # current RA-DEC rates [sideral]
+		self.errors = [] # (RA, DEC) [arcsec]
+		self.nb_over_budget = 0
+		self.nb_lost = 0
+		self.stats = Stats()
+		self._last_tstamp = None
+
+	def __repr__(self):
+		return "Guider %s locked at %s"%(self.mode, self.reference)
+
+	def acquire(self, frame):
+		"""Lock on the brightest star of the full frame"""
+		stars = detect_stars(frame, threshold=self.threshold)
+		if len(stars) == 0:
+			raise AstrocomError('No guide star found')
+		cx, cy, _ = centroid(frame, stars[0,0], stars[0,1])
+		self.reference = np.array([cx[0], cy[0]])
+		self.position = self.reference.copy()
+		logger.info('Guide star locked at (%.2f, %.2f)'%tuple(self.reference))
+		return self.reference
+
+	def _measure(self, frame):
+		"""Centroid of the guide star in the ROI around its last position (None if lost)"""
+		half = self.roi//2
+		x0 = int(np.clip(round(self.position[0]) - half, 0, frame.shape[1]-self.roi))
+		y0 = int(np.clip(round(self.position[1]) - half, 0, frame.shape[0]-self.roi))
+		roi = np.asarray(frame[y0:y0+self.roi, x0:x0+self.roi], dtype=float)
+		iy, ix = np.unravel_index(np.argmax(roi), roi.shape)
+		cx, cy, flux = centroid(roi, ix, iy)
+		_, noise = background_level(roi, step=1)
+		if not (flux[0] > self.threshold*noise*self.roi**0.5 and np.isfinite(cx[0])):
+			return None
+		return np.array([cx[0] + x0, cy[0] + y0])
+
+	def correction(self, ra_err, dec_err, period):
+		"""Rates [sideral] removing a fraction (gain) of the error during the next period"""
+		period = max(period, 1e-3)
+		ra_offset = np.clip(-self.gain_ra*ra_err/period/SIDERAL_RATE_ARCSEC, -self.max_rate, self.max_rate)
+		dec_rate = np.clip(-self.gain_dec*dec_err/period/SIDERAL_RATE_ARCSEC, -self.max_rate, self.max_rate)
+		return round(float(1.0 + ra_offset), 2), round(float(dec_rate), 2)
+
+	def _apply(self, rates):
+		"""Send the rates that changed (a step period only, unless the direction changes)"""
+		if rates[0] != self.rates[0]:
+			self.mount.set_track_rate(1, rates[0])
+		if rates[1] != self.rates[1]:
+			self.mount.set_track_rate(2, rates[1])
+		self.rates = rates
+
+	def _pulse(self, ra_err, dec_err, period, arrival):
+		"""Guide pulses on both axes, return the latency until the pulses start"""
+		speed = self.max_rate*SIDERAL_RATE_ARCSEC
+		durations = np.minimum(np.abs([self.gain_ra*ra_err, self.gain_dec*dec_err])/speed, 0.8*period)
+		self._apply((round(1.0 - np.sign(ra_err)*self.max_rate*(durations[0]>0), 2),
+					round(-np.sign(dec_err)*self.max_rate*(durations[1]>0), 2)))
+		latency = time.perf_counter() - arrival
+		time.sleep(durations.min())
+		self._apply((1.0, self.rates[1]) if durations[0] <= durations[1] else (self.rates[0], 0.0))
+		time.sleep(durations.max() - durations.min())
+		self._apply((1.0, 0.0))
+		return latency
+
+	def process(self, tstamp, frame, arrival=None):
+		"""
+		Process one frame: measure, correct, and record the latency from the
+		frame arrival (perf_counter, default now) to the correction sent.
+		Return the RA-DEC error [arcsec] or None if the star is lost.
+		"""
+		if arrival is None:
+			arrival = time.perf_counter()
+		if self.reference is None:
+			self.acquire(frame)
+			self._last_tstamp = tstamp
+			return 0.0, 0.0
+		period = tstamp - self._last_tstamp if self._last_tstamp is not None else 1.0
+		self._last_tstamp = tstamp
+		position = self._measure(frame)
+		if position is None:
+			self.nb_lost += 1
+			self._apply((1.0, 0.0)) # back to plain tracking
+			self.stats.increment('guide.lost')
+			return None
+		self.stats.add_latency('guide.measure', time.perf_counter() - arrival)
+		self.position = position
+		ra_err, dec_err = [float(e) for e in self.calibration.pixel_to_radec(*(position - self.reference))]
+		self.errors.append((ra_err, dec_err))
+		if self.mode == 'rate':
+			self._apply(self.correction(ra_err, dec_err, period))
+			latency = time.perf_counter() - arrival
+		else:
+			latency = self._pulse(ra_err, dec_err, period, arrival)
+		self.stats.add_latency('guide.frame', latency)
+		if latency > self.budget:
+			self.nb_over_budget += 1
+			self.stats.increment('guide.over_budget')
+		return ra_err, dec_err
+
+	def run(self, source, callback=None):
+		"""Guide on all the frames of a source, callback(tstamp, error) after each frame"""
+		for tstamp, frame in source:
+			error = self.process(tstamp, frame)
+			if callback is not None:
+				callback(tstamp, error)
+		self._apply((1.0, 0.0))
+		return self.report()
+
+	def report(self):
+		"""Guiding error [arcsec] and latency [second] summary"""
+		errors = np.array(self.errors).reshape(-1, 2)
+		latency = self.stats.latency.get('guide.frame')
+		return {'nb_frame':len(errors), 'nb_lost':self.nb_lost, 'nb_over_budget':self.nb_over_budget,
+				'rms_ra':float(np.sqrt(np.mean(errors[:,0]**2))) if len(errors) else 0.0,
+				'rms_dec':float(np.sqrt(np.mean(errors[:,1]**2))) if len(errors) else 0.0,
+				'latency':latency.as_dict() if latency is not None else {}}
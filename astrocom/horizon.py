@@ -0,0 +1,69 @@
+"""
+Local horizon: altitude limit as a function of azimuth (trees, buildings...).
+
+The mask is read from a text file of (azimuth, altitude) points in degrees,
+one per line, interpolated linearly around the circle and stored as a lookup
+table on a regular azimuth grid. Checking a whole catalog or a time grid is
+then one indexing operation on arrays.
+
+	# azimuth altitude
+	0    15
+	90   30
+	180  10
+	270  25
+"""
+
+import os
+import numpy as np
+from astrocom import AstrocomError, CACHE_DIR
+
+HORIZON_FILE = os.path.join(CACHE_DIR, 'horizon.txt')
+HORIZON_STEP = 0.1 # degree of azimuth between two entries of the table
+
+
+class HorizonMask:
+	"""Altitude limit [degree] on a regular azimuth grid, never below alt_min"""
+	def __init__(self, azimuth_deg, altitude_deg, alt_min=0.0, step=HORIZON_STEP):
+		azimuth_deg = np.asarray(azimuth_deg, dtype=float) % 360
+		altitude_deg = np.asarray(altitude_deg, dtype=float)
+		if (azimuth_deg.size == 0) or (azimuth_deg.shape != altitude_deg.shape):
+			raise AstrocomError('Horizon needs as many azimuths as altitudes')
+		order = np.argsort(azimuth_deg)
+		self.azimuth = azimuth_deg[order]
+		self.altitude = altitude_deg[order]
+		self.alt_min = alt_min
+		self.step = step
+		grid = np.arange(int(round(360/step)))*step
+		self.table = np.maximum(np.interp(grid, self.azimuth, self.altitude, period=360), alt_min)
+
+	def __repr__(self):
+		return "HorizonMask %u points, %.0f° to %.0f°"%(len(self.azimuth), self.table.min(), self.table.max())
+
+	@classmethod
+	def flat(cls, alt_min=0.0):
+		"""Same altitude limit in all directions"""
+		return cls([0.0], [alt_min], alt_min=alt_min)
+
+	@classmethod
+	def load(cls, filename=HORIZON_FILE, alt_min=0.0):
+		"""Read (azimuth, altitude) points from a text file, lines starting with # are ignored"""
+		try:
+			points = np.loadtxt(filename, comments='#', ndmin=2)
+		except (OSError, ValueError):
+			raise AstrocomError('Cannot read horizon <%s>'%filename)
+		if points.shape[1] != 2:
+			raise AstrocomError('Horizon <%s> needs two columns (azimuth altitude)'%filename)
+		return cls(points[:,0], points[:,1], alt_min=alt_min)
+
+	def save(self, filename=HORIZON_FILE):
+		os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+		np.savetxt(filename, np.column_stack((self.azimuth, self.altitude)), fmt='%.2f', header='azimuth altitude')
+
+	def limit(self, az_deg):
+		"""Altitude limit [degree] at azimuths (arrays accepted)"""
+		index = np.round(np.asarray(az_deg, dtype=float)/self.step).astype(int) % len(self.table)
+		return self.table[index]
+
+	def visible(self, alt_deg, az_deg):
+		"""True where the ALT-AZ directions are above the horizon (arrays are broadcast)"""
+		return np.asarray(alt_deg) >= self.limit(az_deg)
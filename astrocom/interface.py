@@ -3,36 +3,176 @@ User interface: command line (CLI) or graphical (GUI)
 """
 
 import cmd
+import sys
+import logging
+import time
 import datetime
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import ttk
-from astrocom import AstrocomError
+from astrocom import AstrocomError, flush_log, set_console_level
 from astrocom.astro import read_bsc, cardinal_point, MountPosition, RaDec, print_catalog, catalog_brightest
-from astrocom.serialport import MountSW
+from astrocom.serialport import MountSW, print_stats, reset_stats, load_session, save_session, SESSION_FILE
+from astrocom.clock import DEFAULT_CLOCK
+from astrocom.ephemeris import find_body
+from astrocom.platesolve import solve_frame
+from astrocom.horizon import HorizonMask
+from astrocom.query import CatalogIndex, query, parse_query
+from astrocom.skychart import SkyChart, to_ppm, CHART_PERIOD, CHART_MARGIN
 
 #############################################
 ###        COMMAND LINE INTERFACE
 #############################################
 
+class EXIT:
+	"""Exit codes of the batch mode"""
+	OK = 0
+	COMMAND_ERROR = 1
+	UNKNOWN_COMMAND = 2
+	TIMEOUT = 3
+	SCRIPT_ERROR = 4
+
+
+def _load_horizon(horizon):
+	"""HorizonMask from a mask, a file name or None (flat horizon)"""
+	if horizon is None:
+		return HorizonMask.flat()
+	if isinstance(horizon, str):
+		return HorizonMask.load(horizon)
+	return horizon
+
+
+def _parse(cast, text, what):
+	"""Convert a command argument with cast, raise AstrocomError if invalid"""
+	try:
+		return cast(text)
+	except (ValueError, TypeError):
+		raise AstrocomError('Invalid %s <%s>'%(what, text))
+
+
+def _parse_radec(ra, dec):
+	"""RaDec of two command arguments, raise AstrocomError if invalid"""
+	try:
+		return RaDec(ra, dec)
+	except (ValueError, IndexError):
+		raise AstrocomError('Invalid coordinates <%s %s>'%(ra, dec))
+
+
 class MountCLI(cmd.Cmd):
 	intro = "\n".join(("","="*35,"Welcome to the ASTROCOM command line.","Type help or ? to list commands.","="*35,""))
 	prompt = "(astrocom) "
 	
-	def __init__(self, portname, longitude, latitude):
+	def __init__(self, portname, longitude, latitude, clock=DEFAULT_CLOCK, quiet=False, session_file=SESSION_FILE, horizon=None, **kwargs):
 		super().__init__()
-		self.catalog = read_bsc()
-		self.mount_position = MountPosition(longitude, latitude)
-		self.mount_serial = MountSW(portname)
+		self.quiet = quiet
+		if quiet:
+			set_console_level(logging.WARNING) # errors and warnings only
+		self.exit_code = EXIT.OK
+		self.session_file = session_file
+		self.horizon = _load_horizon(horizon)
+		self._catalog_index = None # built on the first query
+		# read the catalog while the serial port is opening
+		with ThreadPoolExecutor(max_workers=1) as executor:
+			catalog_future = executor.submit(read_bsc)
+			self.mount_position = MountPosition(longitude, latitude, clock=clock)
+			self.mount_serial = MountSW(portname, **kwargs)
+			self.catalog = catalog_future.result()
 		if latitude[0]>=0:
 			self.mount_serial.north_south = self.mount_serial.NORTH
 		else:
 			self.mount_serial.north_south = self.mount_serial.SOUTH
+		self.warm = self._warm_start(portname)
+	
+	def _site(self):
+		return [round(self.mount_position.longitude_degree, 4), round(self.mount_position.latitude_degree, 4)]
+	
+	def _warm_start(self, portname):
+		"""Reattach to the mount of the last session (same port and site) without initialization"""
+		if (portname is None) or (self.session_file is None):
+			return False
+		session = load_session(self.session_file, portname=portname)
+		if (session is None) or (session.get('site') != self._site()):
+			return False
+		try:
+			return self.mount_serial.warm_start(session)
+		except AstrocomError:
+			return False
+	
+	def _save_session(self):
+		"""Save the state of the mount for a warm start of the next session"""
+		if (self.mount_serial.portname is None) or (self.session_file is None):
+			return
+		try:
+			save_session(self.mount_serial.session_state(site=self._site()), self.session_file)
+		except AstrocomError:
+			pass
+	
+	def precmd(self, line):
+		"""Reset the exit code before each command"""
+		self.exit_code = EXIT.OK
+		return super().precmd(line)
 	
 	def postcmd(self, *args, **kwargs):
 		"""Print empty line at end of each command"""
-		print()
+		flush_log() # messages of the command before the prompt
+		if not self.quiet:
+			print()
 		return super().postcmd(*args,**kwargs)
 	
+	def default(self, line):
+		"""Unknown command"""
+		self.exit_code = EXIT.UNKNOWN_COMMAND
+		print('*** Unknown command: %s'%line)
+	
+	def _show_status(self):
+		"""Print status after a command, unless quiet"""
+		if not self.quiet:
+			self.do_status(None)
+	
+	def run_batch(self, lines, stop_on_error=True):
+		"""
+		Run commands from an iterable of lines (script file, stdin...).
+		Empty lines and lines starting with # are ignored.
+		Return the exit code of the first failing command, or EXIT.OK.
+		"""
+		exit_code = EXIT.OK
+		for line in lines:
+			line = line.strip()
+			if (len(line)==0) or line.startswith('#'):
+				continue
+			line = self.precmd(line)
+			stop = self.onecmd(line)
+			stop = self.postcmd(stop, line)
+			if self.exit_code != EXIT.OK:
+				exit_code = exit_code or self.exit_code
+				if stop_on_error:
+					break
+			if stop:
+				break
+		return exit_code
+	
+	def run_script(self, filename, stop_on_error=True):
+		"""Run a command script, '-' to read stdin. Return the exit code."""
+		if filename == '-':
+			return self.run_batch(sys.stdin, stop_on_error=stop_on_error)
+		try:
+			with open(filename, 'r') as myfile:
+				return self.run_batch(myfile, stop_on_error=stop_on_error)
+		except OSError:
+			print('*** Cannot read script <%s>'%filename)
+			return EXIT.SCRIPT_ERROR
+	
+	def _find_target(self, name):
+		"""Find a solar system body or a star of the catalog by name (or HR number)"""
+		body = find_body(name, self.mount_position)
+		if body is not None:
+			return body
+		for s in self.catalog:
+			if name.lower() in ['hr%u'%s.hr, s.name.lower()]:
+				return s
+		raise AstrocomError('Star <%s> is not in the catalog'%name)
+	
 	def do_help(self, _):
 		"""
 		Print help on functions
@@ -55,7 +195,48 @@ class MountCLI(cmd.Cmd):
 		arg = arg.split()
 		if len(arg)==0:
 			arg = ['15']
-		print_catalog(self.catalog, int(arg[0]), self.mount_position.latitude, self.mount_position.longitude, bicolor=True)
+		try:
+			nb = _parse(int, arg[0], 'number of stars')
+		except AstrocomError:
+			self.exit_code = EXIT.COMMAND_ERROR
+			return
+		print_catalog(self.catalog, nb, self.mount_position.latitude, self.mount_position.longitude, bicolor=True, utc=self.mount_position.clock, horizon=self.horizon)
+        
+	def do_horizon(self, arg):
+		"""
+		Load the local horizon from a file of azimuth-altitude points, or print it
+		> horizon [file]
+		"""
+		arg = arg.split()
+		try:
+			if len(arg)==1:
+				self.horizon = HorizonMask.load(arg[0])
+			for az in range(0, 360, 45):
+				print('%2s %3u°  %4.1f°'%(cardinal_point(az), az, self.horizon.limit(az)))
+		except AstrocomError:
+			self.exit_code = EXIT.COMMAND_ERROR
+        
+	def do_query(self, arg):
+		"""
+		Search the catalog, all words must match (a number sets the count)
+		> query [vmag<3 sp=K con=Ori alt>20 az=90:180 ha<30 near=ra,dec,r visible nb]
+		"""
+		try:
+			predicate, limit = parse_query(arg, horizon=self.horizon)
+			if self._catalog_index is None:
+				self._catalog_index = CatalogIndex(self.catalog)
+			epoch = self.mount_position.snapshot()
+			stars = query(self._catalog_index, predicate, epoch=epoch, limit=limit)
+		except AstrocomError:
+			self.exit_code = EXIT.COMMAND_ERROR
+			return
+		if len(stars) == 0:
+			print('No star found')
+			return
+		alt, az = epoch.radec_to_altaz(np.array([s.ra_degree for s in stars]), np.array([s.dec_degree for s in stars]))
+		print(stars[0].header + '  %4s  %2s'%('ALT','AZ'))
+		for i in range(len(stars)):
+			print(stars[i].__str__() + '  %3d°  %2s'%(alt[i], cardinal_point(az[i])))
         
 	def do_init(self, _):
 		"""
@@ -65,18 +246,20 @@ class MountCLI(cmd.Cmd):
 		try:
 			self.mount_serial.init_mount()
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
 		else:
-			self.do_status(None)
+			self._save_session()
+			self._show_status()
 		
 	def do_time(self, arg):
 		"""
 		Print current time
 		> time
 		"""
-		dt_local = datetime.datetime.now()
-		dt_utc = dt_local.utcnow()
-		dt_sid = self.mount_position.sideral_time
+		epoch = self.mount_position.snapshot()
+		dt_utc = epoch.utc
+		dt_local = dt_utc.replace(tzinfo=datetime.timezone.utc).astimezone()
+		dt_sid = epoch.sideral_time
 		print('LOCAL  : %02u:%02u:%02u'%(dt_local.hour, dt_local.minute, dt_local.second))
 		print('UTC    : %02u:%02u:%02u'%(dt_utc.hour, dt_utc.minute, dt_utc.second))
 		print('SIDERAL: %02u:%02u:%02u'%dt_sid.hms)
@@ -88,9 +271,9 @@ class MountCLI(cmd.Cmd):
 		"""
 		arg = arg.split()
 		try:
-			self.mount_serial.move_ra(int(arg[0]))
+			self.mount_serial.move_ra(_parse(int, ' '.join(arg[:1]), 'speed'))
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
 
 	def do_dec(self, arg):
 		"""
@@ -99,9 +282,9 @@ class MountCLI(cmd.Cmd):
 		"""
 		arg = arg.split()
 		try:
-			self.mount_serial.move_dec(int(arg[0]))
+			self.mount_serial.move_dec(_parse(int, ' '.join(arg[:1]), 'speed'))
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
 		
 	def do_track(self, _):
 		"""
@@ -111,7 +294,7 @@ class MountCLI(cmd.Cmd):
 		try:
 			self.mount_serial.track()
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
 		
 	def do_status(self, _):
 		"""
@@ -121,13 +304,14 @@ class MountCLI(cmd.Cmd):
 		try:
 			status_1 = self.mount_serial.get_axis_status_as_str(1)
 			status_2 = self.mount_serial.get_axis_status_as_str(2)
-			pos = self.mount_position.telescope_to_radec(self.mount_serial.get_position())
-			goto = self.mount_position.telescope_to_radec(self.mount_serial.get_goto())
+			epoch = self.mount_position.snapshot()
+			pos = self.mount_position.telescope_to_radec(self.mount_serial.get_position(), epoch=epoch)
+			goto = self.mount_position.telescope_to_radec(self.mount_serial.get_goto(), epoch=epoch)
 			print("AXIS POSITION      GOTO  MOVING  MODE    DIR SPEED")
 			print("""RA   %s  %s %s"""%(pos.ra_str, goto.ra_str, status_1.lower()))
 			print("""DEC %s %s %s"""%(pos.dec_str, goto.dec_str, status_2.lower()))
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
     
 	def do_set(self, arg):
 		"""
@@ -135,58 +319,74 @@ class MountCLI(cmd.Cmd):
 		> set [name ra dec]
 		"""
 		arg = arg.split()
+		epoch = self.mount_position.snapshot()
 		try:
 			if len(arg)==1:
 				name = arg[0]
 				if name.lower() == 'home':
 					star = RaDec(0,0)
-				for s in self.catalog:
-					if name.lower() in ['hr%u'%s.hr, s.name.lower()]:
-						star = s
-						break
-				if star is None:
-					raise AstrocomError('Star <%s> is not in the catalog'%name)
-				alt,_ = star.altaz(self.mount_position.latitude, self.mount_position.longitude)
+				else:
+					star = self._find_target(name)
 			elif len(arg)==2:
-				star = RaDec(arg[0], arg[1])
+				star = _parse_radec(arg[0], arg[1])
 			else:
 				raise AstrocomError('Set does not accept more than 2 elements')
-			self.mount_serial.set_position(*self.mount_position.radec_to_telescope(star))
-			self.do_status(None)
+			self.mount_serial.set_position(*self.mount_position.radec_to_telescope(star, epoch=epoch))
+			self._save_session()
+			self._show_status()
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
+    
+	def do_solve(self, arg):
+		"""
+		Identify a frame (.npy) and set the current position on it
+		> solve [file scale]
+		"""
+		arg = arg.split()
+		epoch = self.mount_position.snapshot()
+		try:
+			if len(arg)!=2:
+				raise AstrocomError('Solve needs a frame file and a pixel scale [arcsec]')
+			try:
+				frame = np.load(arg[0])
+			except (OSError, ValueError):
+				raise AstrocomError('Cannot read frame <%s>'%arg[0])
+			solution = solve_frame(frame, _parse(float, arg[1], 'pixel scale'))
+			print(solution)
+			self.mount_serial.set_position(*self.mount_position.radec_to_telescope(solution.radec, epoch=epoch))
+			self._save_session()
+			self._show_status()
+		except AstrocomError:
+			self.exit_code = EXIT.COMMAND_ERROR
     
 	def do_goto(self, arg):
 		"""
-		Define goto position (home, HR number, star name or RA-DEC)
+		Define goto position (home, HR number, star name, moon/planet or RA-DEC)
 		> goto [hrXXXX name ra dec]
 		"""
 		arg = arg.split()
+		epoch = self.mount_position.snapshot()
 		try:
 			if len(arg)==1:
 				name = arg[0]
 				if name.lower() == 'home':
 					self.mount_serial.goto_home()
-					self.do_status(None)
+					self._show_status()
 					return
-				star = None
-				for s in self.catalog:
-					if name.lower() in ['hr%u'%s.hr, s.name.lower()]:
-						star = s
-						break
-				if star is None:
-					raise AstrocomError('Star <%s> is not in the catalog'%name)
-				alt,_ = star.altaz(self.mount_position.latitude, self.mount_position.longitude)
-				if alt<0:
-					raise AstrocomError('Star <%s> is below the horizon'%name)
+				star = self._find_target(name)
 			elif len(arg)==2:
-				star = RaDec(arg[0], arg[1])
+				name = '%s %s'%(arg[0], arg[1])
+				star = _parse_radec(arg[0], arg[1])
 			else:
 				raise AstrocomError('Goto does not accept more than 2 elements')
-			self.mount_serial.goto(*self.mount_position.radec_to_telescope(star))
-			self.do_status(None)
+			star = star.at(epoch) # a moving target is evaluated once
+			alt,az = epoch.radec_to_altaz(star.ra_degree, star.dec_degree)
+			if not self.horizon.visible(alt, az):
+				raise AstrocomError('Target <%s> is below the horizon (alt %.0f° < %.0f° at az %.0f°)'%(name, alt, self.horizon.limit(az), az))
+			self.mount_serial.goto(*self.mount_position.radec_to_telescope(star, epoch=epoch))
+			self._show_status()
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
 					
 	def do_start(self, axnb):
 		"""
@@ -194,12 +394,11 @@ class MountCLI(cmd.Cmd):
 		> start [axis]
 		"""
 		if len(axnb)==0:
-			 axnb = '3' # both axis if nothing provided
-		axnb = int(axnb)
+			axnb = '3' # both axis if nothing provided
 		try:
-			self.mount_serial.start(axnb)
+			self.mount_serial.start(_parse(int, axnb, 'axis'))
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
 	
 	def do_stop(self, axnb):
 		"""
@@ -208,17 +407,61 @@ class MountCLI(cmd.Cmd):
 		"""
 		if len(axnb)==0:
 			axnb = '3' # both axis if nothing provided
-		axnb = int(axnb)
 		try:
-			self.mount_serial.stop(axnb)
+			self.mount_serial.stop(_parse(int, axnb, 'axis'))
 		except AstrocomError:
-			pass
+			self.exit_code = EXIT.COMMAND_ERROR
 			
+	def do_wait(self, arg):
+		"""
+		Wait until motors are stopped
+		> wait [timeout]
+		"""
+		try:
+			timeout = _parse(float, arg, 'timeout') if len(arg.strip())>0 else 300
+		except AstrocomError:
+			self.exit_code = EXIT.COMMAND_ERROR
+			return
+		try:
+			self.mount_serial.wait_until_stopped(timeout=timeout)
+		except AstrocomError:
+			self.exit_code = EXIT.TIMEOUT
+			
+	def do_sleep(self, arg):
+		"""
+		Wait a given number of seconds
+		> sleep [seconds]
+		"""
+		try:
+			time.sleep(max(_parse(float, arg, 'duration'), 0))
+		except AstrocomError:
+			self.exit_code = EXIT.COMMAND_ERROR
+		
+	def do_stats(self, arg):
+		"""
+		Print communication statistics
+		> stats [reset]
+		"""
+		if arg.strip() == 'reset':
+			reset_stats()
+		else:
+			print_stats()
+			
+	def do_detach(self, arg):
+		"""
+		Exit but leave the motors running, for a warm start of the next session
+		> detach
+		"""
+		self._save_session()
+		self.mount_serial.detach()
+		return True
+	
 	def do_exit(self, arg):
 		"""
 		Exit the command line interpreter
 		> exit
         """
+		self._save_session()
 		return True
 
 
@@ -229,9 +472,10 @@ class MountCLI(cmd.Cmd):
 #############################################
 
 class MountGUI:
-	def __init__(self, portname, longitude, latitude):
+	def __init__(self, portname, longitude, latitude, clock=DEFAULT_CLOCK, horizon=None):
 		self.catalog = read_bsc()
-		self.mount_position = MountPosition(longitude, latitude)
+		self.horizon = _load_horizon(horizon)
+		self.mount_position = MountPosition(longitude, latitude, clock=clock)
 		self.mount_serial = MountSW(portname)
 		if latitude[0]>=0:
 			self.mount_serial.north_south = self.mount_serial.NORTH
@@ -246,7 +490,7 @@ class MountGUI:
 		
 		root = tk.Tk()
 		root.title("ASTROCOM")
-		root.geometry("600x550+50+50")
+		root.geometry("1030x550+50+50")
 		root.configure(bg=BCK_COLOR)
 
 		# Create a style with smaller padding (reduced height)
@@ -259,15 +503,17 @@ class MountGUI:
 		# --- Configure grid ---
 		root.columnconfigure(0, weight=1)
 		root.columnconfigure(1, weight=1)
+		root.columnconfigure(2, weight=0)
 		root.rowconfigure(0, weight=0)
 		root.rowconfigure(1, weight=1)
 		root.rowconfigure(2, weight=0)
 		
 		# Define actions
 		def status():
-			dt_local = datetime.datetime.now()
-			dt_utc = dt_local.utcnow()
-			dt_sid = self.mount_position.sideral_time
+			epoch = self.mount_position.snapshot()
+			dt_utc = epoch.utc
+			dt_local = dt_utc.replace(tzinfo=datetime.timezone.utc).astimezone()
+			dt_sid = epoch.sideral_time
 			string =         'LOCAL      %02u:%02u:%02u'%(dt_local.hour, dt_local.minute, dt_local.second)
 			string += '\n' + 'UTC          %02u:%02u:%02u'%(dt_utc.hour, dt_utc.minute, dt_utc.second)
 			string += '\n' + 'SIDERAL   %02u:%02u:%02u'%dt_sid.hms
@@ -275,25 +521,47 @@ class MountGUI:
 			try:
 				status_1 = self.mount_serial.get_axis_status_as_str(1)
 				status_2 = self.mount_serial.get_axis_status_as_str(2)
-				position_1, position_2 = self.mount_serial.get_position()
-				goto_1, goto_2 = self.mount_serial.get_goto()
-				
-				self.mount_position.hour_angle = 360*position_1 # degree
-				goto_1_str = self.mount_position.complementary_angle(360*goto_1).ra_str
-				string += '\n' + """RA   %s  %s    %s"""%(self.mount_position.ra_str, goto_1_str, status_1.lower())
-				self.mount_position.dec = 360*position_2
-				goto_2_str = RaDec(0, 360*goto_2).dec_str
-				string += '\n' + """DEC %s %s     %s"""%(self.mount_position.dec_str, goto_2_str, status_2.lower())
-					
+				pos = self.mount_position.telescope_to_radec(self.mount_serial.get_position(), epoch=epoch)
+				goto = self.mount_position.telescope_to_radec(self.mount_serial.get_goto(), epoch=epoch)
+				string += '\n' + """RA   %s  %s    %s"""%(pos.ra_str, goto.ra_str, status_1.lower())
+				string += '\n' + """DEC %s %s     %s"""%(pos.dec_str, goto.dec_str, status_2.lower())
+				move_markers(epoch, [(marker_pos, pos), (marker_goto, goto)])
 			except (AstrocomError,ValueError):
 				string += '\nRA  %15s\nDEC %15s'%('error','error')
+				move_markers(epoch, [(marker_pos, None), (marker_goto, None)])
 			lbl_status.config(text=string)
 			lbl_status.after(1000, status)
+		
+		def move_markers(epoch, markers):
+			"""Move marker items of the chart [(marker, RaDec or None)], hidden below the horizon"""
+			shown = [(marker, radec) for marker, radec in markers if radec is not None]
+			for marker, radec in markers:
+				if radec is None:
+					chart_canvas.itemconfigure(marker, state='hidden')
+			if not shown:
+				return
+			# one array conversion for all the markers
+			alt, az = epoch.radec_to_altaz(np.array([radec.ra_degree for _, radec in shown]), np.array([radec.dec_degree for _, radec in shown]))
+			for (marker, _), alt_k, az_k in zip(shown, alt, az):
+				if alt_k > 0:
+					x, y = chart.pixel(alt_k, az_k)
+					chart_canvas.coords(marker, x-MARKER, y-MARKER, x+MARKER, y+MARKER)
+					chart_canvas.itemconfigure(marker, state='normal')
+				else:
+					chart_canvas.itemconfigure(marker, state='hidden')
+		
+		def sky():
+			# the stars move slowly: one bulk redraw per period, markers are moved by status()
+			chart_image.configure(data=to_ppm(chart.render(self.mount_position.snapshot())), format='PPM')
+			chart_canvas.after(CHART_PERIOD*1000, sky)
 			
 		def bsc():
-			bright = catalog_brightest(self.catalog, len(lbl_bsc), self.mount_position.latitude, self.mount_position.longitude)
-			for i in range(len(lbl_bsc)):
+			bright = catalog_brightest(self.catalog, len(lbl_bsc), self.mount_position.latitude, self.mount_position.longitude, utc=self.mount_position.clock, horizon=self.horizon)
+			# a restrictive horizon can leave fewer stars than labels
+			for i in range(len(bright)):
 				lbl_bsc[i].config(text='%s'%bright[i])
+			for i in range(len(bright), len(lbl_bsc)):
+				lbl_bsc[i].config(text='')
 			lbl_bsc[0].after(30*1000, bsc)
 			
 		
@@ -370,8 +638,23 @@ class MountGUI:
 		lbl_status = ttk.Label(lower_middle_frame, text="", font=('calibri', 12, 'bold'), background=BCK_COLOR, foreground=TXT_COLOR, justify='left')
 		lbl_status.pack()
 		
+		# -------------------- Sky chart --------------------
+		MARKER = 6 # pixel
+		chart = SkyChart(self.catalog)
+		chart_canvas = tk.Canvas(root, width=chart.size, height=chart.size, background=BCK_COLOR, highlightthickness=0)
+		chart_canvas.grid(row=0, column=2, rowspan=3, sticky="n", padx=10, pady=10)
+		chart_image = tk.PhotoImage(width=chart.size, height=chart.size)
+		chart_canvas.create_image(0, 0, image=chart_image, anchor='nw')
+		for name, az in [('N',0), ('E',90), ('S',180), ('W',270)]:
+			x = chart.size/2 - (chart.size - CHART_MARGIN)/2*np.sin(np.radians(az)) # in the margin, East left
+			y = chart.size/2 - (chart.size - CHART_MARGIN)/2*np.cos(np.radians(az))
+			chart_canvas.create_text(x, y, text=name, fill=TXT_COLOR, font=('calibri', 9, 'bold'))
+		marker_goto = chart_canvas.create_oval(0, 0, 0, 0, outline='orange', width=2, state='hidden')
+		marker_pos = chart_canvas.create_oval(0, 0, 0, 0, outline='red', width=2, state='hidden')
+		
 		### START GUI ###
 		bsc() # first call to BSC
+		sky() # first call to sky chart
 		status() # first call to status
 		root.mainloop()
 
@@ -0,0 +1,183 @@
+"""
+RA-DEC (ICRS/J2000) to apparent ALT-AZ with NumPy only.
+
+The chain is the classical one of the almanacs (Meeus, Astronomical
+Algorithms): IAU 1976 precession, the 18 largest terms of the IAU 1980
+nutation, annual aberration from a low-precision Sun, apparent sideral time
+from UT1 ~ UTC + dut1, then the local horizon. Arrays of stars and of times
+are broadcast together, without astropy transforms nor IERS lookups.
+
+Error against astropy (see astrocom.accuracy, engine 'numpy'), 2024-2026:
+below 1.3" (rms 0.4") in ALT-AZ with dut1 from the IERS bulletin, below 1.8"
+with dut1=0 (|dut1| was below 0.05 s over these years). Not
+modelled: frame bias (0.02"), polar motion (0.3"), diurnal aberration (0.3"),
+light deflection (up to 1.75" next to the Sun), nutation terms below 0.006".
+Each second of error on dut1 adds 15" of hour angle. Before 2017 the leap
+second table below must be extended.
+
+Refraction is optional (astropy AltAz without pressure has none): the
+Saemundsson formula scaled by pressure and temperature, within 10" of the
+astropy model above 15° (the astropy model diverges near the horizon).
+"""
+
+import numpy as np
+
+J2000 = np.datetime64('2000-01-01T12:00:00', 'us')
+DAYS_PER_CENTURY = 36525.0
+ARCSEC = np.pi/(180*3600)
+LEAP_SECONDS = [('2006-01-01', 33), ('2009-01-01', 34), ('2012-07-01', 35), ('2015-07-01', 36), ('2017-01-01', 37)] # TAI-UTC
+_LEAP_DATES = np.array([d for d,_ in LEAP_SECONDS], dtype='datetime64[us]')
+_LEAP_VALUES = np.array([32] + [s for _,s in LEAP_SECONDS], dtype=float)
+ABERRATION_CONSTANT = 20.49552*ARCSEC # radian
+
+# Largest terms of the IAU 1980 nutation (Meeus table 22.A)
+# multiples of D, M, M', F, Omega ; dpsi = A + B.T, deps = C + D.T [0.0001 arcsec]
+NUTATION_TERMS = np.array([
+	[ 0, 0, 0, 0, 1, -171996, -174.2, 92025,  8.9],
+	[-2, 0, 0, 2, 2,  -13187,   -1.6,  5736, -3.1],
+	[ 0, 0, 0, 2, 2,   -2274,   -0.2,   977, -0.5],
+	[ 0, 0, 0, 0, 2,    2062,    0.2,  -895,  0.5],
+	[ 0, 1, 0, 0, 0,    1426,   -3.4,    54, -0.1],
+	[ 0, 0, 1, 0, 0,     712,    0.1,    -7,  0.0],
+	[-2, 1, 0, 2, 2,    -517,    1.2,   224, -0.6],
+	[ 0, 0, 0, 2, 1,    -386,   -0.4,   200,  0.0],
+	[ 0, 0, 1, 2, 2,    -301,    0.0,   129, -0.1],
+	[-2,-1, 0, 2, 2,     217,   -0.5,   -95,  0.3],
+	[-2, 0, 1, 0, 0,    -158,    0.0,     0,  0.0],
+	[-2, 0, 0, 2, 1,     129,    0.1,   -70,  0.0],
+	[ 0, 0,-1, 2, 2,     123,    0.0,   -53,  0.0],
+	[ 2, 0, 0, 0, 0,      63,    0.0,     0,  0.0],
+	[ 0, 0, 1, 0, 1,      63,    0.1,   -33,  0.0],
+	[ 2, 0,-1, 2, 2,     -59,    0.0,    26,  0.0],
+	[ 0, 0,-1, 0, 1,     -58,   -0.1,    32,  0.0],
+	[ 0, 0, 1, 2, 1,     -51,    0.0,    27,  0.0]])
+
+
+def _rot(axis, angle):
+	"""Rotation matrices (..., 3, 3) of the frame by angles [radian] around x (0), y (1) or z (2)"""
+	c, s = np.cos(angle), np.sin(angle)
+	one, zero = np.ones_like(angle), np.zeros_like(angle)
+	if axis == 0:
+		m = [[one, zero, zero], [zero, c, s], [zero, -s, c]]
+	elif axis == 1:
+		m = [[c, zero, -s], [zero, one, zero], [s, zero, c]]
+	else:
+		m = [[c, s, zero], [-s, c, zero], [zero, zero, one]]
+	return np.moveaxis(np.array(m), (0, 1), (-2, -1))
+
+
+def _days(utc, offset_s=0.0):
+	"""Days since J2000 of UTC datetimes (arrays accepted), shifted by offset_s seconds"""
+	utc = np.asarray(utc, dtype='datetime64[us]')
+	return (utc - J2000)/np.timedelta64(86400, 's') + np.asarray(offset_s)/86400
+
+
+def tt_minus_utc(utc):
+	"""TT-UTC [second]"""
+	utc = np.asarray(utc, dtype='datetime64[us]')
+	return _LEAP_VALUES[np.searchsorted(_LEAP_DATES, utc, side='right')] + 32.184
+
+
+def nutation(t):
+	"""Nutation in longitude and obliquity [radian], t in Julian centuries TT"""
+	t = np.asarray(t, dtype=float)
+	d = np.radians(297.85036 + 445267.111480*t - 0.0019142*t**2 + t**3/189474)
+	m = np.radians(357.52772 + 35999.050340*t - 0.0001603*t**2 - t**3/300000)
+	mp = np.radians(134.96298 + 477198.867398*t + 0.0086972*t**2 + t**3/56250)
+	f = np.radians(93.27191 + 483202.017538*t - 0.0036825*t**2 + t**3/327270)
+	om = np.radians(125.04452 - 1934.136261*t + 0.0020708*t**2 + t**3/450000)
+	args = np.stack((d, m, mp, f, om), axis=-1) @ NUTATION_TERMS[:,:5].T
+	tc = t[...,np.newaxis]
+	dpsi = np.sum((NUTATION_TERMS[:,5] + NUTATION_TERMS[:,6]*tc)*np.sin(args), axis=-1)
+	deps = np.sum((NUTATION_TERMS[:,7] + NUTATION_TERMS[:,8]*tc)*np.cos(args), axis=-1)
+	return dpsi*1e-4*ARCSEC, deps*1e-4*ARCSEC
+
+
+def mean_obliquity(t):
+	"""Mean obliquity of the ecliptic [radian], t in Julian centuries TT"""
+	return (84381.448 - 46.8150*t - 0.00059*t**2 + 0.001813*t**3)*ARCSEC
+
+
+def precession_matrix(t):
+	"""J2000 to mean equator and equinox of date (IAU 1976), t in Julian centuries TT"""
+	zeta = (2306.2181*t + 0.30188*t**2 + 0.017998*t**3)*ARCSEC
+	z = (2306.2181*t + 1.09468*t**2 + 0.018203*t**3)*ARCSEC
+	theta = (2004.3109*t - 0.42665*t**2 - 0.041833*t**3)*ARCSEC
+	return _rot(2, -z) @ _rot(1, theta) @ _rot(2, -zeta)
+
+
+def earth_velocity(t, eps):
+	"""Earth velocity / speed of light on the mean equator of date, t in Julian centuries TT"""
+	l0 = np.radians(280.46646 + 36000.76983*t + 0.0003032*t**2)
+	m = np.radians(357.52911 + 35999.05029*t - 0.0001537*t**2)
+	e = 0.016708634 - 0.000042037*t
+	perihelion = np.radians(102.93735 + 1.71946*t)
+	sun = l0 + np.radians((1.914602 - 0.004817*t)*np.sin(m) + (0.019993 - 0.000101*t)*np.sin(2*m) + 0.000289*np.sin(3*m))
+	vx = ABERRATION_CONSTANT*(np.sin(sun) - e*np.sin(perihelion))
+	vy = -ABERRATION_CONSTANT*(np.cos(sun) - e*np.cos(perihelion))
+	return np.stack((vx, vy*np.cos(eps), vy*np.sin(eps)), axis=-1)
+
+
+def sideral_time_deg(longitude_deg, utc, dut1=0.0):
+	"""Local apparent sideral time [degree], dut1 = UT1-UTC [second]"""
+	d_ut1 = _days(utc, dut1)
+	t = _days(utc, tt_minus_utc(utc))/DAYS_PER_CENTURY
+	gmst = 280.46061837 + 360.98564736629*d_ut1 + 0.000387933*t**2 - t**3/38710000
+	dpsi, _ = nutation(t)
+	equation_equinoxes = np.degrees(dpsi*np.cos(mean_obliquity(t)))
+	return (gmst + equation_equinoxes + longitude_deg) % 360
+
+
+def refraction_deg(alt_deg, pressure_hpa=1010.0, temperature_c=10.0):
+	"""Refraction [degree] to add to a geometric altitude, Saemundsson formula"""
+	h = np.maximum(np.asarray(alt_deg, dtype=float), -1.0)
+	r = 1.02/np.tan(np.radians(h + 10.3/(h + 5.11)))/60
+	return r*(pressure_hpa/1010)*(283/(273 + temperature_c))
+
+
+class AltAzKernel:
+	"""
+	Apparent ALT-AZ backend for astrocom.astro (see astro.use_backend).
+	dut1 : UT1-UTC [second] from the IERS bulletin A (|dut1| < 0.9 s)
+	"""
+	def __init__(self, refraction=False, pressure_hpa=1010.0, temperature_c=10.0, dut1=0.0):
+		self.refraction = refraction
+		self.pressure_hpa = pressure_hpa
+		self.temperature_c = temperature_c
+		self.dut1 = dut1
+
+	def __repr__(self):
+		return "AltAzKernel refraction=%s dut1=%.3fs"%(self.refraction, self.dut1)
+
+	def covers(self, utc):
+		return True
+
+	def sideral_time(self, longitude_deg, utc):
+		"""Local apparent sideral time [degree]"""
+		return sideral_time_deg(longitude_deg, utc, self.dut1)
+
+	def apparent_radec(self, ra_deg, dec_deg, utc):
+		"""True equator and equinox of date RA-DEC [degree], arrays of stars and times broadcast"""
+		t = _days(utc, tt_minus_utc(utc))/DAYS_PER_CENTURY
+		eps0 = mean_obliquity(t)
+		dpsi, deps = nutation(t)
+		ra, dec = np.radians(ra_deg), np.radians(dec_deg)
+		p = np.stack(np.broadcast_arrays(np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)), axis=-1)
+		p = np.einsum('...ij,...j->...i', precession_matrix(t), p)
+		v = earth_velocity(t, eps0)
+		p = p + v - np.sum(p*v, axis=-1, keepdims=True)*p
+		p /= np.linalg.norm(p, axis=-1, keepdims=True)
+		nut = _rot(0, -(eps0 + deps)) @ _rot(2, -dpsi) @ _rot(0, eps0)
+		p = np.einsum('...ij,...j->...i', nut, p)
+		return np.degrees(np.arctan2(p[...,1], p[...,0])) % 360, np.degrees(np.arcsin(np.clip(p[...,2], -1, 1)))
+
+	def radec_to_altaz(self, ra_deg, dec_deg, latitude_deg, longitude_deg, utc):
+		"""Convert ICRS RA-DEC to ALT-AZ [degree], arrays of coordinates and times are broadcast"""
+		ra, dec = self.apparent_radec(ra_deg, dec_deg, utc)
+		ha = np.radians(self.sideral_time(longitude_deg, utc) - ra)
+		dec, lat = np.radians(dec), np.radians(latitude_deg)
+		alt = np.degrees(np.arcsin(np.clip(np.sin(lat)*np.sin(dec) + np.cos(lat)*np.cos(dec)*np.cos(ha), -1, 1)))
+		az = np.degrees(np.arctan2(-np.cos(dec)*np.sin(ha), np.sin(dec)*np.cos(lat) - np.cos(dec)*np.cos(ha)*np.sin(lat))) % 360
+		if self.refraction:
+			alt = alt + refraction_deg(alt, self.pressure_hpa, self.temperature_c)
+		return alt, az
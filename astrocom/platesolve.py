@@ -0,0 +1,402 @@
+"""
+Blind plate matching: identify a star field against a catalog.
+
+Offline, every catalog star is combined with its brightest neighbours into
+triangles. A triangle is hashed by its shape (ratios of its sorted sides),
+independent of scale, rotation and flip. The index is stored on disk.
+
+To match an image, the triangles of its brightest stars are looked up in the
+index. Each candidate gives a similarity transform between the image and
+the tangent plane of the sky, hence a pointing: the candidates vote, all at
+once with array operations, and only the most voted pointings are verified
+by counting the image stars that fall on catalog stars.
+"""
+
+import os
+import hashlib
+import itertools
+import numpy as np
+from astrocom import logger, AstrocomError, AstrocomSuccess, CACHE_DIR
+from astrocom.astro import RaDec
+from astrocom.catalog import catalog_arrays
+
+PLATE_BIN = 0.01 # bin width of the triangle shape ratios
+PLATE_NEIGHBOURS = 10 # neighbours of each star used to build triangles
+PLATE_MIN_SIDE = 0.05 # triangles with a side shorter than this fraction of the longest are not indexed
+PLATE_MIN_COVERAGE = 0.25 # fraction of the catalog stars in a triangle, below it the field is too small for the catalog
+PLATE_INDEX_FILE = os.path.join(CACHE_DIR, 'plate_index_%s_%04uarcmin.npz') # catalog id, field of view
+
+
+def _unit_vectors(ra_deg, dec_deg):
+	ra = np.radians(ra_deg)
+	dec = np.radians(dec_deg)
+	return np.stack((np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)), axis=-1)
+
+
+def triangle_shapes(points, triangles):
+	"""
+	Shape of triangles given by vertex indices in 2-D or 3-D points.
+	Return (ratios, ordered) where ratios are (a/c, b/c) of the sorted sides
+	a<=b<=c and ordered the vertices sorted by their opposite side.
+	"""
+	p = points[triangles] # (triangle, vertex, coordinate)
+	sides = np.stack((np.linalg.norm(p[:,1]-p[:,2], axis=-1),
+					np.linalg.norm(p[:,0]-p[:,2], axis=-1),
+					np.linalg.norm(p[:,0]-p[:,1], axis=-1)), axis=-1) # side opposite to each vertex
+	order = np.argsort(sides, axis=-1)
+	sides = np.take_along_axis(sides, order, axis=-1)
+	ordered = np.take_along_axis(triangles, order, axis=-1)
+	with np.errstate(invalid='ignore', divide='ignore'):
+		ratios = sides[:,:2]/sides[:,2:3]
+	return ratios, ordered, sides[:,2]
+
+
+def _shape_keys(ratios, dx=0, dy=0):
+	nb = int(round(1/PLATE_BIN)) + 2
+	return (np.floor(ratios[:,0]/PLATE_BIN).astype(np.int64)+dx)*nb + np.floor(ratios[:,1]/PLATE_BIN).astype(np.int64)+dy
+
+
+def _expand_ranges(starts, counts):
+	"""Concatenation of the index ranges [start, start+count)"""
+	offsets = np.cumsum(counts) - counts
+	return np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+
+def _search_neighbours(ra, dec, size, query, radius_deg, nb_neighbour, max_pairs):
+	"""
+	For the stars of indices query, the first nb_neighbour other stars (lowest indices)
+	within radius_deg among the first size stars of the catalog ra, dec.
+	These stars are binned in declination bands of height radius_deg and sorted by RA
+	inside each band, so only the stars of three bands in a RA interval are compared.
+	Return an array (query, nb_neighbour), -1 padded.
+	"""
+	n = len(ra)
+	xyz = _unit_vectors(ra, dec)
+	ra_q, dec_q = ra[query], dec[query]
+	ra, dec = ra[:size], dec[:size]
+	nb_band = int(np.ceil(180/radius_deg))
+	band = np.clip(((dec + 90)/radius_deg).astype(np.int64), 0, nb_band-1)
+	order = np.lexsort((ra, band))
+	sorted_key = band[order]*360.0 + ra[order]
+	# RA intervals to search in the three bands around each star (and their wrap at 0/360)
+	band_q = np.clip(((dec_q + 90)/radius_deg).astype(np.int64), 0, nb_band-1)
+	lo_list, hi_list, star_list = [], [], []
+	for db in (-1, 0, 1):
+		b = band_q + db
+		ok = (b >= 0) & (b < nb_band)
+		dec_max = np.minimum(np.maximum(np.abs(-90 + b*radius_deg), np.abs(-90 + (b+1)*radius_deg)), 90)
+		with np.errstate(invalid='ignore', divide='ignore'):
+			sin_dra = np.sin(np.radians(radius_deg))/np.cos(np.radians(dec_max))
+		whole = sin_dra >= 1
+		dra = np.where(whole, 180.0, np.degrees(np.arcsin(np.minimum(sin_dra, 1))))
+		base = b*360.0
+		lo = np.where(whole, base, base + np.maximum(ra_q - dra, 0))
+		hi = np.where(whole, base + 360, base + np.minimum(ra_q + dra, 360))
+		lo_list.append(lo[ok]); hi_list.append(hi[ok]); star_list.append(np.flatnonzero(ok))
+		wrap_low = ok & ~whole & (ra_q - dra < 0)
+		lo_list.append(base[wrap_low] + ra_q[wrap_low] - dra[wrap_low] + 360); hi_list.append(base[wrap_low] + 360); star_list.append(np.flatnonzero(wrap_low))
+		wrap_high = ok & ~whole & (ra_q + dra > 360)
+		lo_list.append(base[wrap_high]); hi_list.append(base[wrap_high] + ra_q[wrap_high] + dra[wrap_high] - 360); star_list.append(np.flatnonzero(wrap_high))
+	star = np.concatenate(star_list)
+	by_star = np.argsort(star, kind='stable')
+	star = star[by_star]
+	first = np.searchsorted(sorted_key, np.concatenate(lo_list)[by_star], side='left')
+	counts = np.searchsorted(sorted_key, np.concatenate(hi_list)[by_star], side='right') - first
+	# chunks of whole query stars with a bounded number of candidate pairs
+	cumul = np.cumsum(counts)
+	neighbours = np.full((len(query), nb_neighbour), -1, dtype=np.int64)
+	cos_radius = np.cos(np.radians(radius_deg))
+	i = 0
+	while i < len(star):
+		j = max(np.searchsorted(cumul, (cumul[i-1] if i > 0 else 0) + max_pairs, side='right'), i+1)
+		j = np.searchsorted(star, star[j-1], side='right') if j < len(star) else j
+		pair_star = np.repeat(star[i:j], counts[i:j])
+		pair_cand = order[_expand_ranges(first[i:j], counts[i:j])]
+		close = (pair_cand != query[pair_star]) & (np.einsum('ij,ij->i', xyz[query[pair_star]], xyz[pair_cand]) > cos_radius)
+		key = np.sort(pair_star[close]*n + pair_cand[close]) # lowest indices first for each star
+		pair_star, pair_cand = key // n, key % n
+		rank = np.arange(len(key)) - np.searchsorted(pair_star, pair_star, side='left')
+		keep = rank < nb_neighbour
+		neighbours[pair_star[keep], rank[keep]] = pair_cand[keep]
+		i = j
+	return neighbours
+
+
+def find_neighbours(ra_deg, dec_deg, radius_deg, nb_neighbour, max_pairs=4000000):
+	"""
+	For each star, the first nb_neighbour other stars (lowest indices) within radius_deg,
+	as an array (star, nb_neighbour) of indices, -1 padded.
+	The stars are searched in growing prefixes of the catalog: a star with nb_neighbour
+	neighbours in a prefix is done, the later stars all have higher indices.
+	"""
+	if not (0 < radius_deg <= 90):
+		raise AstrocomError('Invalid neighbour search radius <%s> degree'%radius_deg)
+	ra = np.asarray(ra_deg, dtype=float) % 360
+	dec = np.asarray(dec_deg, dtype=float)
+	n = len(ra)
+	neighbours = np.full((n, nb_neighbour), -1, dtype=np.int64)
+	# prefix holding about 2*nb_neighbour stars per search circle on a uniform sky
+	with np.errstate(divide='ignore'):
+		size = int(min(n, max(1024, 2*nb_neighbour*2/(1 - np.cos(np.radians(radius_deg))))))
+	todo = np.arange(n)
+	while len(todo):
+		neighbours[todo] = _search_neighbours(ra, dec, size, todo, radius_deg, nb_neighbour, max_pairs)
+		if size == n:
+			break
+		todo = todo[neighbours[todo, -1] < 0]
+		size = min(n, 4*size)
+	return neighbours
+
+
+def build_plate_index(catalog, fov_deg, filename, nb_neighbour=PLATE_NEIGHBOURS, vmag_max=None, max_pairs=4000000):
+	"""
+	Build the triangle index of a catalog (list of Star or CatalogStore) for
+	fields of view of about fov_deg, and save it.
+	"""
+	ra, dec, vmag = catalog_arrays(catalog)
+	keep = np.isfinite(ra) & np.isfinite(dec) & np.isfinite(vmag)
+	if vmag_max is not None:
+		keep &= vmag <= vmag_max
+	order = np.argsort(vmag[keep], kind='stable')
+	ra, dec, vmag = ra[keep][order], dec[keep][order], vmag[keep][order]
+	xyz = _unit_vectors(ra, dec)
+	# stars are sorted by magnitude: the lowest indices are the brightest neighbours
+	neighbours = find_neighbours(ra, dec, fov_deg/2, nb_neighbour, max_pairs=max_pairs)
+	coverage = np.mean(neighbours[:,1] >= 0) if len(ra) > 0 else 0.0
+	if coverage < PLATE_MIN_COVERAGE:
+		raise AstrocomError('Field of view of %.2f° too small for the catalog: %.1f%% of its %u stars form a triangle'%(fov_deg, 100*coverage, len(ra)))
+	pairs = np.array(list(itertools.combinations(range(nb_neighbour), 2))).reshape(-1, 2)
+	star = np.broadcast_to(np.arange(len(ra))[:,np.newaxis], (len(ra), len(pairs)))
+	triangles = np.stack((star, neighbours[:,pairs[:,0]], neighbours[:,pairs[:,1]]), axis=-1).reshape(-1, 3)
+	triangles = triangles[np.all(triangles >= 0, axis=1)]
+	triangles = np.unique(np.sort(triangles, axis=1).astype(np.int32), axis=0)
+	ratios, ordered, _ = triangle_shapes(xyz, triangles)
+	valid = ratios[:,0] > PLATE_MIN_SIDE
+	keys = _shape_keys(ratios[valid])
+	idx = np.argsort(keys)
+	os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+	np.savez(filename, ra=ra, dec=dec, vmag=vmag, keys=keys[idx], triangles=ordered[valid][idx], fov=fov_deg)
+	AstrocomSuccess('Plate index of %u triangles saved in <%s>'%(len(idx), filename))
+	return PlateIndex(filename)
+
+
+class PlateIndex:
+	"""Triangle index loaded from disk"""
+	def __init__(self, filename):
+		self.filename = filename
+		with np.load(filename) as data:
+			self.ra = data['ra']
+			self.dec = data['dec']
+			self.vmag = data['vmag']
+			self.keys = data['keys']
+			self.triangles = data['triangles']
+			self.fov = float(data['fov'])
+		self.xyz = _unit_vectors(self.ra, self.dec)
+
+	def __repr__(self):
+		return "PlateIndex %u stars %u triangles (%.1f° field)"%(len(self.ra), len(self.keys), self.fov)
+
+	def lookup(self, ratios):
+		"""Catalog triangles with the same shape (neighbouring bins included), as (query, triangle) indices"""
+		queries = []
+		found = []
+		for dx in (-1, 0, 1):
+			for dy in (-1, 0, 1):
+				keys = _shape_keys(ratios, dx, dy)
+				left = np.searchsorted(self.keys, keys, side='left')
+				right = np.searchsorted(self.keys, keys, side='right')
+				counts = right - left
+				queries.append(np.repeat(np.arange(len(keys)), counts))
+				found.append(np.concatenate([np.arange(l, r) for l, r in zip(left, right) if r > l] or [np.zeros(0, int)]))
+		return np.concatenate(queries), np.concatenate(found)
+
+
+def catalog_id(catalog):
+	"""Short id of a catalog (list of Star or CatalogStore): hash of its coordinates and magnitudes"""
+	digest = hashlib.sha1()
+	for array in catalog_arrays(catalog):
+		digest.update(np.ascontiguousarray(array, dtype=float).tobytes())
+	return digest.hexdigest()[:12]
+
+
+def default_plate_index(fov_deg, catalog=None):
+	"""Index of a catalog (Bright Star Catalog by default) for a field of view, built once and cached"""
+	# fields of view rounded to the arcminute share a cache file
+	if catalog is None:
+		filename = PLATE_INDEX_FILE%('bsc', int(round(60*fov_deg)))
+	else:
+		filename = PLATE_INDEX_FILE%(catalog_id(catalog), int(round(60*fov_deg)))
+	if os.path.exists(filename):
+		return PlateIndex(filename)
+	if catalog is None:
+		from astrocom.astro import read_bsc
+		catalog = read_bsc()
+	return build_plate_index(catalog, fov_deg, filename)
+
+
+def tangent_basis(center):
+	"""East and North unit vectors at a point of the sphere"""
+	east = np.array([-center[1], center[0], 0.0])
+	east /= max(np.linalg.norm(east), 1e-12)
+	north = np.cross(center, east)
+	return east, north
+
+
+def to_tangent(xyz, center):
+	"""Gnomonic projection [radian] around a unit vector"""
+	east, north = tangent_basis(center)
+	d = xyz @ center
+	return np.stack((xyz @ east, xyz @ north), axis=-1)/d[:,np.newaxis]
+
+
+def from_tangent(xi_eta, center):
+	"""Inverse gnomonic projection, return RA-DEC [degree]"""
+	east, north = tangent_basis(center)
+	p = center + xi_eta[...,0:1]*east + xi_eta[...,1:2]*north
+	p /= np.linalg.norm(p, axis=-1, keepdims=True)
+	return np.degrees(np.arctan2(p[...,1], p[...,0])) % 360, np.degrees(np.arcsin(p[...,2]))
+
+
+def fit_similarity(src, dst, flip):
+	"""Least-squares similarity dst = a*src + b with complex numbers (src mirrored if flip)"""
+	z = src[:,0] + 1j*(-src[:,1] if flip else src[:,1])
+	w = dst[:,0] + 1j*dst[:,1]
+	zm, wm = z.mean(), w.mean()
+	a = np.sum((w - wm)*np.conj(z - zm))/max(np.sum(np.abs(z - zm)**2), 1e-30)
+	return a, wm - a*zm
+
+
+def apply_similarity(a, b, flip, points):
+	z = points[:,0] + 1j*(-points[:,1] if flip else points[:,1])
+	w = a*z + b
+	return np.stack((w.real, w.imag), axis=-1)
+
+
+class PlateSolution:
+	"""Result of plate matching"""
+	def __init__(self, ra_deg, dec_deg, scale, rotation, flip, nb_match):
+		self.radec = RaDec(float(ra_deg), float(dec_deg))
+		self.ra_deg = float(ra_deg)
+		self.dec_deg = float(dec_deg)
+		self.scale = scale # arcsec/pixel
+		self.rotation = rotation # degree, position angle of the image y axis
+		self.flip = flip
+		self.nb_match = nb_match
+
+	def __repr__(self):
+		return "PlateSolution %s %.2f\"/px rot %.1f°%s (%u stars)"%(self.radec, self.scale, self.rotation, ' flipped' if self.flip else '', self.nb_match)
+
+
+def _verify(xy, index, pointing, a, b, flip, tol):
+	"""Match the image stars projected on the sky with the catalog, return (matched image stars, catalog stars)"""
+	near = np.flatnonzero(index.xyz @ pointing > np.cos(np.radians(index.fov)))
+	tangent = to_tangent(index.xyz[near], pointing)
+	projected = apply_similarity(a, b, flip, xy)
+	dist = np.linalg.norm(projected[:,np.newaxis,:] - tangent[np.newaxis,:,:], axis=-1)
+	nearest = np.argmin(dist, axis=1)
+	matched = np.flatnonzero(dist[np.arange(len(xy)), nearest] < tol)
+	_, first = np.unique(nearest[matched], return_index=True) # one image star per catalog star
+	matched = matched[np.sort(first)]
+	return matched, near[nearest[matched]]
+
+
+def solve_field(xy, scale_arcsec, index, center=(0.0, 0.0), nb_star=12, scale_tolerance=0.3, match_radius=3.0, min_match=5, nb_cluster=8):
+	"""
+	Identify a field from star positions [pixel] sorted by decreasing brightness.
+	scale_arcsec : rough pixel scale [arcsec/pixel]
+	center       : pixel whose RA-DEC is returned (e.g. image center or optical axis)
+	Each matching triangle votes for a pointing; the most voted pointings are verified.
+	Return a PlateSolution, or raise AstrocomError if the field is not found.
+	"""
+	xy = np.asarray(xy, dtype=float)[:nb_star]
+	if len(xy) < 3:
+		raise AstrocomError('At least 3 stars are needed for plate matching')
+	triangles = np.array(list(itertools.combinations(range(len(xy)), 3)))
+	ratios, ordered, longest = triangle_shapes(xy, triangles)
+	good = ratios[:,0] > PLATE_MIN_SIDE
+	query, found = index.lookup(ratios[good])
+	img = ordered[good][query]
+	cat = index.triangles[found]
+	p = index.xyz[cat] # (candidate, vertex, xyz)
+	# size must agree with the rough scale
+	cat_longest = np.linalg.norm(p[:,0] - p[:,1], axis=-1) # vertices 0 and 1 are opposite the two shortest sides
+	scale = np.degrees(cat_longest)*3600/longest[good][query]
+	ok = np.abs(scale/scale_arcsec - 1) < scale_tolerance
+	img, cat, p = img[ok], cat[ok], p[ok]
+	if len(img) == 0:
+		raise AstrocomError('Plate matching failed: no triangle of the catalog matches')
+	# orientation gives the flip: image (x,y) versus sky (east,north) seen from the center of the sphere
+	q = xy[img]
+	img_sign = np.sign((q[:,1,0]-q[:,0,0])*(q[:,2,1]-q[:,0,1]) - (q[:,1,1]-q[:,0,1])*(q[:,2,0]-q[:,0,0]))
+	cat_sign = np.sign(np.einsum('ij,ij->i', p[:,0], np.cross(p[:,1], p[:,2])))
+	flip = img_sign != cat_sign
+	# similarity of each candidate in the tangent plane of its triangle (vectorized)
+	c = p.mean(axis=1)
+	c /= np.linalg.norm(c, axis=-1, keepdims=True)
+	east = np.stack((-c[:,1], c[:,0], np.zeros(len(c))), axis=-1)
+	east /= np.linalg.norm(east, axis=-1, keepdims=True)
+	north = np.cross(c, east)
+	d = np.einsum('nvk,nk->nv', p, c)
+	w = (np.einsum('nvk,nk->nv', p, east) + 1j*np.einsum('nvk,nk->nv', p, north))/d
+	z = q[...,0] + 1j*np.where(flip[:,np.newaxis], -q[...,1], q[...,1])
+	zm, wm = z.mean(axis=1, keepdims=True), w.mean(axis=1, keepdims=True)
+	a = np.sum((w - wm)*np.conj(z - zm), axis=1)/np.sum(np.abs(z - zm)**2, axis=1)
+	b = wm[:,0] - a*zm[:,0]
+	zc = center[0] + 1j*np.where(flip, -center[1], center[1])
+	wc = a*zc + b
+	pointing = c + wc.real[:,np.newaxis]*east + wc.imag[:,np.newaxis]*north
+	pointing /= np.linalg.norm(pointing, axis=-1, keepdims=True)
+	# votes: pointings quantized in cells of a few match radii
+	cell = 10*np.radians(match_radius*scale_arcsec/3600)
+	keys = np.floor(pointing/cell).astype(np.int64)
+	_, inverse, counts = np.unique(np.column_stack((keys, flip)), axis=0, return_inverse=True, return_counts=True)
+	inverse = np.ravel(inverse)
+	tol = np.radians(match_radius*scale_arcsec/3600)
+	best = None
+	for cluster in np.argsort(counts)[::-1][:nb_cluster]:
+		members = np.flatnonzero(inverse == cluster)
+		# a single triangle extrapolates badly to the whole field: fit on the star pairs of all the voters
+		pairs, votes = np.unique(np.column_stack((img[members].ravel(), cat[members].ravel())), axis=0, return_counts=True)
+		pairs = pairs[np.argsort(-votes, kind='stable')]
+		_, first = np.unique(pairs[:,0], return_index=True) # most voted catalog star of each image star
+		pairs = pairs[first]
+		if len(pairs) < 3:
+			continue
+		center_k, flip_k = pointing[members[0]], flip[members[0]]
+		src, dst = xy[pairs[:,0]], to_tangent(index.xyz[pairs[:,1]], center_k)
+		while True: # reject the wrong pairs (spurious stars) one by one
+			ak, bk = fit_similarity(src, dst, flip_k)
+			residual = np.linalg.norm(apply_similarity(ak, bk, flip_k, src) - dst, axis=-1)
+			worst = np.argmax(residual)
+			if (residual[worst] < tol) or (len(src) <= 3):
+				break
+			src, dst = np.delete(src, worst, axis=0), np.delete(dst, worst, axis=0)
+		if abs(np.degrees(np.abs(ak))*3600/scale_arcsec - 1) > scale_tolerance:
+			continue
+		matched, stars = _verify(xy, index, center_k, ak, bk, flip_k, tol)
+		if (best is None) or (len(matched) > len(best[0])):
+			best = (matched, stars, flip_k, center_k)
+	if (best is None) or (len(best[0]) < min(min_match, len(xy))):
+		raise AstrocomError('Plate matching failed')
+	matched, stars, flip, pointing = best
+	for _ in range(2): # refine on all matched stars, around the solved pointing
+		a, b = fit_similarity(xy[matched], to_tangent(index.xyz[stars], pointing), flip)
+		ra, dec = from_tangent(apply_similarity(a, b, flip, np.array([center], dtype=float)), pointing)
+		pointing = _unit_vectors(ra[0], dec[0])
+		b = -a*(center[0] + 1j*(-center[1] if flip else center[1])) # center maps to the new tangent point
+		matched, stars = _verify(xy, index, pointing, a, b, flip, tol)
+	solution = PlateSolution(ra[0], dec[0], np.degrees(np.abs(a))*3600, np.degrees(np.angle(a)), bool(flip), len(matched))
+	logger.info('Plate matching: %s'%solution)
+	return solution
+
+
+def solve_frame(frame, scale_arcsec, index=None, nb_star=12, **kwargs):
+	"""Detect the stars of a frame and identify the field, return the PlateSolution of the frame center"""
+	from astrocom.guiding import detect_stars, centroid
+	frame = np.asarray(frame, dtype=float)
+	if index is None:
+		index = default_plate_index(max(frame.shape)*scale_arcsec/3600)
+	stars = detect_stars(frame, max_star=nb_star)
+	cx, cy, _ = centroid(frame, stars[:,0], stars[:,1])
+	center = ((frame.shape[1]-1)/2, (frame.shape[0]-1)/2)
+	return solve_field(np.stack((cx, cy), axis=-1), scale_arcsec, index, center=center, nb_star=nb_star, **kwargs)
@@ -0,0 +1,431 @@
+"""
+Queries on a star catalog with composable predicates.
+
+	Magnitude(max=3) & SpectralType('K') & Constellation('Ori')
+	Magnitude(2, 4) & HourAngle(30) & ~Constellation('UMa', 'UMi')
+
+The catalog columns are extracted once into a CatalogIndex, with secondary
+indexes: magnitude order (binary search) and hash tables of the rows of each
+constellation and spectral class, all kept brightest first. A query first
+narrows the candidate rows with the indexes, then evaluates the other predicates as boolean masks on the
+candidates only, cheapest first: ALT-AZ is computed only for the stars that
+passed the catalog predicates.
+"""
+
+import re
+import abc
+import numpy as np
+from astrocom import AstrocomError
+from astrocom.stats import timed
+
+QUERY_LIMIT = 20 # stars returned by default
+
+
+class _HashIndex:
+	"""
+	Integer code of each row and rows of each key, keys transformed by a function.
+	The rows of each key follow the given order of the rows (magnitude order).
+	"""
+	def __init__(self, keys, transform, order):
+		values, inverse = np.unique(np.asarray(keys).astype(str), return_inverse=True)
+		# transform the distinct keys only, then merge the ones giving the same key
+		keys, remap = np.unique(np.array([transform(v) for v in values], dtype=str), return_inverse=True)
+		self.codes = remap[inverse.ravel()]
+		self.rank = np.empty(len(order), dtype=np.int64)
+		self.rank[order] = np.arange(len(order))
+		order = order[np.argsort(self.codes[order], kind='stable')]
+		bounds = np.searchsorted(self.codes[order], np.arange(len(keys)+1))
+		self.keys = {str(k):i for i,k in enumerate(keys)}
+		self.groups = [order[bounds[i]:bounds[i+1]] for i in range(len(keys))]
+
+	def __len__(self):
+		return len(self.keys)
+
+	def rows(self, keys):
+		"""Rows of any of the keys, in the order of the index"""
+		found = [self.groups[i] for i in sorted(set(self.keys[k] for k in keys if k in self.keys))]
+		if len(found) == 0:
+			return np.zeros(0, dtype=int)
+		if len(found) == 1:
+			return found[0]
+		rows = np.concatenate(found)
+		return rows[np.argsort(self.rank[rows])] # merge the groups
+
+	def mask(self, keys, rows):
+		"""True for the rows having one of the keys"""
+		return np.isin(self.codes[rows], [self.keys[k] for k in keys if k in self.keys])
+
+
+class CatalogIndex:
+	"""Columns and secondary indexes of a catalog (list of Star or CatalogStore)"""
+	def __init__(self, catalog):
+		self.catalog = catalog
+		if hasattr(catalog, 'column'):
+			col = lambda n: np.asarray(catalog.column(n)) if n in catalog.columns else np.full(len(catalog), '')
+			self.ra, self.dec, self.vmag = col('ra').astype(float), col('dec').astype(float), col('vmag').astype(float)
+			constell, sptype = col('constell'), col('sptype')
+		else:
+			self.ra = np.array([s.ra_degree for s in catalog], dtype=float)
+			self.dec = np.array([s.dec_degree for s in catalog], dtype=float)
+			self.vmag = np.array([s.vmag for s in catalog], dtype=float)
+			constell = np.array([s.constell or '' for s in catalog], dtype=str)
+			sptype = np.array([s.sptype or '' for s in catalog], dtype=str)
+		self.by_vmag = np.argsort(self.vmag, kind='stable')
+		self._vmag_sorted = self.vmag[self.by_vmag]
+		# BSC constellation fields are like '21AlpAnd': the constellation is the 3 last letters
+		self.by_constell = _HashIndex(constell, lambda c: c[-3:].lower(), self.by_vmag)
+		self.by_class = _HashIndex(sptype, lambda s: s[:1].upper(), self.by_vmag)
+
+	def __repr__(self):
+		return "CatalogIndex %u stars, %u constellations"%(len(self), len(self.by_constell))
+
+	def __len__(self):
+		return len(self.vmag)
+
+	def magnitude_rows(self, vmin=-np.inf, vmax=np.inf):
+		"""Rows with vmin <= vmag <= vmax, brightest first (binary search in the magnitude order)"""
+		lo = np.searchsorted(self._vmag_sorted, vmin, side='left')
+		hi = np.searchsorted(self._vmag_sorted, vmax, side='right')
+		return self.by_vmag[lo:hi]
+
+	def star(self, row):
+		return self.catalog[int(row)]
+
+
+class _Context:
+	"""Epoch of a query, with ALT-AZ computed on demand and cached by row"""
+	def __init__(self, index, epoch):
+		self.index = index
+		self.epoch = epoch
+		self._alt = None
+		self._az = None
+
+	def altaz(self, rows):
+		if self.epoch is None:
+			raise AstrocomError('ALT-AZ predicates need an epoch')
+		if self._alt is None:
+			self._alt = np.full(len(self.index), np.nan)
+			self._az = np.full(len(self.index), np.nan)
+		todo = rows[np.isnan(self._alt[rows])]
+		if len(todo) > 0:
+			self._alt[todo], self._az[todo] = self.epoch.radec_to_altaz(self.index.ra[todo], self.index.dec[todo])
+		return self._alt[rows], self._az[rows]
+
+	def hour_angle(self, rows):
+		"""Hour angle [degree] in [-180,180[, positive West of the meridian"""
+		if self.epoch is None:
+			raise AstrocomError('Hour angle predicates need an epoch')
+		return (self.epoch.sideral_time.degree - self.index.ra[rows] + 180) % 360 - 180
+
+
+class Predicate(abc.ABC):
+	"""
+	Base of the predicates, combined with & | ~.
+	rows(index) gives candidate rows from an index, brightest first (None if no index applies),
+	mask(index, rows, context) the boolean mask of the given rows.
+	"""
+	cost = 1 # evaluation order in a conjunction
+
+	def __and__(self, other):
+		return And(self, other)
+
+	def __or__(self, other):
+		return Or(self, other)
+
+	def __invert__(self):
+		return Not(self)
+
+	def rows(self, index):
+		return None
+
+	@abc.abstractmethod
+	def mask(self, index, rows, context):
+		pass
+
+
+class And(Predicate):
+	def __init__(self, *predicates):
+		self.predicates = [q for p in predicates for q in (p.predicates if isinstance(p, And) else [p])]
+		self.cost = max(p.cost for p in self.predicates)
+
+	def __repr__(self):
+		return '(%s)'%' & '.join(repr(p) for p in self.predicates)
+
+	def rows(self, index):
+		# the most selective index gives the candidates, the other predicates are masks on them
+		candidates = [r for r in (p.rows(index) for p in self.predicates) if r is not None]
+		if len(candidates) == 0:
+			return None
+		return min(candidates, key=len)
+
+	def mask(self, index, rows, context):
+		keep = np.ones(len(rows), dtype=bool)
+		for p in sorted(self.predicates, key=lambda p: p.cost):
+			sel = np.flatnonzero(keep)
+			if len(sel) == 0:
+				break
+			keep[sel] = p.mask(index, rows[sel], context)
+		return keep
+
+
+class Or(Predicate):
+	def __init__(self, *predicates):
+		self.predicates = [q for p in predicates for q in (p.predicates if isinstance(p, Or) else [p])]
+		self.cost = max(p.cost for p in self.predicates)
+
+	def __repr__(self):
+		return '(%s)'%' | '.join(repr(p) for p in self.predicates)
+
+	def rows(self, index):
+		candidates = [p.rows(index) for p in self.predicates]
+		if any(r is None for r in candidates):
+			return None
+		rows = np.unique(np.concatenate(candidates))
+		return rows[np.argsort(index.vmag[rows], kind='stable')]
+
+	def mask(self, index, rows, context):
+		keep = np.zeros(len(rows), dtype=bool)
+		for p in sorted(self.predicates, key=lambda p: p.cost):
+			sel = np.flatnonzero(~keep)
+			if len(sel) == 0:
+				break
+			keep[sel] = p.mask(index, rows[sel], context)
+		return keep
+
+
+class Not(Predicate):
+	def __init__(self, predicate):
+		self.predicate = predicate
+		self.cost = predicate.cost
+
+	def __repr__(self):
+		return '~%r'%self.predicate
+
+	def mask(self, index, rows, context):
+		return ~self.predicate.mask(index, rows, context)
+
+
+class Magnitude(Predicate):
+	"""vmin <= vmag <= vmax, from the magnitude order"""
+	cost = 0
+
+	def __init__(self, min=None, max=None):
+		self.vmin = -np.inf if min is None else min
+		self.vmax = np.inf if max is None else max
+
+	def __repr__(self):
+		return 'Magnitude(%g, %g)'%(self.vmin, self.vmax)
+
+	def rows(self, index):
+		return index.magnitude_rows(self.vmin, self.vmax)
+
+	def mask(self, index, rows, context):
+		return (index.vmag[rows] >= self.vmin) & (index.vmag[rows] <= self.vmax)
+
+
+class _Hashed(Predicate):
+	"""Membership in a hash index of the CatalogIndex"""
+	cost = 0
+	attribute = None
+
+	def __init__(self, *keys):
+		self.keys = [self._key(k) for k in keys]
+
+	def __repr__(self):
+		return '%s(%s)'%(type(self).__name__, ', '.join(self.keys))
+
+	def _key(self, key):
+		return key
+
+	def rows(self, index):
+		return getattr(index, self.attribute).rows(self.keys)
+
+	def mask(self, index, rows, context):
+		return getattr(index, self.attribute).mask(self.keys, rows)
+
+
+class Constellation(_Hashed):
+	"""Star in one of the constellations (IAU abbreviations, case insensitive)"""
+	attribute = 'by_constell'
+
+	def _key(self, key):
+		return key.lower()
+
+
+class SpectralType(_Hashed):
+	"""Spectral class in one of the letters, e.g. SpectralType('K','M') or SpectralType('KM')"""
+	attribute = 'by_class'
+
+	def __init__(self, *classes):
+		super().__init__(*[c for cls in classes for c in cls])
+
+	def _key(self, key):
+		return key.upper()
+
+
+class Near(Predicate):
+	"""Within a radius [degree] of a RA-DEC position [degree]"""
+	def __init__(self, ra_deg, dec_deg, radius_deg):
+		self.ra_deg = ra_deg
+		self.dec_deg = dec_deg
+		self.radius_deg = radius_deg
+
+	def __repr__(self):
+		return 'Near(%.2f, %.2f, %g)'%(self.ra_deg, self.dec_deg, self.radius_deg)
+
+	def mask(self, index, rows, context):
+		ra, dec = np.radians(index.ra[rows]), np.radians(index.dec[rows])
+		ra0, dec0 = np.radians(self.ra_deg), np.radians(self.dec_deg)
+		cos_dist = np.sin(dec)*np.sin(dec0) + np.cos(dec)*np.cos(dec0)*np.cos(ra - ra0)
+		return cos_dist >= np.cos(np.radians(self.radius_deg))
+
+
+class HourAngle(Predicate):
+	"""Within max_deg of the meridian (|hour angle| <= max_deg), needs an epoch"""
+	cost = 1
+
+	def __init__(self, max_deg):
+		self.max_deg = max_deg
+
+	def __repr__(self):
+		return 'HourAngle(%g)'%self.max_deg
+
+	def mask(self, index, rows, context):
+		return np.abs(context.hour_angle(rows)) <= self.max_deg
+
+
+class Altitude(Predicate):
+	"""min <= altitude <= max [degree], needs an epoch"""
+	cost = 2
+
+	def __init__(self, min=None, max=None):
+		self.amin = -90 if min is None else min
+		self.amax = 90 if max is None else max
+
+	def __repr__(self):
+		return 'Altitude(%g, %g)'%(self.amin, self.amax)
+
+	def mask(self, index, rows, context):
+		alt, _ = context.altaz(rows)
+		return (alt >= self.amin) & (alt <= self.amax)
+
+
+class Azimuth(Predicate):
+	"""Azimuth from start to stop [degree], clockwise (e.g. 315 to 45 around North), needs an epoch"""
+	cost = 2
+
+	def __init__(self, start, stop):
+		self.start = start % 360
+		self.stop = stop % 360
+
+	def __repr__(self):
+		return 'Azimuth(%g, %g)'%(self.start, self.stop)
+
+	def mask(self, index, rows, context):
+		_, az = context.altaz(rows)
+		return (az - self.start) % 360 <= (self.stop - self.start) % 360
+
+
+class AboveHorizon(Predicate):
+	"""Above a HorizonMask, needs an epoch"""
+	cost = 2
+
+	def __init__(self, horizon):
+		self.horizon = horizon
+
+	def __repr__(self):
+		return 'AboveHorizon(%r)'%self.horizon
+
+	def mask(self, index, rows, context):
+		alt, az = context.altaz(rows)
+		return self.horizon.visible(alt, az)
+
+
+@timed('query.select')
+def select(index, predicate, epoch=None, limit=None):
+	"""
+	Rows of the stars matching a predicate, brightest first.
+	epoch is an Epoch, needed by the ALT-AZ and hour angle predicates.
+	"""
+	rows = predicate.rows(index) # brightest first
+	if rows is None:
+		rows = index.by_vmag
+	context = _Context(index, epoch)
+	if limit is None:
+		return rows[predicate.mask(index, rows, context)]
+	# brightest first: evaluate by growing blocks until enough stars are found
+	found = []
+	nb_found = 0
+	start = 0
+	block = max(4*limit, 256)
+	while (nb_found < limit) and (start < len(rows)):
+		sub = rows[start:start+block]
+		found.append(sub[predicate.mask(index, sub, context)])
+		nb_found += len(found[-1])
+		start += block
+		block *= 2
+	return np.concatenate(found)[:limit] if len(found) > 0 else rows[:0]
+
+
+def query(catalog, predicate, epoch=None, limit=None):
+	"""Stars of a catalog (or CatalogIndex) matching a predicate, brightest first"""
+	index = catalog if isinstance(catalog, CatalogIndex) else CatalogIndex(catalog)
+	return [index.star(r) for r in select(index, predicate, epoch=epoch, limit=limit)]
+
+
+def _parse_range(value, name):
+	"""'2:4' -> (2,4), '2:' -> (2,None)"""
+	try:
+		lo, hi = value.split(':')
+		return (float(lo) if lo else None), (float(hi) if hi else None)
+	except ValueError:
+		raise AstrocomError('Range <%s> of %s must be min:max'%(value, name))
+
+
+def parse_query(text, horizon=None):
+	"""
+	Build a predicate from words, all of them must match. Examples:
+	vmag<3 vmag>1 vmag=2:4 sp=K sp=KM con=Ori con=Ori,Tau alt>20 az=90:180 ha<30 near=83.8,-5.4,10 visible
+	Return (predicate, limit), limit given by a number word (default QUERY_LIMIT).
+	"""
+	predicates = []
+	limit = QUERY_LIMIT
+	for word in text.split():
+		if word.isdigit():
+			limit = int(word)
+			continue
+		if word.lower() == 'visible':
+			if horizon is None:
+				raise AstrocomError('No horizon defined for <visible>')
+			predicates.append(AboveHorizon(horizon))
+			continue
+		match = re.fullmatch(r'([a-z]+)([<>=])(.+)', word.lower())
+		if match is None:
+			raise AstrocomError('Cannot parse query word <%s>'%word)
+		key, op, value = match.groups()
+		try:
+			if key in ['vmag', 'mag', 'alt']:
+				cls = Magnitude if key != 'alt' else Altitude
+				if op == '<':
+					predicates.append(cls(max=float(value)))
+				elif op == '>':
+					predicates.append(cls(min=float(value)))
+				else:
+					predicates.append(cls(*_parse_range(value, key)))
+			elif (key == 'sp') and (op == '='):
+				predicates.append(SpectralType(*value.split(',')))
+			elif (key == 'con') and (op == '='):
+				predicates.append(Constellation(*value.split(',')))
+			elif (key == 'az') and (op == '='):
+				predicates.append(Azimuth(*_parse_range(value, key)))
+			elif (key == 'ha') and (op == '<'):
+				predicates.append(HourAngle(float(value)))
+			elif (key == 'near') and (op == '='):
+				predicates.append(Near(*[float(v) for v in value.split(',')]))
+			else:
+				raise AstrocomError('Unknown query word <%s>'%word)
+		except (ValueError, TypeError):
+			raise AstrocomError('Cannot parse query word <%s>'%word)
+	if len(predicates) == 0:
+		return Magnitude(), limit
+	return And(*predicates), limit
@@ -0,0 +1,169 @@
+"""
+Record the frames exchanged with the mount and replay them offline.
+
+Log format (little endian, append-only):
+	header : MAGIC (8 bytes) + wall-clock start time (float64)
+	frame  : direction (uint8) + monotonic time (float64) + length (uint16) + bytes
+"""
+
+import time
+import queue
+import struct
+import threading
+from astrocom import logger, AstrocomError
+from astrocom.stats import STATS
+
+MAGIC = b'ASREC\x00\x01\n'
+HEADER = struct.Struct('<8sd')
+FRAME = struct.Struct('<BdH')
+
+DIR_OUT = 0 # computer -> mount
+DIR_IN = 1 # mount -> computer
+
+RECORDER_QUEUE_SIZE = 10000 # frames
+RECORDER_FLUSH_PERIOD = 1.0 # second
+
+
+class SessionRecorder:
+	"""
+	Stream frames into an append-only binary log.
+	Frames are queued and written by a background thread, so that recording never blocks.
+	If the queue is full, frames are dropped and counted.
+	"""
+	def __init__(self, filename, queue_size=RECORDER_QUEUE_SIZE):
+		self.filename = filename
+		self.dropped = 0
+		self._queue = queue.Queue(maxsize=queue_size)
+		self._file = open(filename, 'ab')
+		if self._file.tell() == 0:
+			self._file.write(HEADER.pack(MAGIC, time.time()))
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def record(self, direction, data):
+		"""Queue a frame (direction, bytes) with its monotonic timestamp"""
+		try:
+			self._queue.put_nowait((direction, time.monotonic(), bytes(data)))
+		except queue.Full:
+			self.dropped += 1
+			STATS.increment('recorder.dropped')
+
+	def _run(self):
+		"""Background writer"""
+		last_flush = time.monotonic()
+		while True:
+			try:
+				item = self._queue.get(timeout=RECORDER_FLUSH_PERIOD)
+			except queue.Empty:
+				item = ()
+			if item is None:
+				break
+			if len(item) > 0:
+				direction, tstamp, data = item
+				self._file.write(FRAME.pack(direction, tstamp, len(data)) + data)
+			if (time.monotonic()-last_flush) > RECORDER_FLUSH_PERIOD:
+				self._file.flush()
+				last_flush = time.monotonic()
+		self._file.flush()
+
+	def close(self):
+		"""Write the pending frames and close the log"""
+		if self._thread.is_alive():
+			self._queue.put(None)
+			self._thread.join()
+		self._file.close()
+		if self.dropped > 0:
+			logger.warning('Recorder dropped %u frames'%self.dropped)
+
+
+def read_session(filename):
+	"""Read a session log, return the start time and the list of frames (direction, time, bytes)"""
+	with open(filename, 'rb') as myfile:
+		raw = myfile.read()
+	if len(raw) < HEADER.size:
+		raise AstrocomError('Session log <%s> is too short'%filename)
+	magic, start = HEADER.unpack_from(raw, 0)
+	if magic != MAGIC:
+		raise AstrocomError('File <%s> is not a session log'%filename)
+	frames = []
+	offset = HEADER.size
+	while offset + FRAME.size <= len(raw):
+		direction, tstamp, length = FRAME.unpack_from(raw, offset)
+		offset += FRAME.size
+		frames.append((direction, tstamp, raw[offset:offset+length]))
+		offset += length
+	return start, frames
+
+
+class ReplayTransport:
+	"""
+	Fake port feeding a recorded session back to MountSW.
+	Answers are delivered after the recorded delay divided by `speed` (speed=None for no delay).
+	Written frames are compared with the recorded ones when `strict` is True.
+	"""
+	def __init__(self, filename, speed=1.0, strict=True, timeout=0.5):
+		_, self.frames = read_session(filename)
+		self.speed = speed
+		self.strict = strict
+		self._timeout = timeout if (speed is None) else timeout/speed
+		self.mismatch = 0
+		self._index = 0
+		self._buffer = bytearray()
+		self._ready = 0.0 # monotonic time when buffer can be read
+
+	@property
+	def finished(self):
+		return self._index >= len(self.frames)
+
+	@property
+	def timeout(self):
+		"""Answer timeout, null when the session is exhausted"""
+		if self.finished and (len(self._buffer) == 0):
+			return 0.0
+		return self._timeout
+
+	def _delay(self, i):
+		"""Recorded delay before frame i (relative to frame i-1)"""
+		if (self.speed is None) or (i == 0) or (i >= len(self.frames)):
+			return 0.0
+		return max(self.frames[i][1] - self.frames[i-1][1], 0.0) / self.speed
+
+	def write(self, data):
+		"""Consume the next recorded output frame and prepare its answer"""
+		while (not self.finished) and (self.frames[self._index][0] != DIR_OUT):
+			self._index += 1 # skip unread answers
+		if self.finished:
+			return len(data)
+		expected = self.frames[self._index][2]
+		if bytes(data) != expected:
+			self.mismatch += 1
+			if self.strict:
+				logger.warning('Replay mismatch: wrote %s, recorded %s'%(bytes(data), expected))
+		self._index += 1
+		self._buffer = bytearray()
+		if (not self.finished) and (self.frames[self._index][0] == DIR_IN):
+			self._ready = time.monotonic() + self._delay(self._index)
+			self._buffer += self.frames[self._index][2]
+			self._index += 1
+		return len(data)
+
+	def read(self, size=1):
+		"""Read bytes from the recorded answer, blocking up to the timeout like a port when there is none"""
+		if len(self._buffer) == 0:
+			time.sleep(self.timeout)
+			return b''
+		wait = self._ready - time.monotonic()
+		if wait > 0:
+			time.sleep(wait)
+		ans = bytes(self._buffer[:size])
+		del self._buffer[:size]
+		return ans
+
+	def reset_input_buffer(self):
+		self._buffer = bytearray()
+
+	def reset_output_buffer(self):
+		pass
+
+	def close(self):
+		pass
@@ -0,0 +1,211 @@
+"""
+Order the targets of an observing run to minimize the total slew time.
+
+Differences of hour angle between targets are differences of RA, so the
+pairwise slew cost matrix does not depend on time. Only visibility
+(altitude limit and time window) is evaluated along the route.
+"""
+
+import time
+import datetime
+import numpy as np
+from astrocom import logger, AstrocomError, AstrocomSuccess
+from astrocom.astro import radec_to_altaz
+from astrocom.clock import resolve_utc
+from astrocom.serialport import predict_slew_time
+
+SLEW_RATE = 3.0 # degree/second, default goto rate on each axis
+VISIBILITY_STEP = 300 # second, time step of the visibility grid
+VISIBILITY_SPAN_MAX = 24*3600 # second
+TWO_OPT_PASSES = 20
+
+
+def slew_cost_matrix(ra_deg, dec_deg, rates=(SLEW_RATE, SLEW_RATE), profile=None):
+	"""
+	Pairwise slew time [second] between targets, see serialport.predict_slew_time.
+	Use `rates=mount.goto_rates()` and a SlewProfile for the timing of a real mount.
+	"""
+	tel_ra = -np.asarray(ra_deg, dtype=float)/360 # telescope axis, up to a time-dependent offset
+	tel_dec = np.asarray(dec_deg, dtype=float)/360
+	return predict_slew_time((tel_ra[:,None], tel_dec[:,None]), (tel_ra[None,:], tel_dec[None,:]), rates, profile=profile)
+
+
+class SequencePlan:
+	"""Ordered targets with their planned arrival time"""
+	def __init__(self, targets, arrival, slew_time, skipped):
+		self.targets = targets
+		self.arrival = arrival # UTC datetimes
+		self.slew_time = slew_time # second, total
+		self.skipped = skipped # targets never visible
+
+	def __repr__(self):
+		return "SequencePlan %u targets, slew %.0fs, %u skipped"%(len(self.targets), self.slew_time, len(self.skipped))
+
+	def __len__(self):
+		return len(self.targets)
+
+	def __iter__(self):
+		return iter(zip(self.targets, self.arrival))
+
+
+class _Route:
+	"""Route evaluation on a cost matrix and a visibility grid (node 0 is the start)"""
+	def __init__(self, cost, dwell, visible, step):
+		self.cost = cost
+		self.dwell = dwell
+		self.visible = visible
+		self.step = step
+
+	def _wait_visible(self, target, t):
+		"""Earliest time >= t when the target is visible from arrival to the end of dwell (None if never)"""
+		k0 = int(np.floor(t/self.step + 0.5)) # nearest grid sample
+		kd = int(np.ceil(self.dwell[target]/self.step))
+		# window k..k+kd fully visible when it counts no hidden sample
+		hidden = np.concatenate(([0], np.cumsum(~self.visible[target])))
+		ok = hidden[kd+1:] == hidden[:len(hidden)-kd-1]
+		idx = np.flatnonzero(ok[min(k0, len(ok)):])
+		if len(idx) == 0:
+			return None
+		if idx[0] == 0:
+			return t
+		return (k0 + idx[0])*self.step
+
+	def simulate(self, order):
+		"""Total duration and arrival times of an order (duration is inf if infeasible)"""
+		t = 0.0
+		prev = 0
+		arrival = []
+		for node in order:
+			t = self._wait_visible(node-1, t + self.cost[prev, node])
+			if t is None:
+				return np.inf, None
+			arrival.append(t)
+			t += self.dwell[node-1]
+			prev = node
+		return t, arrival
+
+	def greedy(self, nodes):
+		"""Nearest neighbour among the targets that can be observed first"""
+		order = []
+		remaining = list(nodes)
+		skipped = []
+		t = 0.0
+		prev = 0
+		while len(remaining) > 0:
+			best = None
+			for node in remaining:
+				t_arr = self._wait_visible(node-1, t + self.cost[prev, node])
+				if t_arr is None:
+					continue
+				if (best is None) or (t_arr < best[1]):
+					best = (node, t_arr)
+			if best is None:
+				skipped += remaining
+				break
+			node, t = best
+			order.append(node)
+			remaining.remove(node)
+			t += self.dwell[node-1]
+			prev = node
+		return order, skipped
+
+	def two_opt(self, order):
+		"""Improve an open path by segment reversal, keeping visibility constraints"""
+		order = list(order)
+		duration, _ = self.simulate(order)
+		n = len(order)
+		for _ in range(TWO_OPT_PASSES):
+			improved = False
+			for i in range(n-1):
+				path = np.array([0] + order)
+				prev = path[i]
+				first = path[i+1]
+				last = path[i+2:]
+				nxt = np.append(path[i+3:], -1)
+				c_next_last = np.where(nxt >= 0, self.cost[last, np.maximum(nxt,0)], 0)
+				c_next_first = np.where(nxt >= 0, self.cost[first, np.maximum(nxt,0)], 0)
+				delta = self.cost[prev, last] + c_next_first - self.cost[prev, first] - c_next_last
+				for j in np.argsort(delta):
+					if delta[j] >= -1e-9:
+						break
+					candidate = order[:i] + order[i:i+j+2][::-1] + order[i+j+2:]
+					new_duration, _ = self.simulate(candidate)
+					if new_duration < duration - 1e-9:
+						order, duration = candidate, new_duration
+						improved = True
+						break
+			if not improved:
+				break
+		return order
+
+
+def plan_sequence(targets, mount_position, start=None, utc=None, dwell=0, alt_min=20, windows=None, rates=(SLEW_RATE, SLEW_RATE), profile=None, step=VISIBILITY_STEP, horizon=None):
+	"""
+	Order targets (RaDec or Star) to minimize the slew time, respecting visibility.
+	start   : current pointing as RaDec (None if unknown)
+	utc     : start of the run as UTC datetime or clock (default: clock of mount_position)
+	dwell   : time spent on each target [second], scalar or list
+	windows : None or list of (utc_start, utc_end) or None for each target
+	horizon : None or HorizonMask, local obstructions on top of alt_min
+	"""
+	if len(targets) == 0:
+		raise AstrocomError('No target to sequence')
+	if utc is None:
+		utc = mount_position.clock
+	utc = resolve_utc(utc)
+	nb = len(targets)
+	dwell = np.broadcast_to(np.asarray(dwell, dtype=float), (nb,))
+	ra = np.array([t.ra_degree for t in targets])
+	dec = np.array([t.dec_degree for t in targets])
+	if start is not None:
+		cost = slew_cost_matrix(np.append(start.ra_degree, ra), np.append(start.dec_degree, dec), rates=rates, profile=profile)
+	else:
+		cost = np.zeros((nb+1, nb+1))
+		cost[1:,1:] = slew_cost_matrix(ra, dec, rates=rates, profile=profile)
+	# visibility on a time grid covering the whole run
+	span = min(dwell.sum() + nb*cost.max() + 12*3600, VISIBILITY_SPAN_MAX)
+	grid = [utc + datetime.timedelta(seconds=k*step) for k in range(int(span//step)+1)]
+	alt, az = radec_to_altaz(ra[:,None], dec[:,None], mount_position.latitude_degree, mount_position.longitude_degree, utc=grid)
+	visible = np.atleast_2d(alt) >= alt_min
+	if horizon is not None:
+		visible &= np.atleast_2d(horizon.visible(alt, az))
+	if windows is not None:
+		grid_arr = np.array(grid, dtype='datetime64[us]')
+		for i in range(nb):
+			if windows[i] is not None:
+				w_start = np.datetime64(windows[i][0], 'us')
+				w_end = np.datetime64(windows[i][1], 'us')
+				visible[i] &= (grid_arr >= w_start) & (grid_arr <= w_end)
+	route = _Route(cost, dwell, visible, step)
+	order, skipped = route.greedy(range(1, nb+1))
+	order = route.two_opt(order)
+	_, arrival = route.simulate(order)
+	slew_time = sum(cost[a, b] for a, b in zip([0]+order[:-1], order))
+	if len(skipped) > 0:
+		logger.warning('%u targets are not visible during the run'%len(skipped))
+	return SequencePlan([targets[n-1] for n in order],
+						[utc + datetime.timedelta(seconds=float(t)) for t in arrival],
+						slew_time,
+						[targets[n-1] for n in skipped])
+
+
+def run_sequence(mount, mount_position, plan, dwell=0, callback=None, timeout=300):
+	"""
+	Drive the mount through a plan.
+	On each target, start sideral tracking then call `callback(target)` if given,
+	otherwise wait `dwell` seconds.
+	"""
+	for target, arrival in plan:
+		wait = (arrival - mount_position.clock.utcnow()).total_seconds()
+		if wait > 0:
+			logger.info('Wait %.0fs for %s to be visible'%(wait, target))
+			time.sleep(wait)
+		mount.goto(*mount_position.radec_to_telescope(target))
+		mount.start(3)
+		mount.wait_until_stopped(timeout=timeout)
+		mount.track() # the target drifts 15"/s on a stopped mount
+		if callback is not None:
+			callback(target)
+		else:
+			time.sleep(dwell)
+	return AstrocomSuccess('Sequence of %u targets done'%len(plan))
@@ -5,11 +5,18 @@ General comment:
 The mount saves and returns the declination and hour angle coordinates.
 """
 
-import serial.tools.list_ports
-from serial import Serial, PARITY_NONE
+import os
+import json
 import time
-from astrocom import logger, AstrocomError, AstrocomSuccess
+import numpy as np
+import serial.tools.list_ports
+from serial import Serial, SerialException, PARITY_NONE
+from concurrent.futures import ThreadPoolExecutor
+from astrocom import logger, AstrocomError, AstrocomSuccess, CACHE_DIR
 from astrocom.astro import SIDERAL_DAY_SEC, RaDec
+from astrocom.stats import STATS, Histogram
+from astrocom.record import DIR_OUT, DIR_IN
+from astrocom.transport import TIMEOUT, UDP_PREFIX, open_transport
 
 ### CONSTANTS
 class SWCMD:
@@ -33,6 +40,37 @@ class SWCMD:
 	GET_HIGH_SPEED_RATIO = 'g'
 	GET_AXIS_TELE_POSITION = 'd'
 	EXTENDED_INQUIRE = 'q'
+
+SWCMD_NAME = {v:k for k,v in vars(SWCMD).items() if not k.startswith('_')}
+
+# hexadecimal digits of the answers (None: any non-empty answer), to detect late answers of other commands
+ANSWER_DIGITS = {
+SWCMD.GET_CPR:None,
+SWCMD.GET_TIF:None,
+SWCMD.GET_MOTOR_BOARD_VERSION:None,
+SWCMD.GET_AXIS_STATUS:3,
+SWCMD.GET_AXIS_POSITION:6,
+SWCMD.GET_GOTO_POSITION:6,
+SWCMD.GET_STEP_PERIOD:None,
+SWCMD.GET_HIGH_SPEED_RATIO:None,
+SWCMD.GET_AXIS_TELE_POSITION:6,
+SWCMD.SET_POSITION:0,
+SWCMD.INIT_MOTOR:0,
+SWCMD.SET_MOTION_MODE:0,
+SWCMD.SET_STEP_PERIOD:0,
+SWCMD.START_MOTION:0,
+SWCMD.STOP_MOTION:0,
+SWCMD.STOP_MOTION_NOW:0,
+SWCMD.SET_AUTOGUIDE_RATE:0,
+SWCMD.SET_GOTO_TARGET:0,
+SWCMD.SET_LED_BRIGHTNESS:0}
+
+# commands that must not be sent twice blindly: their effect is checked on the axis status before a retry
+NON_IDEMPOTENT = {
+SWCMD.START_MOTION:lambda status: not status['STOP'],
+SWCMD.INIT_MOTOR:lambda status: status['INIT']}
+
+TRANSMISSION_ERRORS = ['0','1','3'] # error codes of corrupted commands, worth a retry
     
 SW_ERROR = {
 '0':'UNKNOWN_COMMAND',
@@ -60,9 +98,34 @@ SW_POS_MAXI = int("F"*6,16) / 2.0
 SW_POS_OFFSET = int("800000",16)
 SW_POS_STEP = 1.0 / SW_POS_MAXI
 
-TIMEOUT = 0.5 # second
+PROBE_TIMEOUT = 0.2 # second, used when discovering mounts
+SUPPORTED_BAUDRATES = [115200, 38400, 19200, 9600] # tried fastest first
+LAST_PORT_FILE = os.path.join(CACHE_DIR, 'last_port.json')
+GOTO_SIDERAL_MULTIPLIER = 800 # typical fast goto speed of Sky-Watcher mounts
+SESSION_FILE = os.path.join(CACHE_DIR, 'session.json')
+RECONNECT_ATTEMPTS = 6
+RECONNECT_DELAY = 0.2 # second, doubled after each failed attempt
+RECONNECT_MAX_DELAY = 5.0 # second
+WARM_START_TOLERANCE = 0.001 # turn, position mismatch accepted at warm start
+RETRY = 2 # retries of a command after a transmission failure
+RESYNC_QUIET = 0.02 # second, silence on the line before a retry
 
 ### FUNCTIONS
+def get_stats():
+	"""Get the communication and computation statistics as a dictionary"""
+	return STATS.snapshot()
+
+
+def reset_stats():
+	"""Reset the communication and computation statistics"""
+	STATS.reset()
+
+
+def print_stats():
+	"""Print the communication and computation statistics"""
+	print(STATS.report())
+
+
 def list_ports():
 	"""Get list of serial ports"""
 	return serial.tools.list_ports.comports()
@@ -77,6 +140,158 @@ def print_ports():
 		print()
     
 
+def _probe_cmd(ser, cmd_letter, timeout):
+	"""Send a command on an opened Serial and decode its hexadecimal answer (None on failure)"""
+	ser.write(bytes(':'+cmd_letter+'1\r','utf8'))
+	t0 = time.time()
+	ans = bytearray()
+	while (time.time()-t0) < timeout:
+		ans += ser.read_until(b'\r')
+		if len(ans)>0 and ans[-1] == 13:
+			break
+	try:
+		ans = ans.decode('utf8')
+	except UnicodeDecodeError:
+		return None
+	if has_error(ans) or (ans[0] != '=') or (len(ans)-2 not in [2,4,6]):
+		return None
+	try:
+		return hexa_response_to_int(ans[1:-1])
+	except ValueError:
+		return None
+
+
+def probe_port(portname, baudrate=9600, timeout=PROBE_TIMEOUT):
+	"""
+	Check if a Sky-Watcher mount answers on a port.
+	The handshake is confirmed by two valid answers (version and CPR), since
+	a wrong baudrate can give a frame of garbage that looks valid by chance.
+	Return a dictionary (port, baudrate, version, cpr) or None.
+	"""
+	try:
+		with Serial(port=portname, baudrate=baudrate, parity=PARITY_NONE, stopbits=1, timeout=timeout) as ser:
+			ser.reset_input_buffer()
+			version = _probe_cmd(ser, SWCMD.GET_MOTOR_BOARD_VERSION, timeout)
+			if version is None:
+				return None
+			cpr = _probe_cmd(ser, SWCMD.GET_CPR, timeout)
+	except (SerialException, OSError, ValueError):
+		return None
+	if cpr is None:
+		return None
+	return {'port':portname, 'baudrate':baudrate, 'version':version, 'cpr':cpr}
+
+
+def confirm_port(info, timeout=PROBE_TIMEOUT):
+	"""
+	Check with a single version query that the mount of a cached probe answer (see probe_port)
+	is still there. The version must match the cached one, which rejects garbage frames.
+	Return the cached dictionary or None.
+	"""
+	try:
+		with Serial(port=info['port'], baudrate=info.get('baudrate',9600), parity=PARITY_NONE, stopbits=1, timeout=timeout) as ser:
+			ser.reset_input_buffer()
+			version = _probe_cmd(ser, SWCMD.GET_MOTOR_BOARD_VERSION, timeout)
+	except (SerialException, OSError, ValueError):
+		return None
+	if (version is None) or (version != info.get('version', version)):
+		return None
+	return dict(info, version=version)
+
+
+def _probe_port_all_baudrates(portname, baudrates, timeout):
+	"""
+	Probe a port successively at each baudrate (fastest first), return first answer.
+	Garbage received by the board at a wrong baudrate is harmless: ':' starts a new command.
+	"""
+	for baudrate in sorted(baudrates, reverse=True):
+		info = probe_port(portname, baudrate=baudrate, timeout=timeout)
+		if info is not None:
+			return info
+	return None
+
+
+def negotiate_baudrate(portname, baudrates=None, timeout=PROBE_TIMEOUT):
+	"""Find the fastest baudrate at which the mount answers on a port, raise AstrocomError if none"""
+	if baudrates is None:
+		baudrates = SUPPORTED_BAUDRATES
+	info = _probe_port_all_baudrates(portname, baudrates, timeout)
+	if info is None:
+		raise AstrocomError('No mount answering on <%s> at %s bauds'%(portname, '/'.join(str(b) for b in sorted(baudrates, reverse=True))))
+	AstrocomSuccess('Link negotiated at %u bauds on <%s>'%(info['baudrate'], portname))
+	return info['baudrate']
+
+
+def load_last_port():
+	"""Load the last port where a mount was found (None if no cache)"""
+	try:
+		with open(LAST_PORT_FILE,'r') as myfile:
+			return json.load(myfile)
+	except (OSError, ValueError):
+		return None
+
+
+def save_last_port(info):
+	"""Save the port where a mount was found"""
+	try:
+		os.makedirs(os.path.dirname(LAST_PORT_FILE), exist_ok=True)
+		with open(LAST_PORT_FILE,'w') as myfile:
+			json.dump(info, myfile)
+	except OSError:
+		logger.warning('Could not write port cache <%s>'%LAST_PORT_FILE)
+
+
+def load_session(filename=SESSION_FILE, portname=None):
+	"""Load the saved session state (None if no session, or if saved for another port)"""
+	try:
+		with open(filename,'r') as myfile:
+			session = json.load(myfile)
+	except (OSError, ValueError):
+		return None
+	if (portname is not None) and (session.get('port') != portname):
+		return None
+	return session
+
+
+def save_session(session, filename=SESSION_FILE):
+	"""Save a session state (see MountSW.session_state)"""
+	try:
+		os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+		with open(filename+'.tmp','w') as myfile:
+			json.dump(session, myfile)
+		os.replace(filename+'.tmp', filename)
+	except OSError:
+		logger.warning('Could not write session <%s>'%filename)
+
+
+def discover_mounts(ports=None, baudrates=None, timeout=PROBE_TIMEOUT, use_cache=True):
+	"""
+	Find the ports where a Sky-Watcher mount is answering.
+	The last successful port is confirmed first (one round trip), then all ports are probed in parallel.
+	Return a list of dictionaries (port, baudrate, version, cpr).
+	"""
+	if ports is None:
+		ports = [p.device for p in list_ports()]
+	if baudrates is None:
+		baudrates = SUPPORTED_BAUDRATES
+	if use_cache:
+		last = load_last_port()
+		if (last is not None) and (last.get('port') in ports):
+			info = confirm_port(last, timeout=timeout)
+			if info is not None:
+				logger.debug('Mount found on cached port %s', info['port'])
+				return [info]
+	if len(ports)==0:
+		return []
+	# a port cannot be opened twice, so baudrates are tried sequentially for each port
+	with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+		answers = executor.map(lambda p: _probe_port_all_baudrates(p, baudrates, timeout), ports)
+		mounts = [info for info in answers if info is not None]
+	if use_cache and len(mounts)>0:
+		save_last_port(mounts[0])
+	return mounts
+
+
 def has_error(strng):
 	"""Check if the string is valid or not (empty or includes error pattern)"""
 	if len(strng)==0:
@@ -90,13 +305,30 @@ def error_to_str(strng):
 	"""Decode error to human format"""
 	if len(strng)==0:
 		return 'EMPTY_ANSWER'
-	error_code = strng[1:]
+	error_code = strng[1:].strip()
 	if error_code in SW_ERROR.keys():
 		return SW_ERROR[error_code]
 	else:
 		return 'UNKNOWN_ERROR'
 
 
+def is_valid_answer(strng, cmd_letter=None):
+	"""Check the frame of an answer ('=' + hexadecimal digits, or '!' + code), and its length if the command is given"""
+	if (len(strng) < 2) or (strng[-1] != '\r'):
+		return False
+	if strng[0] == '!':
+		return len(strng) == 3
+	if strng[0] != '=':
+		return False
+	digits = strng[1:-1]
+	if any(c not in '0123456789ABCDEFabcdef' for c in digits):
+		return False
+	if cmd_letter not in ANSWER_DIGITS:
+		return True
+	expected = ANSWER_DIGITS[cmd_letter]
+	return len(digits) > 0 if expected is None else len(digits) == expected
+
+
 def axis_status_to_dict(strng):
 	"""Convert axis status to dictionary"""
 	bt = bytes(strng,'utf8')
@@ -172,80 +404,315 @@ def turn_ratio_to_position(ratio):
 	return int_to_hexa_cmd(int(round(ratio*SW_POS_MAXI + SW_POS_OFFSET)))
 
 
+def wrap_goto_ratio(ra_ratio, ra_ratio_cur):
+	"""Reduce an RA goto target to less than half a turn from the current position (arrays accepted)"""
+	ra_ratio = np.asarray(ra_ratio, dtype=float)
+	delta = ra_ratio - ra_ratio_cur
+	return ra_ratio - (delta > 0.5) + (delta < -0.5)
+
+
+def goto_rate(cpr, tif, high_speed_ratio, sideral_speed_multiplier=GOTO_SIDERAL_MULTIPLIER):
+	"""Fast goto rate [degree/second] from the motor parameters, with step period rounding"""
+	step = max(int(round(SIDERAL_DAY_SEC*tif*high_speed_ratio/cpr/sideral_speed_multiplier)), 1)
+	return tif*360*high_speed_ratio/step/cpr
+
+
+class RetryPolicy:
+	"""
+	Answer timeouts and retries of the commands.
+	The timeout of a command is a margin times a high percentile of its observed
+	round-trip times, within bounds (max_timeout until enough answers are seen).
+	"""
+	def __init__(self, percentile=99, margin=3.0, min_timeout=0.02, max_timeout=TIMEOUT, min_count=20, retry=RETRY):
+		self.percentile = percentile
+		self.margin = margin
+		self.min_timeout = min_timeout
+		self.max_timeout = max_timeout
+		self.min_count = min_count
+		self.retry = retry
+		self.rtt = {} # command letter -> Histogram of the answered commands
+		self.counters = {'timeout':0, 'corrupted':0, 'retry':0, 'resync':0, 'stale_bytes':0, 'verified':0}
+
+	def timeout(self, cmd_letter):
+		"""Answer timeout of a command [second]"""
+		hist = self.rtt.get(cmd_letter)
+		if (hist is None) or (hist.count < self.min_count):
+			return self.max_timeout
+		return min(max(self.margin*hist.percentile(self.percentile), self.min_timeout), self.max_timeout)
+
+	def observe(self, cmd_letter, seconds):
+		"""Record the round-trip time of an answered command"""
+		hist = self.rtt.get(cmd_letter)
+		if hist is None:
+			hist = self.rtt[cmd_letter] = Histogram()
+		hist.add(seconds)
+
+	def increment(self, name, value=1):
+		self.counters[name] += value
+		STATS.increment(name, value)
+
+	def snapshot(self):
+		"""Counters, and round-trip times and timeouts [second] per command"""
+		return {'counters':dict(self.counters),
+				'commands':{SWCMD_NAME.get(c,c):dict(h.as_dict(), timeout=self.timeout(c)) for c,h in self.rtt.items()}}
+
+
+class SlewProfile:
+	"""Trapezoidal velocity profile of a goto"""
+	def __init__(self, acceleration=1.0, settle=1.0):
+		self.acceleration = acceleration # degree/second^2
+		self.settle = settle # second, added to any non-null slew
+
+
+def axis_slew_time(distance_deg, rate, acceleration=np.inf):
+	"""Time [second] to move an axis by a distance with a trapezoidal velocity profile (arrays accepted)"""
+	distance_deg = np.abs(np.asarray(distance_deg, dtype=float))
+	ramp_distance = rate**2/acceleration # acceleration + deceleration
+	return np.where(distance_deg < ramp_distance,
+					2*np.sqrt(distance_deg/acceleration),
+					distance_deg/rate + rate/acceleration)
+
+
+def predict_slew_time(from_ratio, to_ratio, rates, profile=None):
+	"""
+	Predict the duration [second] of a goto between telescope positions (ra_ratio, dec_ratio).
+	Positions can be arrays to rank many targets at once; both axes move simultaneously.
+	rates   : goto rates (degree/second) of the RA and DEC axes
+	profile : SlewProfile, or None for instantaneous acceleration
+	"""
+	if profile is None:
+		profile = SlewProfile(acceleration=np.inf, settle=0)
+	ra_to = wrap_goto_ratio(to_ratio[0], from_ratio[0])
+	d_ra = 360*(ra_to - np.asarray(from_ratio[0]))
+	d_dec = 360*(np.asarray(to_ratio[1]) - np.asarray(from_ratio[1]))
+	duration = np.maximum(axis_slew_time(d_ra, rates[0], profile.acceleration),
+						axis_slew_time(d_dec, rates[1], profile.acceleration))
+	return np.where(duration > 0, duration + profile.settle, 0.0)
+
+
 ### CLASS
-class MountSWserial(Serial):
+class MountSWserial:
 	"""
-	Raw functions to communicate with Sky-Watcher mount
+	Raw functions to communicate with Sky-Watcher mount.
+	The transport is a serial port by default, a UDP transport for port names
+	like 'udp://192.168.4.1', or any object with the same
+	write/read/reset_input_buffer/reset_output_buffer/close methods (e.g. ReplayTransport).
+	After an I/O error, the transport is reopened by `transport_factory`
+	(the port by default) with a bounded exponential backoff.
+	baudrate=None negotiates the fastest baudrate of a serial port.
 	"""
 	
 	### BASIC READ and WRITE FUNCTIONS
-	def __init__(self, portname):
+	def __init__(self, portname=None, baudrate=None, transport=None, recorder=None, transport_factory=None, retry_policy=None):
 		"""Init a MountSW serial port"""
-		super().__init__(port=portname, baudrate=9600, parity=PARITY_NONE, stopbits=1, timeout=TIMEOUT)
-		if not self.is_open:
-			self.open()
-		self.flushInput()
-		self.flushOutput()
+		if (baudrate is None) and (transport is None) and (transport_factory is None) and (portname is not None) and not portname.startswith(UDP_PREFIX):
+			baudrate = negotiate_baudrate(portname)
+		if (transport_factory is None) and (portname is not None):
+			transport_factory = lambda: open_transport(portname, baudrate=baudrate)
+		if transport is None:
+			transport = transport_factory() if transport_factory is not None else open_transport(portname, baudrate=baudrate)
+		self.portname = portname
+		self.baudrate = baudrate
+		self.transport = transport
+		self.transport_factory = transport_factory
+		self.recorder = recorder
+		self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+		self.stop_on_delete = True # set False (or use detach) to leave the motors running
+		self._stale = False # late answers may still arrive after a failed command
+		self.nb_reconnect = 0
+		self._reconnecting = False
+		self._deleting = False # no reconnection while the object is deleted
+		self.transport.reset_input_buffer()
+		self.transport.reset_output_buffer()
 		for k in SW_MODE.keys():
 			setattr(self, k, SW_MODE[k])
+		self.north_south = self.NORTH
+		self._static = {} # static parameters of the axes (CPR, TIF...)
+		self._track_direction = {} # direction of the axes tracking since _move_axis (see MountSW.set_track_rate)
 
 	def __del__(self):
 		"""Delete instance, but try to close port before"""
-		try:
-			self.stop_motion_now(3)
-			AstrocomSuccess('Motors have been stopped')
-		except:
-			AstrocomError('Could not stop motors') # do not raise error when deleting object
+		if not hasattr(self, 'transport'): # the port could not be opened
+			return
+		self._deleting = True
+		if getattr(self, 'stop_on_delete', True):
+			try:
+				self.stop_motion_now(3)
+				AstrocomSuccess('Motors have been stopped')
+			except:
+				AstrocomError('Could not stop motors') # do not raise error when deleting object
 		try:
 			self.close()
 			AstrocomSuccess('Port has been closed')
 		except:
 			AstrocomError('Port closing encountered an error') # do not raise error when deleting object
 			
+	def close(self):
+		"""Close the transport and the recorder"""
+		self.transport.close()
+		if self.recorder is not None:
+			self.recorder.close()
+			self.recorder = None
+	
+	def detach(self):
+		"""Close the port but leave the motors as they are (e.g. tracking for the next session)"""
+		self.stop_on_delete = False
+		self.close()
+	
+	def reconnect(self, attempts=RECONNECT_ATTEMPTS, delay=RECONNECT_DELAY, max_delay=RECONNECT_MAX_DELAY):
+		"""Reopen the transport with a bounded exponential backoff, then reattach to the mount"""
+		if self.transport_factory is None:
+			raise AstrocomError('Transport lost and no way to reopen it')
+		try:
+			self.transport.close()
+		except (SerialException, OSError):
+			pass
+		for k in range(attempts):
+			try:
+				self.transport = self.transport_factory()
+				self.transport.reset_input_buffer()
+				self.transport.reset_output_buffer()
+			except (SerialException, OSError, ValueError):
+				wait = min(delay*2**k, max_delay)
+				logger.warning('Reconnection attempt %u/%u failed'%(k+1, attempts))
+				if k < attempts-1:
+					time.sleep(wait)
+				continue
+			self.nb_reconnect += 1
+			STATS.increment('reconnect')
+			AstrocomSuccess('Reconnected after %u attempt(s)'%(k+1))
+			self._reconnecting = True
+			try:
+				self.reattach()
+			finally:
+				self._reconnecting = False
+			return
+		raise AstrocomError('Could not reconnect after %u attempts'%attempts)
+	
+	def reattach(self):
+		"""Called after a reconnection (nothing to check at this level)"""
+		pass
+			
 	def write(self, strng):
 		"""Write a string into the serial port"""
-		super().write(bytes(':'+strng+'\r','utf8'))
+		data = bytes(':'+strng+'\r','utf8')
+		self.transport.write(data)
+		if self.recorder is not None:
+			self.recorder.record(DIR_OUT, data)
 		
-	def read(self):
+	def _set_timeout(self, timeout):
+		"""Apply a read timeout to the transport when it can be changed, return the effective one"""
+		current = getattr(self.transport, 'timeout', TIMEOUT)
+		if current != timeout:
+			try:
+				self.transport.timeout = timeout
+			except AttributeError: # fixed timeout (e.g. ReplayTransport)
+				return min(timeout, current)
+		return timeout
+	
+	def read(self, timeout=None):
 		"""
 		Get a string from the serial port.
 		Ending character is chr(13) = \ r
 		"""
 		ans = bytearray()
+		if timeout is None:
+			timeout = getattr(self.transport, 'timeout', TIMEOUT)
 		t0 = time.time()
 		t1 = time.time()
 		stop = False
 		while not stop: 
-		    ans += super().read()
+		    ans += self.transport.read()
 		    t1 = time.time()
-		    if (t1-t0)>TIMEOUT:
+		    if (t1-t0)>timeout:
 		        stop = True
 		    if len(ans)>0:
 		        if ans[-1] == 13: # chr(13) == b'\r'
 		            stop = True
-		try:
-			ans = ans.decode('utf8')
-			return ans
-		except:
-			raise AstrocomError('Could not decode data <%s>'%ans)
+		if self.recorder is not None:
+			self.recorder.record(DIR_IN, ans)
+		return ans.decode('utf8', errors='replace') # corrupted bytes make an invalid frame
+	
+	def resync(self):
+		"""Drop the late bytes of previous commands until the line is quiet"""
+		timeout = self._set_timeout(RESYNC_QUIET)
+		nb_byte = 0
+		t0 = time.time()
+		while (time.time()-t0) < max(timeout, 1e-3):
+			data = self.transport.read()
+			if len(data) == 0:
+				break
+			nb_byte += len(data)
+			t0 = time.time()
+		self.transport.reset_input_buffer()
+		self.retry_policy.increment('resync')
+		self.retry_policy.increment('stale_bytes', nb_byte)
+		self._stale = False
 	
-	def send_cmd(self, cmd_letter, axis_int, cmd_string='', retry=2):
+	def _command_done(self, cmd_letter, axis_int):
+		"""Check on the axis status if a command without valid answer was executed anyway"""
+		axes = [1,2] if axis_int==3 else [axis_int]
+		return all(NON_IDEMPOTENT[cmd_letter](self.get_axis_status_as_dict(axis)) for axis in axes)
+	
+	def send_cmd(self, cmd_letter, axis_int, cmd_string='', retry=None):
 		"""
 		Send a command to the mount and read response.
+		Transmission failures (no answer, corrupted or unexpected frame) are retried
+		after a resync; a non-idempotent command is sent again only if its effect
+		is not seen on the axis status. Errors answered by the mount are raised.
 		Return the mount string or AstrocomError.
 		"""
 		if (type(cmd_letter)!=str) or (type(axis_int)!=int) or (type(cmd_string)!=str):
 			raise AstrocomError('WRONG_INPUT_TYPE')
-		if axis_int in [1,2,3]: # 3=both
-		    self.write(cmd_letter+str(axis_int)+cmd_string)
-		    ans = self.read()
-		    if has_error(ans) and (retry>0):
-		    	ans = self.send_cmd(cmd_letter, axis_int, cmd_string=cmd_string, retry=retry-1)
-		    if has_error(ans) and (retry==0):
-		    	raise AstrocomError(error_to_str(ans))
-		    return ans
-		else:
-		    raise AstrocomError('INVALID_AXIS_ID')
+		if axis_int not in [1,2,3]: # 3=both
+			raise AstrocomError('INVALID_AXIS_ID')
+		policy = self.retry_policy
+		if retry is None:
+			retry = policy.retry
+		cmd_name = SWCMD_NAME.get(cmd_letter,cmd_letter)
+		name = 'cmd.'+cmd_name
+		ans = ''
+		for attempt in range(retry+1):
+			if attempt > 0:
+				policy.increment('retry')
+				if (cmd_letter in NON_IDEMPOTENT) and self._command_done(cmd_letter, axis_int):
+					policy.increment('verified')
+					return '=\r'
+			if self._stale:
+				self.resync()
+			t0 = time.perf_counter()
+			try:
+				self.write(cmd_letter+str(axis_int)+cmd_string)
+				ans = self.read(timeout=self._set_timeout(policy.timeout(cmd_letter)))
+			except (SerialException, OSError):
+				STATS.increment('io_error')
+				if self._reconnecting or self._deleting or (attempt==retry):
+					raise AstrocomError('IO_ERROR')
+				self.reconnect()
+				continue
+			rtt = time.perf_counter()-t0
+			STATS.add_latency(name, rtt)
+			STATS.increment('bytes_out.'+cmd_name, len(cmd_string)+4) # ':' + letter + axis + data + '\r'
+			STATS.increment('bytes_in.'+cmd_name, len(ans))
+			if is_valid_answer(ans, cmd_letter):
+				policy.observe(cmd_letter, rtt)
+				if not has_error(ans):
+					return ans
+				STATS.increment('error.'+error_to_str(ans))
+				if ans[1] not in TRANSMISSION_ERRORS:
+					raise AstrocomError(error_to_str(ans))
+			elif len(ans) == 0:
+				policy.increment('timeout')
+			else:
+				policy.increment('corrupted')
+			self._stale = True
+		if (len(ans) > 0) and not is_valid_answer(ans):
+			raise AstrocomError('CORRUPTED_ANSWER')
+		raise AstrocomError(error_to_str(ans))
+	
+	def retry_stats(self):
+		"""Counters of the retry policy, and round-trip times and timeouts per command"""
+		return self.retry_policy.snapshot()
 	
 	def send_cmd_hexa_ans(self, *args, **kwargs):
 		"""Send a command and decode an hexadecimal answer"""
@@ -257,15 +724,22 @@ class MountSWserial(Serial):
 		ans = self.send_cmd(*args, **kwargs)
 		return position_to_turn_ratio(ans[1:-1])
 	
+	def _forget_track(self, axis):
+		"""The motion of an axis (1, 2 or 3=both) is changed by another command"""
+		for a in ([1,2] if axis==3 else [axis]):
+			self._track_direction.pop(a, None)
+	
 	### SKY-WATCHER BASIC FUNCTIONS (END-USER SHOULD REFRAIN USING THEM)
 	def set_motion_mode(self, axis, goto_or_track, speed, direction):
 		"""Set motion mode"""
+		self._forget_track(axis)
 		if goto_or_track == self.GOTO:
 			speed = 1 - speed # in GOTO mode, FAST and SLOW are inverted
 		return self.send_cmd(SWCMD.SET_MOTION_MODE, axis, str(2*speed+goto_or_track)+str(2*self.north_south+direction))
 
 	def init_motor(self, axis):
 		"""Initialize motor"""
+		self._forget_track(axis)
 		return self.send_cmd(SWCMD.INIT_MOTOR, axis)
 		
 	def get_cpr(self, axis):
@@ -297,7 +771,7 @@ class MountSWserial(Serial):
 	def set_goto_target(self, axis, ratio):
 		"""Set goto target from a turn ratio"""
 		pos = turn_ratio_to_position(ratio)
-		logger.debug('Go to %.3f on axis %u'%(ratio, axis))
+		logger.debug('Go to %.3f on axis %u', ratio, axis)
 		return self.send_cmd(SWCMD.SET_GOTO_TARGET, axis, pos)
 	
 	def get_goto_target(self, axis):
@@ -343,10 +817,12 @@ class MountSWserial(Serial):
 
 	def stop_motion(self, axis):
 		"""Stop motion"""
+		self._forget_track(axis)
 		return self.send_cmd(SWCMD.STOP_MOTION, axis)
 		
 	def stop_motion_now(self, axis):
 		"""Instantaneously stop motion"""
+		self._forget_track(axis)
 		return self.send_cmd(SWCMD.STOP_MOTION_NOW, axis)
 
 	def set_autoguide_rate(self, axis, rate):
@@ -387,6 +863,51 @@ class MountSW(MountSWserial):
 		self.set_axis_position(2, 0)
 		return AstrocomSuccess('Motors correctly initialized')
 	
+	def reattach(self):
+		"""Check that the mount kept its initialization (and positions) after a reconnection"""
+		for axis in [1,2]:
+			if not self.get_axis_status_as_dict(axis)['INIT']:
+				raise AstrocomError('Mount was restarted: initialize and sync it again')
+	
+	def session_state(self, site=None):
+		"""
+		State to save for a warm start (see save_session): port, site (longitude, latitude),
+		static parameters, synced position and tracking.
+		"""
+		status = self.get_axis_status_as_dict(1)
+		return {'port':self.portname, 'baudrate':self.baudrate,
+				'site':None if site is None else list(site),
+				'north_south':self.north_south,
+				'static':{str(axis):self.get_static_parameters(axis) for axis in [1,2]},
+				'position':list(self.get_position()),
+				'tracking':bool(status['TRACK'] and not status['STOP']),
+				'time':time.time()}
+	
+	def warm_start(self, session, tolerance=WARM_START_TOLERANCE):
+		"""
+		Reattach to a mount still powered since a saved session, without initialization.
+		Return True if the position is checked and tracking resumed, False if a cold start is needed.
+		"""
+		if session is None:
+			return False
+		self.north_south = session.get('north_south', self.north_south)
+		status = [self.get_axis_status_as_dict(axis) for axis in [1,2]]
+		if not (status[0]['INIT'] and status[1]['INIT']):
+			logger.info('Mount was restarted since the last session: cold start needed')
+			return False
+		ra_ratio, dec_ratio = self.get_position()
+		ra_saved, dec_saved = session['position']
+		if status[0]['TRACK'] and not status[0]['STOP']: # still tracking since the session
+			ra_saved += (time.time() - session['time'])/SIDERAL_DAY_SEC
+		if max(abs(ra_ratio - ra_saved), abs(dec_ratio - dec_saved)) > tolerance:
+			logger.info('Mount moved since the last session: cold start needed')
+			return False
+		self._static = {int(axis):params for axis,params in session.get('static', {}).items()}
+		if session.get('tracking') and status[0]['STOP']:
+			self.track()
+		AstrocomSuccess('Warm start from the last session')
+		return True
+	
 	def get_position(self):
 		"""Get current mount position (as fraction of turn)"""
 		ra_ratio = self.get_axis_position(1)
@@ -418,12 +939,10 @@ class MountSW(MountSWserial):
 		"""Stop motors and set a goto target (as fraction of turn)"""
 		self.stop_motion(3)
 		ra_ratio_cur, dec_ratio_cur = self.get_position()
-		if (ra_ratio - ra_ratio_cur) > 0.5:
-			ra_ratio -= 1
-			logger.debug('Goto more than half-turn: reduced by 1')
-		if (ra_ratio - ra_ratio_cur) < -0.5:
-			ra_ratio += 1
-			logger.debug('Goto more than half-turn: increased by 1')
+		ra_ratio_wrap = float(wrap_goto_ratio(ra_ratio, ra_ratio_cur))
+		if ra_ratio_wrap != ra_ratio:
+			logger.debug('Goto more than half-turn: changed by %+.0f', ra_ratio_wrap-ra_ratio)
+			ra_ratio = ra_ratio_wrap
 		self.set_goto_target(1, ra_ratio)
 		self.set_goto_target(2, dec_ratio)
 		for axis in [1,2]:
@@ -432,6 +951,41 @@ class MountSW(MountSWserial):
 			self.set_motion_mode(axis, self.GOTO, speed, direction)
 		return AstrocomSuccess('Goto correctly defined')
 	
+	def get_static_parameters(self, axis):
+		"""Get CPR, TIF and high speed ratio of an axis (queried once, then cached)"""
+		if axis not in self._static:
+			self._static[axis] = {'cpr':self.get_cpr(axis), 'tif':self.get_tif(axis), 'high_speed_ratio':self.get_high_speed_ratio(axis)}
+		return self._static[axis]
+	
+	def goto_rates(self):
+		"""Get the fast goto rates (degree/second) of the RA and DEC axes"""
+		return tuple(goto_rate(**self.get_static_parameters(axis)) for axis in [1,2])
+	
+	def predict_slew_time(self, from_ratio, to_ratio, profile=None):
+		"""
+		Predict the duration [second] of a goto (positions as fraction of turn, arrays accepted).
+		from_ratio=None uses the current mount position.
+		"""
+		if from_ratio is None:
+			from_ratio = self.get_position()
+		if profile is None:
+			profile = SlewProfile()
+		return predict_slew_time(from_ratio, to_ratio, self.goto_rates(), profile=profile)
+	
+	def is_moving(self):
+		"""Check if at least one motor is moving"""
+		stop_1 = self.get_axis_status_as_dict(1)['STOP']
+		stop_2 = self.get_axis_status_as_dict(2)['STOP']
+		return not (stop_1 and stop_2)
+	
+	def wait_until_stopped(self, timeout=300, poll=0.5):
+		"""Wait until both motors are stopped (e.g. end of goto)"""
+		t0 = time.time()
+		while self.is_moving():
+			if (time.time()-t0) > timeout:
+				raise AstrocomError('Motors still moving after %.0fs'%timeout)
+			time.sleep(poll)
+	
 	def goto_home(self):
 		"""Goto home position"""
 		return self.goto(0, 0)
@@ -452,6 +1006,17 @@ class MountSW(MountSWserial):
 		self.set_motion_mode(axis, self.TRACK, self.SLOW, direction)
 		self._set_speed(axis, abs(sideral_speed_multiplier))
 		self.start_motion(axis)
+		self._track_direction[axis] = direction
+	
+	def set_track_rate(self, axis, sideral_speed_multiplier):
+		"""
+		Track at a signed multiple of the sideral speed, for closed loops (guiding).
+		While the axis keeps tracking in the same direction, only the step period is sent.
+		"""
+		direction = self.FORWARD if sideral_speed_multiplier>0 else self.BACKWARD
+		if (sideral_speed_multiplier!=0) and (self._track_direction.get(axis)==direction):
+			return self._set_speed(axis, abs(sideral_speed_multiplier))
+		return self._move_axis(axis, sideral_speed_multiplier)
 	
 	def move_ra(self, sideral_speed_multiplier):
 		"""Move along the RA axis"""
@@ -476,8 +1041,8 @@ class MountSW(MountSWserial):
 			raise AstrocomError('Speed multiplier cannot be negative or null')
 		if sideral_speed_multiplier>30:
 			raise AstrocomError('Prevent to set such a high speed')
-		cpr = self.get_cpr(axis)
-		tif = self.get_tif(axis)
+		static = self.get_static_parameters(axis)
+		cpr, tif = static['cpr'], static['tif']
 		step = int(round(SIDERAL_DAY_SEC*tif/cpr/sideral_speed_multiplier))
 		return self.set_step_period(axis, step)
 		
@@ -0,0 +1,290 @@
+"""
+Network server sharing one MountSW connection between many clients.
+
+Protocol over TCP, one JSON object per line:
+	request : {"id": 1, "cmd": "get_position", "args": []}
+	answer  : {"id": 1, "result": [0.1, -0.2]}   or   {"id": 1, "error": "MOTOR_RUNNING"}
+	event   : {"event": "state", "state": {...}}   (sent to clients after "subscribe")
+
+Identical read requests received while one is already running share its
+serial transaction. Serial transactions run one at a time in a worker thread.
+"""
+
+import json
+import socket
+import asyncio
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from astrocom import logger, AstrocomError, AstrocomSuccess
+
+SERVER_PORT = 11881
+POLL_PERIOD = 1.0 # second, state polling when clients are subscribed
+
+READ_COMMANDS = ['get_state', 'get_position', 'get_goto', 'get_axis_status_as_dict',
+				'get_axis_status_as_str', 'is_moving', 'goto_rates', 'predict_slew_time']
+WRITE_COMMANDS = ['init_mount', 'set_position', 'goto', 'goto_home', 'start', 'stop',
+				'track', 'move_ra', 'move_dec']
+
+
+def get_mount_state(mount):
+	"""Position, goto target and status of both axes"""
+	return {'position': mount.get_position(),
+			'goto': mount.get_goto(),
+			'status': [mount.get_axis_status_as_dict(1), mount.get_axis_status_as_dict(2)]}
+
+
+def _to_json(value):
+	"""Convert results (tuples, numpy values, AstrocomSuccess) to JSON types"""
+	if isinstance(value, AstrocomSuccess):
+		return True
+	if isinstance(value, (tuple, list)):
+		return [_to_json(v) for v in value]
+	if isinstance(value, dict):
+		return {k:_to_json(v) for k,v in value.items()}
+	if hasattr(value, 'tolist'):
+		return value.tolist()
+	return value
+
+
+class MountServer:
+	"""Asyncio TCP server owning the MountSW connection"""
+	def __init__(self, mount, host='127.0.0.1', port=SERVER_PORT, poll_period=POLL_PERIOD):
+		self.mount = mount
+		self.host = host
+		self.port = port
+		self.poll_period = poll_period
+		self.nb_request = 0
+		self.nb_transaction = 0
+		self.nb_coalesced = 0
+		self._executor = ThreadPoolExecutor(max_workers=1) # one serial transaction at a time
+		self._inflight = {}
+		self._subscribers = set()
+		self._writers = set()
+		self._state = None
+		self._poll_task = None
+		self._wake = None
+		self._server = None
+		self._loop = None
+		self._thread = None
+
+	def __repr__(self):
+		return "MountServer %s:%u"%(self.host, self.port)
+
+	def _method(self, cmd):
+		if cmd == 'get_state':
+			return lambda: get_mount_state(self.mount)
+		return getattr(self.mount, cmd)
+
+	async def _serial(self, fct, *args):
+		"""Run one serial transaction in the worker thread"""
+		self.nb_transaction += 1
+		return await asyncio.get_running_loop().run_in_executor(self._executor, fct, *args)
+
+	async def _read(self, cmd, args):
+		"""Read request, coalesced with an identical one in progress"""
+		key = (cmd, json.dumps(args))
+		future = self._inflight.get(key)
+		if future is not None:
+			self.nb_coalesced += 1
+			return await asyncio.shield(future)
+		future = asyncio.ensure_future(self._serial(self._method(cmd), *args))
+		self._inflight[key] = future
+		future.add_done_callback(lambda _: self._inflight.pop(key, None))
+		return await asyncio.shield(future)
+
+	async def execute(self, cmd, args=()):
+		"""Execute a command of the mount"""
+		args = list(args)
+		if cmd in READ_COMMANDS:
+			return _to_json(await self._read(cmd, args))
+		if cmd in WRITE_COMMANDS:
+			result = await self._serial(self._method(cmd), *args)
+			if self._wake is not None:
+				self._wake.set() # push the new state now
+			return _to_json(result)
+		raise AstrocomError('Unknown command <%s>'%cmd)
+
+	async def _send(self, writer, message):
+		"""Send a message and wait until the client has room for it (False if disconnected)"""
+		try:
+			writer.write((json.dumps(message)+'\n').encode('utf8'))
+			await writer.drain() # a slow client holds its own sends, not the buffers
+		except ConnectionError:
+			self._subscribers.discard(writer)
+			return False
+		return True
+
+	async def _answer(self, writer, request):
+		"""Execute a request and send the answer"""
+		answer = {'id': request.get('id')}
+		try:
+			answer['result'] = await self.execute(request.get('cmd'), request.get('args', []))
+		except AstrocomError as e:
+			answer['error'] = str(e)
+		except (TypeError, ValueError, AttributeError) as e:
+			answer['error'] = 'INVALID_REQUEST %s'%e
+		except Exception as e: # e.g. SerialException: the client must not wait forever
+			logger.error('Request %r failed: %s %s'%(request, type(e).__name__, e))
+			answer['error'] = 'SERVER_ERROR %s %s'%(type(e).__name__, e)
+		await self._send(writer, answer)
+
+	async def _poll_state(self):
+		"""Push the mount state to subscribers when it changes"""
+		while len(self._subscribers) > 0:
+			try:
+				state = await self.execute('get_state')
+			except Exception: # reported to the clients by their own requests
+				state = None
+			if (state is not None) and (state != self._state):
+				self._state = state
+				message = {'event':'state', 'state':state}
+				await asyncio.gather(*[self._send(writer, message) for writer in list(self._subscribers)])
+			self._wake.clear()
+			try:
+				await asyncio.wait_for(self._wake.wait(), self.poll_period)
+			except asyncio.TimeoutError:
+				pass
+		self._poll_task = None
+
+	async def _handle_client(self, reader, writer):
+		"""Serve one client connection"""
+		tasks = set()
+		self._writers.add(writer)
+		try:
+			while True:
+				line = await reader.readline()
+				if len(line) == 0:
+					break
+				self.nb_request += 1
+				try:
+					request = json.loads(line)
+				except ValueError:
+					await self._send(writer, {'id':None, 'error':'INVALID_JSON'})
+					continue
+				if request.get('cmd') == 'subscribe':
+					self._subscribers.add(writer)
+					self._state = None # send the current state to the new subscriber
+					if self._poll_task is None:
+						self._poll_task = asyncio.ensure_future(self._poll_state())
+					self._wake.set()
+					await self._send(writer, {'id':request.get('id'), 'result':True})
+					continue
+				if request.get('cmd') == 'unsubscribe':
+					self._subscribers.discard(writer)
+					await self._send(writer, {'id':request.get('id'), 'result':True})
+					continue
+				task = asyncio.ensure_future(self._answer(writer, request))
+				tasks.add(task)
+				task.add_done_callback(tasks.discard)
+		except ConnectionError:
+			pass
+		finally:
+			self._subscribers.discard(writer)
+			self._writers.discard(writer)
+			for task in tasks:
+				task.cancel()
+			writer.close()
+
+	async def start(self):
+		"""Start listening (in the running event loop)"""
+		self._wake = asyncio.Event()
+		self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+		self.port = self._server.sockets[0].getsockname()[1]
+		logger.info('Mount server listening on %s:%u'%(self.host, self.port))
+
+	def serve_forever(self):
+		"""Run the server in the current thread"""
+		async def main():
+			await self.start()
+			await self._server.serve_forever()
+		asyncio.run(main())
+
+	def start_in_thread(self):
+		"""Run the server in a background thread, return once it is listening"""
+		ready = threading.Event()
+		def run():
+			self._loop = asyncio.new_event_loop()
+			asyncio.set_event_loop(self._loop)
+			self._loop.run_until_complete(self.start())
+			ready.set()
+			self._loop.run_forever()
+			tasks = asyncio.all_tasks(self._loop)
+			for task in tasks:
+				task.cancel()
+			self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+			self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+			self._loop.close()
+		self._thread = threading.Thread(target=run, daemon=True)
+		self._thread.start()
+		ready.wait()
+		return self
+
+	def stop(self):
+		"""Stop a server started with start_in_thread"""
+		if self._loop is None:
+			return
+		async def shutdown():
+			self._server.close()
+			for writer in list(self._writers):
+				writer.close() # client handlers end on EOF
+			await asyncio.sleep(0.05)
+			self._loop.stop()
+		asyncio.run_coroutine_threadsafe(shutdown(), self._loop)
+		self._thread.join()
+		self._executor.shutdown()
+		self._loop = None
+
+
+class MountClient:
+	"""
+	Synchronous client of MountServer.
+	Mount commands are available as methods, e.g. client.get_position().
+	"""
+	def __init__(self, host='127.0.0.1', port=SERVER_PORT, timeout=5.0):
+		self._sock = socket.create_connection((host, port), timeout=timeout)
+		self._file = self._sock.makefile('rb')
+		self._id = 0
+		self.events = collections.deque(maxlen=1000)
+
+	def __getattr__(self, name):
+		if name in READ_COMMANDS + WRITE_COMMANDS:
+			return lambda *args: self.call(name, *args)
+		raise AttributeError(name)
+
+	def _receive(self):
+		line = self._file.readline()
+		if len(line) == 0:
+			raise AstrocomError('Connection closed by the mount server')
+		return json.loads(line)
+
+	def call(self, cmd, *args):
+		"""Send a command and wait for its answer (events received meanwhile are queued)"""
+		self._id += 1
+		self._sock.sendall((json.dumps({'id':self._id, 'cmd':cmd, 'args':list(args)})+'\n').encode('utf8'))
+		while True:
+			message = self._receive()
+			if 'event' in message:
+				self.events.append(message)
+			elif message.get('id') == self._id:
+				break
+		if 'error' in message:
+			raise AstrocomError(message['error'])
+		return message['result']
+
+	def subscribe(self):
+		"""Receive state events"""
+		return self.call('subscribe')
+
+	def next_event(self):
+		"""Get the next state event (blocking)"""
+		if len(self.events) > 0:
+			return self.events.popleft()
+		while True:
+			message = self._receive()
+			if 'event' in message:
+				return message
+
+	def close(self):
+		self._file.close()
+		self._sock.close()
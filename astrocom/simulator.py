@@ -0,0 +1,334 @@
+"""
+Simulated Sky-Watcher mount, used as a transport of MountSW.
+
+The simulator answers the `:<cmd><axis>...\r` protocol and moves its axes with
+time (tracking at the step period rate, goto at the fast goto rate).
+SimulatedUdpMount serves the simulator over UDP like a SynScan Wi-Fi adapter.
+NoisyTransport degrades a link (lost, late and corrupted answers) like a poor USB adapter.
+The default CPR equals the turn scale of MountSW positions, so that the
+turn ratios read by MountSW are actual turns of the simulated axes.
+"""
+
+import time
+import random
+import socket
+import threading
+from astrocom.astro import SIDERAL_DAY_SEC
+from astrocom.serialport import SW_POS_OFFSET, GOTO_SIDERAL_MULTIPLIER, int_to_hexa_cmd, hexa_response_to_int
+
+SIM_CPR = 0x800000
+SIM_TIF = 64935
+SIM_HIGH_SPEED_RATIO = 16
+SIM_VERSION = 0x0304A3
+
+
+class _SimAxis:
+	"""State of one simulated axis"""
+	def __init__(self, cpr, tif, high_speed_ratio):
+		self.cpr = cpr
+		self.tif = tif
+		self.high_speed_ratio = high_speed_ratio
+		self.position = 0.0 # counts from the offset
+		self.target = 0.0
+		self.step_period = int(round(SIDERAL_DAY_SEC*tif/cpr))
+		self.running = False
+		self.track = True
+		self.fast = False
+		self.backward = False
+		self.init = False
+		self.autoguide = 0
+
+	def rate(self):
+		"""Current speed [count/second], signed"""
+		if self.track:
+			rate = self.tif/max(self.step_period, 1)
+			if self.fast:
+				rate *= self.high_speed_ratio
+		else:
+			rate = self.cpr*GOTO_SIDERAL_MULTIPLIER/SIDERAL_DAY_SEC
+		return -rate if self.backward else rate
+
+	def update(self, dt):
+		"""Move the axis during dt seconds"""
+		if not self.running:
+			return
+		if self.track:
+			self.position += self.rate()*dt
+			return
+		distance = self.target - self.position
+		step = abs(self.rate())*dt
+		if abs(distance) <= step:
+			self.position = self.target
+			self.running = False
+		else:
+			self.position += step if distance > 0 else -step
+
+	def status(self):
+		"""Status string as 3 hexadecimal digits"""
+		d1 = (1 if self.track else 0) + (2 if self.backward else 0) + (4 if self.fast else 0)
+		d2 = 1 if self.running else 0
+		d3 = 1 if self.init else 0
+		return '%X%X%X'%(d1, d2, d3)
+
+
+class SimulatedTransport:
+	"""
+	Fake port answering like a Sky-Watcher motor board.
+	baudrate : emulate the transmission time on the wire (None for no delay)
+	speed    : time acceleration of the simulated motion
+	"""
+	def __init__(self, cpr=SIM_CPR, tif=SIM_TIF, high_speed_ratio=SIM_HIGH_SPEED_RATIO, baudrate=None, latency=0.0, speed=1.0, timeout=0.5):
+		self.axes = {1:_SimAxis(cpr, tif, high_speed_ratio), 2:_SimAxis(cpr, tif, high_speed_ratio)}
+		self.baudrate = baudrate
+		self.latency = latency
+		self.speed = speed
+		self.timeout = timeout
+		self.nb_command = 0
+		self._buffer = bytearray()
+		self._ready = 0.0
+		self._last = time.monotonic()
+
+	def _update(self):
+		"""Move the axes up to now"""
+		now = time.monotonic()
+		dt = (now - self._last)*self.speed
+		self._last = now
+		for axis in self.axes.values():
+			axis.update(dt)
+
+	def _wire_time(self, nb_byte):
+		if self.baudrate is None:
+			return 0.0
+		return 10*nb_byte/self.baudrate # 8 bits + start + stop
+
+	def _answer(self, cmd, axis, data):
+		"""Answer to one command on one axis (without leading '=' or '!')"""
+		ax = self.axes[axis]
+		if cmd == 'a':
+			return int_to_hexa_cmd(ax.cpr)
+		if cmd == 'b':
+			return int_to_hexa_cmd(ax.tif)
+		if cmd == 'e':
+			return int_to_hexa_cmd(SIM_VERSION)
+		if cmd == 'g':
+			return '%02X'%ax.high_speed_ratio
+		if cmd == 'f':
+			return ax.status()
+		if cmd in ['j', 'd']:
+			return int_to_hexa_cmd(int(round(ax.position)) + SW_POS_OFFSET)
+		if cmd == 'h':
+			return int_to_hexa_cmd(int(round(ax.target)) + SW_POS_OFFSET)
+		if cmd == 'i':
+			return int_to_hexa_cmd(ax.step_period)
+		if cmd == 'F':
+			ax.init = True
+			return ''
+		if cmd == 'E':
+			ax.position = hexa_response_to_int(data) - SW_POS_OFFSET
+			return ''
+		if cmd == 'S':
+			ax.target = hexa_response_to_int(data) - SW_POS_OFFSET
+			return ''
+		if cmd == 'I':
+			ax.step_period = hexa_response_to_int(data)
+			return ''
+		if cmd == 'G':
+			if ax.running:
+				return None, '2' # MOTOR_RUNNING
+			mode, direction = int(data[0], 16), int(data[1], 16)
+			ax.track = (mode & 1) == 1
+			ax.fast = ((mode & 2) != 0) == ax.track # in GOTO mode, FAST and SLOW are inverted
+			ax.backward = (direction & 1) == 1
+			return ''
+		if cmd == 'J':
+			if not ax.init:
+				return None, '4' # NOT_INITIALIZED
+			if not ax.track:
+				ax.backward = ax.target < ax.position
+			ax.running = True
+			return ''
+		if cmd in ['K', 'L']:
+			ax.running = False
+			return ''
+		if cmd == 'P':
+			ax.autoguide = int(data)
+			return ''
+		if cmd == 'V':
+			return ''
+		return None, '0' # UNKNOWN_COMMAND
+
+	def write(self, data):
+		"""Receive a command frame and prepare the answer"""
+		self._update()
+		self.nb_command += 1
+		frame = bytes(data).decode('utf8')
+		if (len(frame) < 3) or (frame[0] != ':') or (frame[-1] != '\r') or (frame[2] not in '123'):
+			answer = '!3'
+		else:
+			cmd, axis, payload = frame[1], int(frame[2]), frame[3:-1]
+			try:
+				if axis == 3: # both axes, answer of the first one
+					ans = self._answer(cmd, 1, payload)
+					self._answer(cmd, 2, payload)
+				else:
+					ans = self._answer(cmd, axis, payload)
+			except (ValueError, IndexError):
+				ans = (None, '1') # INVALID_COMMAND_LENGTH
+			answer = ('!'+ans[1]) if isinstance(ans, tuple) else ('='+ans)
+		answer = bytes(answer+'\r', 'utf8')
+		self._buffer = bytearray(answer)
+		self._ready = time.monotonic() + self.latency + self._wire_time(len(data) + len(answer))
+		return len(data)
+
+	def read(self, size=1):
+		"""Read bytes of the answer once it is available"""
+		if len(self._buffer) == 0:
+			return b''
+		wait = self._ready - time.monotonic()
+		if wait > 0:
+			time.sleep(wait)
+		ans = bytes(self._buffer[:size])
+		del self._buffer[:size]
+		return ans
+
+	def reset_input_buffer(self):
+		self._buffer = bytearray()
+
+	def reset_output_buffer(self):
+		pass
+
+	def close(self):
+		pass
+
+
+class NoisyTransport:
+	"""
+	Wrap a transport and degrade its answers with given probabilities.
+	lost    : the answer never arrives
+	late    : the answer arrives `delay` seconds later, possibly during the next command
+	corrupt : one byte of the answer is changed
+	Reads block up to `timeout` like a serial port.
+	"""
+	def __init__(self, transport, lost=0.0, late=0.0, corrupt=0.0, delay=0.01, timeout=0.5, seed=0):
+		self.transport = transport
+		self.lost = lost
+		self.late = late
+		self.corrupt = corrupt
+		self.delay = delay
+		self.timeout = timeout
+		self.nb_degraded = 0
+		self._rng = random.Random(seed)
+		self._pending = [] # [arrival time, bytes]
+
+	def write(self, data):
+		"""Forward a command and schedule its answer"""
+		self.transport.write(data)
+		answer = bytearray()
+		while (len(answer) == 0) or (answer[-1] != 13):
+			byte = self.transport.read()
+			if len(byte) == 0:
+				break
+			answer += byte
+		arrival = time.monotonic()
+		draw = self._rng.random()
+		if draw < self.lost:
+			answer = bytearray()
+		elif draw < self.lost + self.late:
+			arrival += self.delay
+		elif (draw < self.lost + self.late + self.corrupt) and (len(answer) > 1):
+			answer[self._rng.randrange(len(answer)-1)] = ord('#')
+		else:
+			draw = None
+		self.nb_degraded += draw is not None
+		if len(answer) > 0:
+			self._pending.append([arrival, answer])
+		return len(data)
+
+	def read(self, size=1):
+		"""Read the bytes arrived so far, waiting up to the timeout for the next ones"""
+		deadline = time.monotonic() + self.timeout
+		while True:
+			now = time.monotonic()
+			ready = [p for p in self._pending if p[0] <= now]
+			if len(ready) > 0:
+				item = ready[0]
+				ans = bytes(item[1][:size])
+				del item[1][:size]
+				if len(item[1]) == 0:
+					self._pending.remove(item)
+				return ans
+			arrivals = [p[0] for p in self._pending if p[0] <= deadline]
+			if len(arrivals) == 0:
+				time.sleep(max(deadline - now, 0))
+				return b''
+			time.sleep(max(min(arrivals) - now, 0))
+
+	def reset_input_buffer(self):
+		now = time.monotonic()
+		self._pending = [p for p in self._pending if p[0] > now]
+
+	def reset_output_buffer(self):
+		pass
+
+	def close(self):
+		self.transport.close()
+
+
+class SimulatedUdpMount:
+	"""
+	Local UDP stand-in of a SynScan Wi-Fi mount, answering with a SimulatedTransport.
+	drop      : number of next answers to lose (to test retransmission)
+	duplicate : send every answer twice (to test stale datagrams)
+	"""
+	def __init__(self, transport=None, host='127.0.0.1', port=0, drop=0, duplicate=False):
+		if transport is None:
+			transport = SimulatedTransport(timeout=0.0)
+		self.transport = transport
+		self.drop = drop
+		self.duplicate = duplicate
+		self.nb_datagram = 0
+		self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self._sock.bind((host, port))
+		self._sock.settimeout(0.05)
+		self.address = self._sock.getsockname()
+		self._running = False
+		self._thread = None
+
+	def __repr__(self):
+		return "SimulatedUdpMount %s:%u"%self.address
+
+	@property
+	def url(self):
+		"""Port name to give to MountSW"""
+		return 'udp://%s:%u'%self.address
+
+	def _serve(self):
+		while self._running:
+			try:
+				datagram, client = self._sock.recvfrom(1024)
+			except socket.timeout:
+				continue
+			except OSError:
+				break
+			self.nb_datagram += 1
+			self.transport.write(datagram)
+			answer = bytearray()
+			while len(answer) == 0 or answer[-1] != 13:
+				answer += self.transport.read(64)
+			if self.drop > 0:
+				self.drop -= 1
+				continue
+			for _ in range(2 if self.duplicate else 1):
+				self._sock.sendto(bytes(answer), client)
+
+	def start(self):
+		"""Answer datagrams in a background thread"""
+		self._running = True
+		self._thread = threading.Thread(target=self._serve, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._running = False
+		self._thread.join()
+		self._sock.close()
@@ -0,0 +1,121 @@
+"""
+Sky chart of the visible catalog, rendered as one image for the GUI.
+
+All the stars are converted to ALT-AZ at once with array operations and
+rasterised in bulk into an RGB array, displayed as a single Tk PhotoImage
+instead of one canvas item per star. Stars move slowly on the chart: the
+image is redrawn every CHART_PERIOD seconds, while the pointing and goto
+markers are separate canvas items moved every second.
+"""
+
+import numpy as np
+from astrocom.catalog import catalog_arrays
+from astrocom.stats import timed
+
+CHART_SIZE = 400 # pixel
+CHART_PERIOD = 60 # second between two redraws of the stars
+CHART_VMAG = 6.5 # faintest magnitude drawn
+CHART_MARGIN = 12 # pixel between the horizon and the border (cardinal points)
+PROJECTIONS = ['stereographic', 'altaz']
+
+SKY_COLOR = (8, 12, 40)
+GROUND_COLOR = (25, 25, 25)
+GRID_COLOR = (45, 55, 95)
+STAR_COLOR = (255, 250, 235)
+
+
+def project(alt_deg, az_deg, size=CHART_SIZE, projection='stereographic'):
+	"""
+	Pixel coordinates (x, y) of ALT-AZ directions (arrays accepted).
+	Zenith at the center and horizon on a circle, North up and East left (looking up).
+	'stereographic' keeps the shapes of the constellations, 'altaz' is linear in altitude.
+	"""
+	zenith = np.radians(90 - np.asarray(alt_deg, dtype=float))
+	az = np.radians(np.asarray(az_deg, dtype=float))
+	if projection == 'stereographic':
+		r = np.tan(zenith/2) # 1 on the horizon
+	elif projection == 'altaz':
+		r = zenith/(np.pi/2)
+	else:
+		raise ValueError('Unknown projection <%s>'%projection)
+	radius = size/2 - CHART_MARGIN
+	return size/2 - radius*r*np.sin(az), size/2 - radius*r*np.cos(az)
+
+
+def _disc_stamps(max_radius):
+	"""Pixel offsets and weights of anti-aliased discs, for each integer radius"""
+	stamps = []
+	for radius in range(max_radius+1):
+		dy, dx = np.mgrid[-radius-1:radius+2, -radius-1:radius+2]
+		weight = np.clip(radius + 1 - np.hypot(dx, dy), 0, 1) # 1 inside, fading on the edge
+		keep = weight > 0
+		stamps.append((dx[keep], dy[keep], weight[keep]))
+	return stamps
+
+
+def to_ppm(image):
+	"""Binary PPM data of an RGB image, readable by tk.PhotoImage(data=..., format='PPM')"""
+	return b'P6 %u %u 255\n'%(image.shape[1], image.shape[0]) + np.ascontiguousarray(image, dtype=np.uint8).tobytes()
+
+
+class SkyChart:
+	"""
+	Render the stars of a catalog (list of Star or CatalogStore) above the horizon.
+	The catalog columns are extracted once; each render is a few array operations.
+	"""
+	def __init__(self, catalog, size=CHART_SIZE, projection='stereographic', vmag_max=CHART_VMAG, max_radius=3):
+		if projection not in PROJECTIONS:
+			raise ValueError('Unknown projection <%s>'%projection)
+		ra, dec, vmag = catalog_arrays(catalog)
+		keep = vmag <= vmag_max
+		self.ra = ra[keep]
+		self.dec = dec[keep]
+		self.vmag = vmag[keep]
+		self.size = size
+		self.projection = projection
+		# bright stars are bigger discs, faint ones dimmer points
+		bright = np.clip((vmag_max - self.vmag)/max(vmag_max - np.min(self.vmag, initial=0), 1e-6), 0, 1)
+		self._radius = np.round(max_radius*bright**2).astype(int)
+		self._intensity = 0.35 + 0.65*np.sqrt(bright)
+		self._stamps = _disc_stamps(max_radius)
+		self._background = self._draw_background()
+
+	def __repr__(self):
+		return "SkyChart %u stars %ux%u %s"%(len(self.ra), self.size, self.size, self.projection)
+
+	def _draw_background(self):
+		"""Sky disc, ground and altitude circles every 30 degrees"""
+		y, x = np.mgrid[0:self.size, 0:self.size] + 0.5
+		r = np.hypot(x - self.size/2, y - self.size/2)
+		image = np.empty((self.size, self.size, 3), dtype=np.uint8)
+		image[:] = GROUND_COLOR
+		image[r <= self.size/2 - CHART_MARGIN] = SKY_COLOR
+		for alt in [0, 30, 60]:
+			xa, ya = project(alt, 0, self.size, self.projection)
+			image[np.abs(r - np.hypot(xa - self.size/2, ya - self.size/2)) < 0.6] = GRID_COLOR
+		return image
+
+	def pixel(self, alt_deg, az_deg):
+		"""Pixel coordinates of ALT-AZ directions on the chart"""
+		return project(alt_deg, az_deg, self.size, self.projection)
+
+	@timed('skychart.render')
+	def render(self, epoch):
+		"""RGB image (size, size, 3) of the stars above the horizon at an Epoch"""
+		alt, az = epoch.radec_to_altaz(self.ra, self.dec)
+		visible = np.flatnonzero(np.asarray(alt) > 0)
+		x, y = self.pixel(np.asarray(alt)[visible], np.asarray(az)[visible])
+		level = np.zeros(self.size*self.size)
+		radius_visible = self._radius[visible]
+		for radius, (dx, dy, weight) in enumerate(self._stamps): # one batch per disc size
+			sel = radius_visible == radius
+			if not np.any(sel):
+				continue
+			px = np.round(x[sel]).astype(int)[:,np.newaxis] + dx[np.newaxis,:]
+			py = np.round(y[sel]).astype(int)[:,np.newaxis] + dy[np.newaxis,:]
+			value = self._intensity[visible[sel]][:,np.newaxis]*weight[np.newaxis,:]
+			inside = (px >= 0) & (px < self.size) & (py >= 0) & (py < self.size)
+			np.maximum.at(level, (py*self.size + px)[inside], value[inside])
+		level = level.reshape(self.size, self.size, 1)
+		image = self._background*(1 - level) + np.array(STAR_COLOR)*level
+		return image.astype(np.uint8)
@@ -0,0 +1,132 @@
+"""
+Lightweight instrumentation: latency histograms and event counters.
+
+Recording a value is a few additions and a bisection in a short list,
+so it can stay enabled during normal use. A lock makes the records safe
+from the threads of the server, telemetry, guiding and logging.
+"""
+
+import time
+import bisect
+import threading
+import functools
+
+# Upper edges of the latency buckets [second], log-spaced from 10us to ~5s
+LATENCY_BUCKETS = [1e-5*2**i for i in range(20)]
+
+
+class Histogram:
+	"""Latency histogram with fixed log-spaced buckets"""
+	def __init__(self):
+		self.counts = [0]*(len(LATENCY_BUCKETS)+1)
+		self.count = 0
+		self.total = 0.0
+		self.min = float('inf')
+		self.max = 0.0
+
+	def add(self, value):
+		"""Add a latency value [second]"""
+		self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+		self.count += 1
+		self.total += value
+		if value < self.min:
+			self.min = value
+		if value > self.max:
+			self.max = value
+
+	@property
+	def mean(self):
+		if self.count == 0:
+			return 0.0
+		return self.total / self.count
+
+	def percentile(self, q):
+		"""Get the upper edge of the bucket containing the q-th percentile [second]"""
+		if self.count == 0:
+			return 0.0
+		target = q/100*self.count
+		cumul = 0
+		for i in range(len(self.counts)):
+			cumul += self.counts[i]
+			if cumul >= target:
+				break
+		if i < len(LATENCY_BUCKETS):
+			return min(LATENCY_BUCKETS[i], self.max)
+		return self.max
+
+	def as_dict(self):
+		"""Summary of the histogram"""
+		return {'count':self.count, 'mean':self.mean, 'min':self.min if self.count else 0.0,
+				'max':self.max, 'p50':self.percentile(50), 'p95':self.percentile(95),
+				'p99':self.percentile(99)}
+
+
+class Stats:
+	"""Collection of named latency histograms and counters"""
+	def __init__(self):
+		self.enabled = True
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		"""Clear all histograms and counters"""
+		with self._lock:
+			self.latency = {}
+			self.counters = {}
+
+	def add_latency(self, name, seconds):
+		"""Record a latency value [second] under a name"""
+		if not self.enabled:
+			return
+		with self._lock:
+			hist = self.latency.get(name)
+			if hist is None:
+				hist = self.latency[name] = Histogram()
+			hist.add(seconds)
+
+	def increment(self, name, value=1):
+		"""Increment a counter"""
+		if not self.enabled:
+			return
+		with self._lock:
+			self.counters[name] = self.counters.get(name, 0) + value
+
+	def timed(self, name):
+		"""Decorator recording the execution time of a function"""
+		def decorator(fct):
+			@functools.wraps(fct)
+			def wrapper(*args, **kwargs):
+				if not self.enabled:
+					return fct(*args, **kwargs)
+				t0 = time.perf_counter()
+				try:
+					return fct(*args, **kwargs)
+				finally:
+					self.add_latency(name, time.perf_counter()-t0)
+			return wrapper
+		return decorator
+
+	def snapshot(self):
+		"""Get a dictionary copy of all statistics"""
+		with self._lock:
+			return {'latency':{k:h.as_dict() for k,h in self.latency.items()},
+					'counters':dict(self.counters)}
+
+	def report(self):
+		"""Get statistics as a string to print"""
+		snap = self.snapshot()
+		lines = ['%-32s %7s %9s %9s %9s %9s'%('NAME','COUNT','MEAN[ms]','P50[ms]','P95[ms]','MAX[ms]')]
+		for name in sorted(snap['latency'].keys()):
+			h = snap['latency'][name]
+			lines += ['%-32s %7u %9.3f %9.3f %9.3f %9.3f'%(name, h['count'], 1e3*h['mean'],
+						1e3*h['p50'], 1e3*h['p95'], 1e3*h['max'])]
+		if len(snap['counters']) > 0:
+			lines += ['']
+			lines += ['%-32s %7s'%('COUNTER','VALUE')]
+			for name in sorted(snap['counters'].keys()):
+				lines += ['%-32s %7u'%(name, snap['counters'][name])]
+		return '\n'.join(lines)
+
+
+STATS = Stats()
+timed = STATS.timed
@@ -0,0 +1,190 @@
+"""
+Stream mount telemetry to columnar files and load a whole night back.
+
+A telemetry directory holds chunks `chunk_00000/`, `chunk_00001/`... with one
+`.npy` file per column. A chunk is written when it reaches `chunk_bytes`,
+then the next one starts (size-based rotation). The loader merges the chunks
+once into one file per column and memory-maps them.
+"""
+
+import os
+import json
+import queue
+import threading
+import numpy as np
+from astrocom import logger, AstrocomError
+from astrocom.stats import STATS
+from astrocom.clock import DEFAULT_CLOCK, resolve_utc
+
+TELEMETRY_COLUMNS = [
+	('time', 'M8[us]'), # UTC
+	('ra_position', 'f8'), # fraction of turn
+	('dec_position', 'f8'),
+	('ra_goto', 'f8'),
+	('dec_goto', 'f8'),
+	('ra_step_period', 'i8'),
+	('dec_step_period', 'i8'),
+	('ra_status', 'u1'), # see STATUS_FLAGS
+	('dec_status', 'u1'),
+	('ra_deg', 'f8'), # derived sky coordinates (NaN without MountPosition)
+	('dec_deg', 'f8')]
+
+STATUS_FLAGS = {'STOP':1, 'TRACK':2, 'BACKWARD':4, 'FAST':8, 'INIT':16}
+
+CHUNK_BYTES = 1<<20
+TELEMETRY_QUEUE_SIZE = 10000 # samples
+CHUNK_PREFIX = 'chunk_'
+MERGED_DIR = 'merged'
+
+
+def status_to_flags(dic):
+	"""Encode an axis status dictionary as bit flags"""
+	return sum(bit for name,bit in STATUS_FLAGS.items() if dic[name])
+
+
+def flags_to_status(flags, name):
+	"""Decode one status flag from an array of bit flags"""
+	return (np.asarray(flags) & STATUS_FLAGS[name]) != 0
+
+
+def read_telemetry_sample(mount, clock=DEFAULT_CLOCK):
+	"""Read one telemetry sample from a MountSW as a dictionary"""
+	sample = {'time': np.datetime64(resolve_utc(clock), 'us')}
+	sample['ra_position'], sample['dec_position'] = mount.get_position()
+	sample['ra_goto'], sample['dec_goto'] = mount.get_goto()
+	for axis, prefix in [(1,'ra_'), (2,'dec_')]:
+		sample[prefix+'step_period'] = mount.get_step_period(axis)
+		sample[prefix+'status'] = status_to_flags(mount.get_axis_status_as_dict(axis))
+	return sample
+
+
+def list_chunks(directory):
+	"""Sorted names of the complete chunks of a telemetry directory"""
+	if not os.path.isdir(directory):
+		return []
+	return sorted(n for n in os.listdir(directory) if n.startswith(CHUNK_PREFIX) and not n.endswith('.tmp'))
+
+
+class TelemetryWriter:
+	"""
+	Append telemetry samples to a directory from a background thread.
+	Samples wait in a bounded queue: when it is full they are dropped and counted.
+	The derived RA-DEC is computed in the background thread if a MountPosition is given.
+	Samples that cannot be stored (bad value, astro error) are logged and counted as rejected.
+	"""
+	def __init__(self, directory, mount_position=None, chunk_bytes=CHUNK_BYTES, queue_size=TELEMETRY_QUEUE_SIZE):
+		self.directory = directory
+		self.mount_position = mount_position
+		self.dtype = np.dtype(TELEMETRY_COLUMNS)
+		self.chunk_rows = max(1, chunk_bytes//self.dtype.itemsize)
+		self.dropped = 0
+		self.rejected = 0
+		self.nb_sample = 0
+		os.makedirs(directory, exist_ok=True)
+		chunks = list_chunks(directory)
+		self._index = int(chunks[-1][len(CHUNK_PREFIX):])+1 if len(chunks) else 0 # append to existing chunks
+		self._buffer = np.zeros(self.chunk_rows, dtype=self.dtype)
+		self._nb_row = 0
+		self._queue = queue.Queue(maxsize=queue_size)
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def __repr__(self):
+		return "TelemetryWriter %s"%self.directory
+
+	def add(self, sample):
+		"""Queue a sample dictionary (missing columns are left to zero)"""
+		try:
+			self._queue.put_nowait(sample)
+		except queue.Full:
+			self.dropped += 1
+			STATS.increment('telemetry.dropped')
+
+	def sample(self, mount, clock=DEFAULT_CLOCK):
+		"""Read the mount and queue the sample"""
+		self.add(read_telemetry_sample(mount, clock=clock))
+
+	def _derive(self, sample):
+		"""Add the RA-DEC pointed by the telescope"""
+		if self.mount_position is None:
+			return np.nan, np.nan
+		epoch = self.mount_position.snapshot(np.datetime64(sample['time'], 'us').astype(object))
+		radec = self.mount_position.telescope_to_radec((sample['ra_position'], sample['dec_position']), epoch=epoch)
+		return radec.ra_degree, radec.dec_degree
+
+	def _write_chunk(self):
+		"""Write the buffered rows as a new chunk (one file per column)"""
+		if self._nb_row == 0:
+			return
+		name = os.path.join(self.directory, '%s%05u'%(CHUNK_PREFIX, self._index))
+		os.makedirs(name+'.tmp', exist_ok=True)
+		for column in self.dtype.names:
+			np.save(os.path.join(name+'.tmp', column+'.npy'), self._buffer[column][:self._nb_row])
+		os.replace(name+'.tmp', name) # readers never see partial chunks
+		self._index += 1
+		self._nb_row = 0
+
+	def _run(self):
+		"""Background writer"""
+		while True:
+			sample = self._queue.get()
+			if sample is None:
+				break
+			try:
+				row = np.zeros(1, dtype=self.dtype)[0]
+				for column, value in sample.items():
+					row[column] = value
+				if 'ra_deg' not in sample:
+					row['ra_deg'], row['dec_deg'] = self._derive(sample)
+			except Exception as e: # the thread must survive a bad sample
+				self.rejected += 1
+				STATS.increment('telemetry.rejected')
+				logger.error('Telemetry sample rejected: %s %s'%(type(e).__name__, e))
+				continue
+			self._buffer[self._nb_row] = row
+			self._nb_row += 1
+			self.nb_sample += 1
+			if self._nb_row == self.chunk_rows:
+				self._write_chunk()
+		self._write_chunk()
+
+	def close(self):
+		"""Write the pending samples and stop the thread"""
+		if self._thread.is_alive():
+			self._queue.put(None)
+			self._thread.join()
+		if self.dropped > 0:
+			logger.warning('Telemetry writer dropped %u samples'%self.dropped)
+		if self.rejected > 0:
+			logger.warning('Telemetry writer rejected %u samples'%self.rejected)
+
+
+def load_telemetry(directory):
+	"""
+	Load the telemetry of a directory as a dictionary of memory-mapped columns.
+	Chunks are merged into one file per column, once, chunk by chunk.
+	"""
+	chunks = list_chunks(directory)
+	if len(chunks) == 0:
+		raise AstrocomError('No telemetry found in <%s>'%directory)
+	merged = os.path.join(directory, MERGED_DIR)
+	index_file = os.path.join(merged, 'chunks.json')
+	try:
+		with open(index_file, 'r') as myfile:
+			up_to_date = json.load(myfile) == chunks
+	except (OSError, ValueError):
+		up_to_date = False
+	if not up_to_date:
+		os.makedirs(merged, exist_ok=True)
+		columns = [[np.load(os.path.join(directory, c, name+'.npy'), mmap_mode='r') for c in chunks] for name,_ in TELEMETRY_COLUMNS]
+		for (name, dtype), parts in zip(TELEMETRY_COLUMNS, columns):
+			out = np.lib.format.open_memmap(os.path.join(merged, name+'.npy'), mode='w+', dtype=dtype, shape=(sum(len(p) for p in parts),))
+			start = 0
+			for part in parts:
+				out[start:start+len(part)] = part
+				start += len(part)
+			out.flush()
+			del out
+		with open(index_file, 'w') as myfile:
+			json.dump(chunks, myfile)
+	return {name:np.load(os.path.join(merged, name+'.npy'), mmap_mode='r') for name,_ in TELEMETRY_COLUMNS}
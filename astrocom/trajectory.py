@@ -0,0 +1,285 @@
+"""
+Trajectory tracking of fast non-sideral targets (satellites, ...).
+
+A trajectory is a time-sampled path of the two telescope axes, for example
+RA-DEC or ALT-AZ positions from a local TLE propagator. It is cut into
+constant-rate segments between samples, converted at once with array
+operations into step periods, directions and speed modes, then streamed to
+the mount on an absolute schedule of the monotonic clock: the update of
+segment i is due at start + t[i], so late updates never accumulate drift.
+Updates are sent ahead of time by the mean latency of the previous ones, so
+the new rates apply on schedule even on a slow serial link. Position reads
+after each update close the loop: the measured error is corrected on the
+next segment.
+
+Each axis keeps one speed mode (SLOW or FAST) for the whole trajectory,
+since changing it needs a stop. Only the commands that change are sent:
+a new step period, or stop / motion mode / start on a direction change.
+"""
+
+import time
+import numpy as np
+from astrocom import logger, AstrocomError, AstrocomSuccess
+from astrocom.astro import sideral_time
+from astrocom.stats import STATS, Histogram
+
+TRAJECTORY_PERIOD = 0.2 # second between two rate updates
+FAST_STEP_MIN = 64 # slow step period below which an axis runs in FAST mode (rate quantization < 1.6%)
+STEP_PERIOD_MAX = 0xFFFFFF
+CORRECTION_GAIN = 0.5 # fraction of the position error corrected on the next segment
+LATENCY_SMOOTHING = 0.2 # weight of the last update in the mean command latency
+TURN_TO_ARCSEC = 360*3600
+
+
+def altaz_to_hadec(alt_deg, az_deg, latitude_deg):
+	"""Convert ALT-AZ to hour angle and declination [degree] (arrays accepted)"""
+	alt, az, lat = np.radians(alt_deg), np.radians(az_deg), np.radians(latitude_deg)
+	dec = np.arcsin(np.clip(np.sin(lat)*np.sin(alt) + np.cos(lat)*np.cos(alt)*np.cos(az), -1, 1))
+	ha = np.arctan2(-np.sin(az)*np.cos(alt), np.cos(lat)*np.sin(alt) - np.sin(lat)*np.cos(alt)*np.cos(az))
+	return np.degrees(ha), np.degrees(dec)
+
+
+def hadec_to_telescope(ha_deg, dec_deg):
+	"""Telescope axes [turn] of hour angles and declinations, see MountPosition.radec_to_telescope"""
+	return (np.asarray(ha_deg) - 90)/360, (np.asarray(dec_deg) - 90)/360
+
+
+class Trajectory:
+	"""
+	Positions of the two axes [turn] at increasing times t [second].
+	start_utc is the UTC datetime of t=0 (None if the trajectory is relative).
+	"""
+	def __init__(self, t, position, start_utc=None):
+		self.t = np.asarray(t, dtype=float)
+		self.position = np.unwrap(np.asarray(position, dtype=float).reshape(-1, 2), period=1.0, axis=0)
+		self.start_utc = start_utc
+		if (len(self.t) < 2) or (len(self.t) != len(self.position)):
+			raise AstrocomError('Trajectory needs at least two samples of both axes')
+		if np.any(np.diff(self.t) <= 0):
+			raise AstrocomError('Trajectory times must be increasing')
+
+	def __repr__(self):
+		return "Trajectory %u samples over %.1fs"%(len(self.t), self.duration)
+
+	def __len__(self):
+		return len(self.t)
+
+	@property
+	def duration(self):
+		return self.t[-1] - self.t[0]
+
+	def position_at(self, t):
+		"""Interpolated positions of the two axes [turn] at times t"""
+		return np.stack([np.interp(t, self.t, self.position[:,k]) for k in range(2)], axis=-1)
+
+	def resample(self, period=TRAJECTORY_PERIOD):
+		"""Same path with one sample every period seconds (linear interpolation)"""
+		t = np.arange(self.t[0], self.t[-1], period)
+		t = np.append(t, self.t[-1]) if self.t[-1] - t[-1] > period/2 else np.append(t[:-1], self.t[-1])
+		return Trajectory(t, self.position_at(t), self.start_utc)
+
+	@classmethod
+	def from_radec(cls, utc, ra_deg, dec_deg, mount_position):
+		"""Trajectory of RA-DEC positions [degree] at a list of UTC datetimes"""
+		st = np.atleast_1d(sideral_time(mount_position.longitude_degree, utc=list(utc)).degree)
+		return cls(_seconds(utc), np.column_stack(hadec_to_telescope(st - np.asarray(ra_deg), dec_deg)), utc[0])
+
+	@classmethod
+	def from_altaz(cls, utc, alt_deg, az_deg, mount_position):
+		"""Trajectory of ALT-AZ positions [degree] at a list of UTC datetimes"""
+		ha, dec = altaz_to_hadec(alt_deg, az_deg, mount_position.latitude_degree)
+		return cls(_seconds(utc), np.column_stack(hadec_to_telescope(ha, dec)), utc[0])
+
+
+def _seconds(utc):
+	"""Seconds elapsed since the first of a list of UTC datetimes"""
+	return np.array([(u - utc[0]).total_seconds() for u in utc])
+
+
+def rate_to_command(rate, cpr, tif, high_speed_ratio, fast):
+	"""
+	Step period, direction and moving flag of rates [turn/second] (arrays accepted).
+	The step period is the number of timer ticks per count (times high_speed_ratio in FAST mode).
+	"""
+	counts = np.abs(np.asarray(rate, dtype=float))*cpr
+	ticks = tif*(high_speed_ratio if fast else 1)
+	with np.errstate(divide='ignore'):
+		step = np.where(counts > 0, np.round(ticks/np.maximum(counts, 1e-12)), STEP_PERIOD_MAX)
+	moving = step < STEP_PERIOD_MAX
+	step = np.clip(step, 1, STEP_PERIOD_MAX).astype(np.int64)
+	return step, np.asarray(rate) < 0, moving
+
+
+class RateSegments:
+	"""Constant-rate segments of a trajectory with the matching mount commands"""
+	def __init__(self, trajectory, static):
+		self.start = trajectory.t[:-1] - trajectory.t[0]
+		self.duration = np.diff(trajectory.t)
+		self.rate = np.diff(trajectory.position, axis=0)/self.duration[:,np.newaxis] # turn/second
+		self.static = static
+		self.fast = np.zeros(2, dtype=bool)
+		self.step = np.zeros(self.rate.shape, dtype=np.int64)
+		self.backward = np.zeros(self.rate.shape, dtype=bool)
+		self.moving = np.zeros(self.rate.shape, dtype=bool)
+		for k in range(2):
+			s = static[k]
+			slow_step_min = s['tif']/max(np.max(np.abs(self.rate[:,k]))*s['cpr'], 1e-12)
+			self.fast[k] = slow_step_min < FAST_STEP_MIN
+			self.step[:,k], self.backward[:,k], self.moving[:,k] = rate_to_command(self.rate[:,k], fast=self.fast[k], **s)
+
+	def __repr__(self):
+		return "RateSegments %u segments, FAST=%s"%(len(self), tuple(bool(f) for f in self.fast))
+
+	def __len__(self):
+		return len(self.start)
+
+	def command(self, k, rate):
+		"""Step period, direction and moving flag of one axis at a corrected rate"""
+		step, backward, moving = rate_to_command(rate, fast=self.fast[k], **self.static[k])
+		return int(step), bool(backward), bool(moving)
+
+
+class TrajectoryReport:
+	"""Timing and tracking error of an executed trajectory"""
+	def __init__(self):
+		self.jitter = Histogram() # second, update time minus scheduled time
+		self.latency = Histogram() # second, time to send the commands of an update
+		self.errors = [] # arcsec, (time, error axis 1, error axis 2) from position reads
+		self.nb_update = 0
+		self.nb_command = 0
+		self.nb_skipped = 0
+		self.duration = 0.0
+
+	def __repr__(self):
+		return "TrajectoryReport %u updates at %.1f Hz, jitter p99 %.1f ms, error rms %.0f\" max %.0f\""%(
+			self.nb_update, self.update_rate, 1e3*self.jitter.percentile(99), self.error_rms, self.error_max)
+
+	@property
+	def update_rate(self):
+		return self.nb_update/max(self.duration, 1e-9)
+
+	def _error(self):
+		if len(self.errors) == 0:
+			return np.zeros(1)
+		return np.hypot(*np.array(self.errors)[:,1:].T)
+
+	@property
+	def error_rms(self):
+		return float(np.sqrt(np.mean(self._error()**2)))
+
+	@property
+	def error_max(self):
+		return float(np.max(self._error()))
+
+	def as_dict(self):
+		return {'nb_update':self.nb_update, 'nb_command':self.nb_command, 'nb_skipped':self.nb_skipped,
+				'update_rate':self.update_rate, 'jitter':self.jitter.as_dict(), 'latency':self.latency.as_dict(),
+				'error_rms':self.error_rms, 'error_max':self.error_max}
+
+
+class TrajectoryExecutor:
+	"""
+	Drive a MountSW along a trajectory, resampled every period seconds.
+	The mount must be initialized and at the start of the trajectory (see goto_start).
+	The positions are read after each update to measure the error; with closed_loop
+	a fraction gain of the error is corrected on the next segment.
+	"""
+	def __init__(self, mount, trajectory, period=TRAJECTORY_PERIOD, gain=CORRECTION_GAIN, closed_loop=True):
+		self.mount = mount
+		self.trajectory = trajectory.resample(period) if period is not None else trajectory
+		self.gain = gain
+		self.closed_loop = closed_loop
+		self.segments = RateSegments(self.trajectory, [mount.get_static_parameters(axis) for axis in [1,2]])
+		self._state = {1:None, 2:None} # (step, backward, moving) sent to each axis
+
+	def __repr__(self):
+		return "TrajectoryExecutor %r %r"%(self.trajectory, self.segments)
+
+	def goto_start(self, lead=0.0, timeout=120):
+		"""Goto the position of the trajectory at t=lead and wait"""
+		self.mount.goto(*self.trajectory.position_at(self.trajectory.t[0] + lead))
+		self.mount.start(3)
+		self.mount.wait_until_stopped(timeout=timeout, poll=0.1)
+
+	def _send(self, axis, step, backward, moving):
+		"""Send the commands changing the state of an axis, return their number"""
+		state = self._state[axis]
+		if not moving:
+			if (state is None) or state[2]:
+				self.mount.stop_motion_now(axis)
+				self._state[axis] = (step, backward, False)
+				return 1
+			return 0
+		if (state is None) or (not state[2]) or (state[1] != backward):
+			# direction change: the motion mode can only be set when stopped
+			self.mount.stop_motion_now(axis)
+			direction = self.mount.BACKWARD if backward else self.mount.FORWARD
+			speed = self.mount.FAST if self.segments.fast[axis-1] else self.mount.SLOW
+			self.mount.set_motion_mode(axis, self.mount.TRACK, speed, direction)
+			self.mount.set_step_period(axis, step)
+			self.mount.start_motion(axis)
+			self._state[axis] = (step, backward, True)
+			return 4
+		if state[0] != step:
+			self.mount.set_step_period(axis, step)
+			self._state[axis] = (step, backward, True)
+			return 1
+		return 0
+
+	def run(self, clock=None, delay=0.0):
+		"""
+		Execute the trajectory, starting after delay seconds, or at its start_utc if a clock is given.
+		Return a TrajectoryReport. Both axes are stopped at the end.
+		"""
+		if (clock is not None) and (self.trajectory.start_utc is not None):
+			delay = (self.trajectory.start_utc - clock.utcnow()).total_seconds()
+		seg = self.segments
+		report = TrajectoryReport()
+		error = np.zeros(2) # turn, last measured position error
+		start = time.monotonic() + max(delay, 0.0)
+		self._state = {1:None, 2:None}
+		lead = 0.0 # second, mean latency of the updates, sent that much in advance
+		i = 0
+		try:
+			while i < len(seg):
+				due = start + seg.start[i] - lead
+				now = time.monotonic()
+				if now < due:
+					time.sleep(due - now)
+					now = time.monotonic()
+				# skip the segments already over: the schedule stays absolute
+				late = np.searchsorted(seg.start, now + lead - start, side='right') - 1
+				if late > i:
+					report.nb_skipped += late - i
+					i = late
+					due = start + seg.start[i] - lead
+				report.jitter.add(now - due)
+				STATS.add_latency('trajectory.jitter', now - due)
+				for k in range(2):
+					if self.closed_loop:
+						command = seg.command(k, seg.rate[i,k] + self.gain*error[k]/seg.duration[i])
+					else:
+						command = (int(seg.step[i,k]), bool(seg.backward[i,k]), bool(seg.moving[i,k]))
+					report.nb_command += self._send(k+1, *command)
+				latency = time.monotonic() - now
+				report.latency.add(latency)
+				lead += LATENCY_SMOOTHING*(min(latency, seg.duration[i]/2) - lead)
+				report.nb_update += 1
+				STATS.increment('trajectory.update')
+				t0 = time.monotonic()
+				read = np.array(self.mount.get_position())
+				t_read = (t0 + time.monotonic())/2 - start + self.trajectory.t[0]
+				error = (self.trajectory.position_at(t_read) - read + 0.5) % 1 - 0.5
+				report.errors.append((t_read, *(error*TURN_TO_ARCSEC)))
+				i += 1
+			end = start + seg.start[-1] + seg.duration[-1]
+			if time.monotonic() < end:
+				time.sleep(end - time.monotonic())
+		finally:
+			for axis in [1,2]:
+				self.mount.stop_motion_now(axis)
+		report.duration = time.monotonic() - start
+		if report.nb_skipped > 0:
+			logger.warning('%u trajectory segments skipped: updates slower than the period'%report.nb_skipped)
+		AstrocomSuccess('Trajectory done: %r'%report)
+		return report
@@ -0,0 +1,137 @@
+"""
+Transports carrying the Sky-Watcher `:<cmd><axis>...\r` protocol.
+
+A transport is any object with write(bytes), read(size=1), reset_input_buffer(),
+reset_output_buffer(), close() and a `timeout` attribute [second].
+MountSWserial only deals with the protocol and works with any transport:
+serial port, UDP (SynScan Wi-Fi), ReplayTransport or SimulatedTransport.
+"""
+
+import time
+import socket
+from serial import Serial, PARITY_NONE
+from astrocom import AstrocomError
+from astrocom.stats import STATS
+
+TIMEOUT = 0.5 # second
+UDP_PORT = 11880
+UDP_PREFIX = 'udp://'
+UDP_RETRANSMIT = 0.1 # second, resend the request if no answer
+UDP_MAX_DATAGRAM = 1024
+
+
+def open_serial(portname, baudrate=9600, timeout=TIMEOUT):
+	"""Open a serial port with the mount settings"""
+	ser = Serial(port=portname, baudrate=baudrate, parity=PARITY_NONE, stopbits=1, timeout=timeout)
+	if not ser.is_open:
+		ser.open()
+	return ser
+
+
+def open_transport(portname, baudrate=9600, timeout=TIMEOUT):
+	"""Open a serial port, or a UDP transport for names like 'udp://192.168.4.1[:11880]'"""
+	if not isinstance(portname, str):
+		raise AstrocomError('Invalid port name <%s>'%portname)
+	if portname.startswith(UDP_PREFIX):
+		address = portname[len(UDP_PREFIX):]
+		host, _, port = address.partition(':')
+		return UdpTransport(host, port=int(port) if port else UDP_PORT, timeout=timeout)
+	return open_serial(portname, baudrate=baudrate, timeout=timeout)
+
+
+class UdpTransport:
+	"""
+	Datagram transport of SynScan Wi-Fi mounts (one command or answer per datagram).
+	The request is sent again every `retransmit` seconds until an answer arrives
+	or the timeout expires, except the non-idempotent commands (start, init)
+	whose retry is left to MountSWserial.send_cmd that checks their effect first.
+	The protocol has no sequence number: the pending request is tagged with its
+	command letter, and answers of the wrong length for it (late answers of a
+	previous request) are dropped, as are datagrams received before the request,
+	from other hosts or not formatted as answers.
+	"""
+	def __init__(self, host, port=UDP_PORT, timeout=TIMEOUT, retransmit=UDP_RETRANSMIT):
+		self.address = (socket.gethostbyname(host), port)
+		self.timeout = timeout
+		self.retransmit = retransmit
+		self.nb_retransmit = 0
+		self.nb_stale = 0
+		self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self._sock.connect(self.address) # only receive datagrams from the mount
+		self._request = None
+		self._cmd_letter = None
+		self._buffer = bytearray()
+
+	def __repr__(self):
+		return "UdpTransport %s:%u"%self.address
+
+	def _drain(self):
+		"""Drop datagrams already received"""
+		self._sock.setblocking(False)
+		try:
+			while True:
+				self._sock.recv(UDP_MAX_DATAGRAM)
+				self.nb_stale += 1
+				STATS.increment('udp.stale')
+		except (BlockingIOError, ConnectionRefusedError):
+			pass
+		finally:
+			self._sock.setblocking(True)
+
+	def write(self, data):
+		"""Send a request datagram"""
+		self._drain()
+		self._buffer = bytearray()
+		self._request = bytes(data)
+		self._cmd_letter = self._request[1:2].decode('utf8', errors='replace')
+		self._sock.send(self._request)
+		return len(data)
+
+	def _receive(self):
+		"""Wait for the answer of the last request, retransmitting it if needed"""
+		from astrocom.serialport import is_valid_answer, NON_IDEMPOTENT
+		deadline = time.monotonic() + self.timeout
+		resend = time.monotonic() + self.retransmit
+		if self._cmd_letter in NON_IDEMPOTENT:
+			resend = float('inf')
+		while True:
+			now = time.monotonic()
+			if now >= deadline:
+				return
+			self._sock.settimeout(min(deadline, resend) - now)
+			try:
+				datagram = self._sock.recv(UDP_MAX_DATAGRAM)
+			except socket.timeout:
+				datagram = None
+			except ConnectionRefusedError: # ICMP port unreachable, keep trying until timeout
+				datagram = None
+			if datagram:
+				if is_valid_answer(datagram.decode('utf8', errors='replace'), self._cmd_letter):
+					self._buffer += datagram
+					return
+				self.nb_stale += 1
+				STATS.increment('udp.stale')
+			elif time.monotonic() >= resend:
+				self._sock.send(self._request)
+				self.nb_retransmit += 1
+				STATS.increment('udp.retransmit')
+				resend = time.monotonic() + self.retransmit
+
+	def read(self, size=1):
+		"""Read bytes of the answer (empty on timeout)"""
+		if (len(self._buffer) == 0) and (self._request is not None):
+			self._receive()
+			self._request = None # a single answer per request
+		ans = bytes(self._buffer[:size])
+		del self._buffer[:size]
+		return ans
+
+	def reset_input_buffer(self):
+		self._buffer = bytearray()
+		self._drain()
+
+	def reset_output_buffer(self):
+		pass
+
+	def close(self):
+		self._sock.close()
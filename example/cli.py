@@ -1,25 +1,43 @@
 """
-Basic script to list ports and open command line interface
+Basic script to find the mount and open command line interface.
+
+Batch mode: python cli.py [-q] script.txt   (or '-' to read commands from stdin)
+Wi-Fi mount: python cli.py udp://192.168.4.1 [...]
 """
 
-from astrocom.interface import MountCLI
-from astrocom.serialport import list_ports
+import sys
+from astrocom.interface import MountCLI, EXIT
+from astrocom.serialport import discover_mounts
+from astrocom.transport import UDP_PREFIX
 
 #%% PARAMETERS TO MODIFY
-productname = 'EQDIR Stick' # USB product name
 latitude = (43,36,15) # (sign*degree, arcmin, arcsec)
 longitude = (1,26,37) # (sign*degree, arcmin, arcsec) 
+horizon = None # file of 'azimuth altitude' lines (see astrocom.horizon), None for a flat horizon
+
+#%% FIND MOUNT and RUN COMMAND LINE INTERFACE
+args = sys.argv[1:]
+quiet = '-q' in args
+udp = [a for a in args if a.startswith(UDP_PREFIX)]
+scripts = [a for a in args if (a != '-q') and (a not in udp)]
 
-#%% FIND USB PORT and RUN COMMAND LINE INTERFACE
-port_found = False
+if len(udp)>0:
+	mounts = [{'port':udp[0], 'baudrate':None}]
+else:
+	mounts = discover_mounts()
 
-for pp in list_ports():
-	if pp.product==productname:
-		port_found = True
-		portname = pp.device
+if len(mounts)>0:
+	portname = mounts[0]['port']
+	if not quiet:
 		print('Initialize mount on %s'%portname)
-		mcmd = MountCLI(portname, longitude, latitude)
-		mcmd.cmdloop()
-		
-if not port_found:
-	print('Did not find any port matching <%s>'%productname)
+	mcmd = MountCLI(portname, longitude, latitude, quiet=quiet, horizon=horizon, baudrate=mounts[0]['baudrate'])
+	if (mcmd.mount_serial.baudrate is not None) and not quiet:
+		print('Link at %u bauds'%mcmd.mount_serial.baudrate)
+	if mcmd.warm and not quiet:
+		print('Warm start: mount already initialized and synced')
+	if len(scripts)>0:
+		sys.exit(mcmd.run_script(scripts[0]))
+	mcmd.cmdloop()
+else:
+	print('Did not find any mount on the serial ports')
+	sys.exit(EXIT.SCRIPT_ERROR)
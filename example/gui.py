@@ -3,22 +3,19 @@ Run a GUI (work in progress)
 """
 
 from astrocom.interface import MountGUI
-from astrocom.serialport import list_ports
+from astrocom.serialport import discover_mounts
 
 #%% PARAMETERS TO MODIFY
-productname = 'EQDIR Stick' # USB product name
 latitude = (43,36,15) # (sign*degree, arcmin, arcsec)
 longitude = (1,26,37) # (sign*degree, arcmin, arcsec) 
+horizon = None # file of 'azimuth altitude' lines (see astrocom.horizon), None for a flat horizon
 
-#%% FIND USB PORT and RUN COMMAND LINE INTERFACE
-port_found = False
+#%% FIND MOUNT and RUN GRAPHICAL INTERFACE
+mounts = discover_mounts()
 
-for pp in list_ports():
-	if pp.product==productname:
-		port_found = True
-		portname = pp.device
-		print('Initialize mount on %s'%portname)
-		gui = MountGUI(portname, longitude, latitude)
-		
-if not port_found:
-	print('Did not find any port matching <%s>'%productname)
+if len(mounts)>0:
+	portname = mounts[0]['port']
+	print('Initialize mount on %s'%portname)
+	gui = MountGUI(portname, longitude, latitude, horizon=horizon)
+else:
+	print('Did not find any mount on the serial ports')
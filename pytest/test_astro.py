@@ -1,8 +1,14 @@
 
+import sys
+import time
+import datetime
+import subprocess
 import pytest
 import numpy as np
 from astrocom.astro import dms_to_degree, degree_to_dms, hms_to_degree, degree_to_hms
-from astrocom.astro import MountPosition, RaDec
+from astrocom.astro import MountPosition, RaDec, SIDERAL_DAY_SEC, SideralTime, sideral_time
+from astrocom.clock import FixedClock, SimulationClock
+from astrocom.accuracy import run_accuracy
 
 
 def test_degree_to_dms():
@@ -28,13 +34,53 @@ def test_radec():
 
 def test_conversion():
     """Test MountPosition conversion radec to telescope"""
-    mp = MountPosition(5.2,45.2)
-    for ra in range(1, 360, 30): # 1 to avoid time issue in 0
+    mp = MountPosition(5.2, 45.2, clock=FixedClock(datetime.datetime(2025, 3, 20, 21, 0, 0)))
+    epoch = mp.snapshot()
+    for ra in range(0, 360, 30):
         for dec in range(-20, 90, 20):
-            tel_pos = mp.radec_to_telescope(RaDec(ra, dec))
-            radec = mp.telescope_to_radec(tel_pos)
+            tel_pos = mp.radec_to_telescope(RaDec(ra, dec), epoch=epoch)
+            radec = mp.telescope_to_radec(tel_pos, epoch=epoch)
             assert radec.ra_degree == pytest.approx(ra, abs=0.015)
             assert radec.dec_degree == pytest.approx(dec, abs=0.015)
-            
-    
-    
+
+
+def test_clock_epoch():
+    """Test that a fixed clock gives reproducible conversions and a shared epoch"""
+    clock = FixedClock(datetime.datetime(2025, 3, 20, 21, 0, 0))
+    mp = MountPosition(5.2, 45.2, clock=clock)
+    epoch = mp.snapshot()
+    tel_pos = mp.radec_to_telescope(RaDec(100, 30), epoch=epoch)
+    assert mp.radec_to_telescope(RaDec(100, 30)) == tel_pos
+    clock.advance(SIDERAL_DAY_SEC/24)
+    assert mp.radec_to_telescope(RaDec(100, 30))[0] == pytest.approx(tel_pos[0] + 1/24, abs=1e-4)
+    sim = SimulationClock(start=clock.utc, speed=1000)
+    time.sleep(0.01)
+    assert (sim.utcnow() - clock.utc).total_seconds() >= 10
+
+
+def test_sideral_time_datetime():
+    """Test that a datetime argument is not mistaken for a clock"""
+    utc = datetime.datetime(2025, 1, 1, 18, 0, 0)
+    assert sideral_time(0.0, utc=utc).degree == pytest.approx(sideral_time(0.0, utc=FixedClock(utc)).degree)
+    assert sideral_time(0.0, utc=utc).degree == pytest.approx(11.64, abs=0.01)
+
+
+def test_sideral_time_light():
+    """Test the sideral time type against astropy Longitude, and that astropy is imported lazily"""
+    from astropy.coordinates import Longitude
+    degree = np.array([-0.004, 0.0, 11.64, 183.7, 359.9999, 725.3])
+    st, ref = SideralTime(degree), Longitude(degree, unit='deg')
+    assert np.allclose(st.degree, ref.degree)
+    assert np.allclose(st.hms, ref.hms)
+    code = "import sys, astrocom; print(any(m.startswith('astropy') for m in sys.modules))"
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True).stdout.strip() == 'False'
+
+
+def test_accuracy_harness():
+    """Test that every engine stays within its error bound against astropy"""
+    results = run_accuracy(sites=[(1.44, 43.6)], dates=[datetime.datetime(2025, 3, 20, 21, 0, 0)], nb_point=50, nb_scalar=5)
+    bounds = {'astropy':1e-3, 'eop':1.0, 'numpy':2.0, '-':8.0} # arcsec
+    for r in results:
+        assert r.max_error < bounds[r.engine]
+        assert r.rms_error <= r.max_error
+        assert r.rate > 0
@@ -0,0 +1,27 @@
+import pytest
+import numpy as np
+from astrocom.astro import read_bsc
+from astrocom.catalog import build_catalog_store, CatalogStore, BSC_FILE, BSC_FORMAT
+
+
+def test_store_from_bsc(tmp_path):
+    """Test that the store built by chunks matches read_bsc"""
+    store = build_catalog_store(BSC_FILE, str(tmp_path/'bsc'), chunk_size=100, **BSC_FORMAT)
+    bsc = read_bsc()
+    assert len(store) == len(bsc)
+    assert np.all(np.diff(store.column('vmag')) >= 0)
+    assert store[0].hr == bsc[0].hr
+    assert store[0].ra_degree == pytest.approx(bsc[0].ra_degree, abs=0.01)
+    assert store[0].dec_degree == pytest.approx(bsc[0].dec_degree, abs=0.01)
+    assert len(CatalogStore(str(tmp_path/'bsc'))) == len(bsc)
+
+
+def test_store_from_csv(tmp_path):
+    """Test a CSV catalog with coordinates in degrees"""
+    source = tmp_path/'cat.csv'
+    source.write_text('id,ra,dec,vmag\n1,10.5,-20.0,5.1\n2,200.0,45.0,2.3\n3,300.0,10.0,\n4,15.0,80.0,3.7\n')
+    store = build_catalog_store(str(source), str(tmp_path/'csv'), delimiter=',', skip_header=1,
+                                columns={'id':0, 'ra':1, 'dec':2, 'vmag':3}, chunk_size=2)
+    assert len(store) == 3 # star without magnitude is dropped
+    assert list(store.column('id')) == [2, 4, 1]
+    assert store.brighter_than(4.0) == 2
@@ -0,0 +1,27 @@
+import datetime
+import pytest
+import numpy as np
+from astrocom.astro import radec_to_altaz, sideral_time, use_eop_table
+from astrocom.eop import prepare_night
+
+
+def test_eop_table_accuracy(tmp_path):
+    """Test that interpolated conversions match astropy at the arcsecond level"""
+    start = datetime.datetime(2025, 1, 1, 18, 0, 0)
+    table = prepare_night(start, start + datetime.timedelta(hours=2), filename=str(tmp_path/'eop.npz'))
+    rng = np.random.default_rng(0)
+    ra = rng.uniform(0, 360, 50)
+    dec = rng.uniform(-30, 89, 50)
+    utc = [start + datetime.timedelta(seconds=float(s)) for s in rng.uniform(0, 7200, 50)]
+    alt_ref, az_ref = radec_to_altaz(ra, dec, 43.6, 1.4, utc=utc)
+    st_ref = sideral_time(1.4, utc=utc[0]).degree
+    use_eop_table(table)
+    try:
+        alt, az = radec_to_altaz(ra, dec, 43.6, 1.4, utc=utc)
+        st = sideral_time(1.4, utc=utc[0]).degree
+    finally:
+        use_eop_table(None)
+    assert np.max(np.abs(alt - alt_ref)) < 1/3600
+    assert np.max(np.abs((az - az_ref + 180) % 360 - 180)*np.cos(np.radians(alt))) < 1/3600
+    assert st == pytest.approx(st_ref, abs=0.1/3600)
+    assert not table.covers(start + datetime.timedelta(hours=3))
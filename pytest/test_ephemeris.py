@@ -0,0 +1,38 @@
+
+import os
+import datetime
+import numpy as np
+import pytest
+from astropy.coordinates import get_body, EarthLocation, AltAz
+from astropy.time import Time
+from astropy import units as u
+from astrocom.astro import MountPosition, radec_to_altaz
+from astrocom.clock import FixedClock
+from astrocom.ephemeris import fit_ephemeris, night_ephemeris, find_body
+
+
+def test_moon_ephemeris(tmp_path):
+    """Test the Chebyshev fit against astropy and the night cache"""
+    start = datetime.datetime(2025, 3, 20, 18, 0, 0)
+    ephem = fit_ephemeris('moon', start, start + datetime.timedelta(hours=8), 1.44, 43.6)
+    utc = np.datetime64(start, 'us') + np.arange(0, 8*3600, 1000)*np.timedelta64(1, 's')
+    ra, dec = ephem.radec(utc)
+    location = EarthLocation(lat=43.6*u.deg, lon=1.44*u.deg)
+    ref = get_body('moon', Time(utc), location).transform_to(AltAz(obstime=Time(utc), location=location))
+    alt, az = radec_to_altaz(ra, dec, 43.6, 1.44, utc=list(utc.astype(object)))
+    daz = ((az - ref.az.deg + 180) % 360 - 180)*np.cos(np.radians(alt))
+    assert np.max(np.hypot(daz, alt - ref.alt.deg)) < 1/3600 # aberration is applied once
+    clock = FixedClock(datetime.datetime(2025, 3, 20, 22, 0, 0))
+    mp = MountPosition(1.44, 43.6, clock=clock)
+    moon = find_body('Moon', mp, directory=str(tmp_path))
+    assert find_body('vega', mp) is None
+    tel = mp.radec_to_telescope(moon)
+    assert len(os.listdir(str(tmp_path))) == 1
+    cached = night_ephemeris('moon', 1.44, 43.6, utc=clock, directory=str(tmp_path))
+    assert cached.radec(np.datetime64(clock.utc, 'us'))[0] == pytest.approx(moon.ra_degree, abs=1e-6)
+    # RA and DEC of one epoch come from the same instant
+    clock.advance(3600)
+    epoch = mp.snapshot()
+    target = moon.at(epoch)
+    assert (target.ra_degree, target.dec_degree) == pytest.approx(moon.radec_degree(epoch.utc), abs=1e-6)
+    assert mp.radec_to_telescope(moon, epoch=epoch) == mp.radec_to_telescope(target, epoch=epoch)
@@ -0,0 +1,65 @@
+
+import time
+import pytest
+from astrocom.serialport import MountSW
+from astrocom.simulator import SimulatedTransport
+from astrocom.guiding import SyntheticFrameSource, Guider, GuideCalibration, detect_stars, centroid, SIDERAL_RATE_ARCSEC
+
+
+class _FakeMount:
+    """Record rate commands"""
+    def __init__(self):
+        self.rates = [1.0, 0.0]
+        self.nb_command = 0
+
+    def set_track_rate(self, axis, rate):
+        self.rates[axis-1] = rate
+        self.nb_command += 1
+
+
+def test_centroid_subpixel():
+    """Test star detection and sub-pixel centroid on a synthetic frame"""
+    source = SyntheticFrameSource(noise=2.0)
+    frame = source.render(0.0)
+    stars = detect_stars(frame)
+    assert len(stars) == 2
+    cx, cy, _ = centroid(frame, stars[:,0], stars[:,1])
+    assert cx[0] == pytest.approx(source.stars[0,0], abs=0.05)
+    assert cy[0] == pytest.approx(source.stars[0,1], abs=0.05)
+
+
+def test_guiding_closed_loop():
+    """Test that rate corrections cancel a drift on synthetic frames"""
+    period = 0.5
+    source = SyntheticFrameSource(drift=(0.8, -0.4), period=period, nb_frame=60)
+    mount = _FakeMount()
+    guider = Guider(mount, calibration=GuideCalibration(scale=1.0))
+    def feedback(tstamp, error):
+        # the mount rates move the stars during the next period (1 arcsec = 1 pixel)
+        source.shift((mount.rates[0]-1)*SIDERAL_RATE_ARCSEC*period, mount.rates[1]*SIDERAL_RATE_ARCSEC*period)
+    report = guider.run(source, callback=feedback)
+    assert report['nb_frame'] == 59 # first frame locks the guide star
+    assert report['nb_lost'] == 0
+    assert max(abs(e) for e in guider.errors[-1]) < 1.0 # open loop drift would be 26 pixels
+    assert report['latency']['count'] == 59
+    assert mount.rates == [1.0, 0.0]
+
+
+def test_guiding_mount_commands():
+    """Test that a correction of a simulated mount costs one step period command per axis"""
+    transport = SimulatedTransport(baudrate=9600)
+    mount = MountSW(transport=transport)
+    mount.init_mount()
+    guider = Guider(mount, calibration=GuideCalibration(scale=1.0))
+    guider._apply((1.2, 0.3)) # start tracking on both axes
+    nb_command = transport.nb_command
+    t0 = time.perf_counter()
+    guider._apply((1.1, 0.2))
+    assert transport.nb_command - nb_command == 2
+    assert time.perf_counter() - t0 < 0.06 # two round trips at 9600 bauds
+    assert mount.get_axis_status_as_dict(2)['FORWARD']
+    guider._apply((1.1, -0.2)) # reversal: stop, mode, step period, start
+    assert mount.get_axis_status_as_dict(2)['BACKWARD']
+    assert not mount.get_axis_status_as_dict(2)['STOP']
+    mount.stop(3)
+    mount.detach()
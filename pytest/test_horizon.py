@@ -0,0 +1,55 @@
+
+import datetime
+import numpy as np
+import pytest
+from astrocom import AstrocomError
+from astrocom.astro import read_bsc, catalog_brightest, radec_to_altaz
+from astrocom.clock import FixedClock
+from astrocom.horizon import HorizonMask
+from astrocom.interface import MountCLI, EXIT
+from astrocom.record import SessionRecorder, ReplayTransport
+
+UTC = datetime.datetime(2025, 1, 15, 21, 0, 0)
+LATITUDE = (43,36,15)
+LONGITUDE = (1,26,37)
+
+
+def test_limit():
+    """Test interpolation of the table, wrapped around North"""
+    mask = HorizonMask([350, 10, 180], [20, 40, 0], alt_min=5)
+    assert mask.limit(0) == pytest.approx(30)
+    assert mask.limit(360) == pytest.approx(30)
+    assert mask.limit(180) == pytest.approx(5) # never below alt_min
+    assert np.array_equal(mask.visible([35, 35], [0, 10]), [True, False])
+    assert HorizonMask.flat(10).limit(np.arange(0, 360, 30)).tolist() == [10]*12
+
+
+def test_load(tmp_path):
+    """Test reading and writing a horizon file"""
+    filename = str(tmp_path/'horizon.txt')
+    with open(filename, 'w') as myfile:
+        myfile.write('# azimuth altitude\n0 15\n90 30\n180 10\n270 25\n')
+    mask = HorizonMask.load(filename)
+    assert mask.limit(45) == pytest.approx(22.5)
+    mask.save(filename)
+    assert HorizonMask.load(filename).limit(270) == pytest.approx(25)
+    with pytest.raises(AstrocomError):
+        HorizonMask.load(str(tmp_path/'missing.txt'))
+
+
+def test_catalog_and_goto(tmp_path):
+    """Test that stars behind an obstruction are not listed, nor accepted by goto"""
+    catalog = read_bsc()
+    south = HorizonMask([0, 90, 91, 269, 270], [0, 0, 90, 90, 0]) # wall on the South
+    brightest = catalog_brightest(catalog, 10, LATITUDE, LONGITUDE, alt_min=0, utc=UTC, horizon=south)
+    assert len(brightest) == 10
+    ra = np.array([s.ra_degree for s in brightest])
+    dec = np.array([s.dec_degree for s in brightest])
+    _, az = radec_to_altaz(ra, dec, 43.6, 1.44, utc=UTC)
+    assert np.all((az <= 91) | (az >= 269))
+    hidden = [s for s in catalog_brightest(catalog, 10, LATITUDE, LONGITUDE, alt_min=0, utc=UTC) if s not in brightest]
+    assert len(hidden) > 0
+    filename = str(tmp_path/'session.rec')
+    SessionRecorder(filename).close()
+    cli = MountCLI(None, LONGITUDE, LATITUDE, clock=FixedClock(UTC), quiet=True, session_file=None, horizon=south, transport=ReplayTransport(filename, speed=None))
+    assert cli.run_batch(['goto hr%u'%hidden[0].hr]) == EXIT.COMMAND_ERROR
@@ -0,0 +1,29 @@
+import logging
+import astrocom
+from astrocom.interface import MountCLI, EXIT
+from astrocom.record import SessionRecorder, ReplayTransport, DIR_OUT, DIR_IN
+
+
+def test_batch_exit_codes(tmp_path):
+    """Test batch mode directives and exit codes"""
+    filename = str(tmp_path/'session.rec')
+    recorder = SessionRecorder(filename)
+    for axis in [b'1', b'2']:
+        recorder.record(DIR_OUT, b':f' + axis + b'\r')
+        recorder.record(DIR_IN, b'=101\r') # stopped
+    recorder.close()
+    cli = MountCLI(None, (1,26,37), (43,36,15), quiet=True, transport=ReplayTransport(filename, speed=None))
+    assert len(cli.catalog) > 0
+    assert cli.run_batch(['# comment', '', 'wait 1', 'sleep 0']) == EXIT.OK
+    assert cli.run_batch(['sleep 0', 'unknown_command', 'sleep 0']) == EXIT.UNKNOWN_COMMAND
+    assert cli.run_batch(['sleep abc']) == EXIT.COMMAND_ERROR
+    assert cli.run_batch(['query vmag<2 sp=K 3']) == EXIT.OK
+    assert cli.run_batch(['query color=red']) == EXIT.COMMAND_ERROR
+    assert cli.run_script(str(tmp_path/'missing.txt')) == EXIT.SCRIPT_ERROR
+    # same checks as in the interactive loop, without the batch wrapper
+    for line in ['wait abc', 'sleep', 'ra', 'dec x', 'start a', 'stop 1.5', 'bsc many', 'goto 1-2-3-4 5', 'set 1:-:2 3']:
+        cli.onecmd(line)
+        assert cli.exit_code == EXIT.COMMAND_ERROR
+        cli.exit_code = EXIT.OK
+    assert astrocom._ch.level == logging.WARNING # quiet
+    astrocom.set_console_level(logging.DEBUG)
@@ -0,0 +1,42 @@
+import datetime
+import pytest
+import numpy as np
+from astrocom import AstrocomError
+from astrocom.astro import radec_to_altaz, sideral_time, use_backend
+from astrocom.accuracy import angular_distance_arcsec
+from astrocom.kernel import AltAzKernel, refraction_deg
+
+
+def test_kernel_accuracy():
+    """Test that the NumPy kernel matches astropy at the arcsecond level, for arrays of stars and times"""
+    start = datetime.datetime(2025, 3, 1, 20, 0, 0)
+    rng = np.random.default_rng(1)
+    ra = rng.uniform(0, 360, 50)
+    dec = rng.uniform(-60, 89, 50)
+    utc = [start + datetime.timedelta(seconds=float(s)) for s in rng.uniform(0, 6*3600, 50)]
+    alt_ref, az_ref = radec_to_altaz(ra, dec, 43.6, 1.4, utc=utc)
+    st_ref = sideral_time(1.4, utc=start).degree
+    previous = use_backend('numpy')
+    try:
+        alt, az = radec_to_altaz(ra, dec, 43.6, 1.4, utc=utc)
+        st = sideral_time(1.4, utc=start).degree
+        grid_alt, _ = radec_to_altaz(ra[:,None], dec[:,None], 43.6, 1.4, utc=utc[:3])
+    finally:
+        use_backend(previous)
+    assert np.max(angular_distance_arcsec(az, alt, az_ref, alt_ref)) < 2
+    assert st == pytest.approx(st_ref, abs=1/3600)
+    assert grid_alt.shape == (50, 3)
+    assert np.allclose(np.diag(grid_alt[:3]), alt[:3])
+    with pytest.raises(AstrocomError):
+        use_backend('fortran')
+
+
+def test_refraction():
+    """Test the refraction model and its use by the kernel"""
+    assert refraction_deg(0)*60 == pytest.approx(29.0, abs=0.5) # geometric altitude 0, apparent 0.5 degree
+    assert refraction_deg(45)*3600 == pytest.approx(61, abs=1)
+    assert refraction_deg(45, pressure_hpa=505)*3600 == pytest.approx(30.5, abs=0.5)
+    utc = datetime.datetime(2025, 3, 1, 20, 0, 0)
+    alt, _ = AltAzKernel().radec_to_altaz(88.8, 7.4, 43.6, 1.4, utc)
+    alt_refr, _ = AltAzKernel(refraction=True).radec_to_altaz(88.8, 7.4, 43.6, 1.4, utc)
+    assert alt_refr - alt == pytest.approx(refraction_deg(alt))
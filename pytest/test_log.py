@@ -0,0 +1,78 @@
+import io
+import json
+import time
+import logging
+import threading
+import astrocom
+from astrocom import logger, AstrocomError, add_json_sink, add_log_sink, remove_log_sink, flush_log, _CustomFormatter, COLORS
+
+
+class _SlowHandler(logging.Handler):
+    """Sink taking 50 ms per record, like a terminal over a slow link"""
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        time.sleep(0.05)
+        self.records.append(record)
+
+
+def test_json_sink():
+    """Test that records reach a JSON sink with their extra fields"""
+    stream = io.StringIO()
+    handler = add_json_sink(stream, level=logging.INFO)
+    try:
+        logger.debug('not written')
+        logger.info('goto %s', 'Vega', extra={'axis':1, 'latency':0.012})
+        flush_log()
+    finally:
+        remove_log_sink(handler)
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(entries) == 1
+    assert entries[0]['message'] == 'goto Vega'
+    assert entries[0]['level'] == 'INFO'
+    assert (entries[0]['axis'], entries[0]['latency']) == (1, 0.012)
+
+
+def test_non_blocking():
+    """Test that a slow sink does not delay the caller"""
+    handler = add_log_sink(_SlowHandler())
+    try:
+        t0 = time.perf_counter()
+        for k in range(10):
+            AstrocomError('error %u'%k)
+        assert time.perf_counter() - t0 < 0.1
+        flush_log()
+        assert [r.getMessage() for r in handler.records] == ['error %u'%k for k in range(10)]
+    finally:
+        remove_log_sink(handler)
+
+
+
+def test_flush_threads():
+    """Test flushes from several threads, with the same listener thread"""
+    handler = add_log_sink(_SlowHandler())
+    thread = astrocom._listener._thread
+    def worker(k):
+        logger.debug('thread %u', k)
+        flush_log()
+    try:
+        workers = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        assert sorted(r.getMessage() for r in handler.records) == ['thread %u'%k for k in range(4)]
+    finally:
+        remove_log_sink(handler)
+    assert astrocom._listener._thread is thread
+
+
+def test_formatter():
+    """Test the colored formatter, including levels without a color"""
+    formatter = _CustomFormatter()
+    record = logging.makeLogRecord({'msg':'Motors stopped', 'levelno':logging.INFO, 'levelname':'INFO'})
+    assert formatter.format(record) == COLORS.GREEN + 'INFO - Motors stopped' + COLORS.RESET
+    record = logging.makeLogRecord({'msg':'custom', 'levelno':25, 'levelname':'NOTICE'})
+    assert formatter.format(record) == 'NOTICE - custom'
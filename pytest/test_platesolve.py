@@ -0,0 +1,108 @@
+
+import time
+import numpy as np
+import pytest
+from astrocom import AstrocomError
+from astrocom.astro import read_bsc
+from astrocom.guiding import SyntheticFrameSource
+from astrocom import platesolve
+from astrocom.platesolve import build_plate_index, default_plate_index, catalog_id, find_neighbours, solve_field, solve_frame, to_tangent, _unit_vectors
+
+
+def _field(index, ra, dec, scale, angle, shape, flip=False, seed=0):
+    """Pixel positions of the catalog stars of a field, brightest first"""
+    rng = np.random.default_rng(seed)
+    center = _unit_vectors(ra, dec)
+    near = np.flatnonzero(index.xyz @ center > np.cos(np.radians(index.fov)))
+    near = near[np.argsort(index.vmag[near])]
+    xy = np.degrees(to_tangent(index.xyz[near], center))*3600/scale
+    if flip:
+        xy[:,1] = -xy[:,1]
+    rot = np.radians(angle)
+    xy = xy @ np.array([[np.cos(rot), -np.sin(rot)], [np.sin(rot), np.cos(rot)]]).T
+    xy += rng.normal(0, 0.3, xy.shape) + (shape[1]/2, shape[0]/2)
+    inside = (xy[:,0] > 0) & (xy[:,0] < shape[1]) & (xy[:,1] > 0) & (xy[:,1] < shape[0])
+    return xy[inside], near[inside]
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    return build_plate_index(read_bsc(), 20, str(tmp_path_factory.mktemp('plate')/'index.npz'))
+
+
+def test_solve_field(index):
+    """Test blind matching of a rotated and flipped field with a spurious star"""
+    shape = (960, 1280)
+    xy, _ = _field(index, 83.8, -1.0, 60.0, 30.0, shape, flip=True)
+    xy = np.vstack((xy[:2], [[100.0, 200.0]], xy[3:12]))
+    t0 = time.perf_counter()
+    solution = solve_field(xy, 65.0, index, center=(shape[1]/2, shape[0]/2))
+    assert time.perf_counter() - t0 < 1.0
+    assert solution.flip
+    assert solution.scale == pytest.approx(60.0, rel=0.01)
+    error = np.degrees(np.arccos(np.clip(_unit_vectors(solution.ra_deg, solution.dec_deg) @ _unit_vectors(83.8, -1.0), -1, 1)))
+    assert error < 0.02
+    with pytest.raises(AstrocomError):
+        solve_field(np.random.default_rng(1).uniform(0, 1000, (12, 2)), 65.0, index)
+
+
+def test_solve_frame(index):
+    """Test detection and matching on a rendered frame"""
+    shape = (480, 640)
+    xy, near = _field(index, 201.3, -11.2, 120.0, -70.0, shape, seed=2)
+    flux = 2e5*10**(-0.4*(index.vmag[near] - index.vmag[near].min()))
+    frame = SyntheticFrameSource(shape=shape, stars=np.column_stack((xy, flux)), noise=1.0).render(0.0)
+    solution = solve_frame(frame, 120.0, index)
+    assert solution.nb_match >= 5
+    assert solution.ra_deg == pytest.approx(201.3, abs=0.05)
+    assert solution.dec_deg == pytest.approx(-11.2, abs=0.05)
+
+
+def test_neighbours_and_catalog_id():
+    """Test the binned neighbour search against brute force, near the poles and RA 0"""
+    rng = np.random.default_rng(3)
+    ra, dec = rng.uniform(0, 360, 2000), np.degrees(np.arcsin(rng.uniform(-1, 1, 2000)))
+    ra[:20], dec[20:40] = rng.uniform(358, 360, 20), rng.uniform(87, 90, 20)
+    xyz = _unit_vectors(ra, dec)
+    for radius in (8.0, 20.0): # the whole catalog, growing prefixes
+        neighbours = find_neighbours(ra, dec, radius, 6, max_pairs=3000)
+        close = xyz @ xyz.T > np.cos(np.radians(radius))
+        np.fill_diagonal(close, False)
+        for i in range(len(ra)):
+            expected = np.flatnonzero(close[i])[:6]
+            assert list(neighbours[i][:len(expected)]) == list(expected)
+            assert np.all(neighbours[i][len(expected):] == -1)
+    bsc = read_bsc()
+    assert catalog_id(bsc) == catalog_id(list(bsc))
+    assert catalog_id(bsc) != catalog_id(bsc[:100])
+
+
+class _Columns:
+    """Columnar catalog of arrays, as a CatalogStore"""
+    def __init__(self, **columns):
+        self.columns = columns
+
+    def column(self, name):
+        return self.columns[name]
+
+
+def test_solve_small_field(tmp_path, monkeypatch):
+    """Test a 0.18° field: the BSC is rejected, a dense catalog is indexed at the real field of view"""
+    monkeypatch.setattr(platesolve, 'PLATE_INDEX_FILE', str(tmp_path/'plate_index_%s_%04uarcmin.npz'))
+    shape = (480, 640)
+    scale = 1.0
+    frame = np.zeros(shape)
+    with pytest.raises(AstrocomError):
+        solve_frame(frame, scale)
+    rng = np.random.default_rng(4)
+    nb = 4000
+    dec = 20.0 + rng.uniform(-0.5, 0.5, nb)
+    ra = 150.0 + rng.uniform(-0.5, 0.5, nb)/np.cos(np.radians(dec))
+    index = default_plate_index(max(shape)*scale/3600, catalog=_Columns(ra=ra, dec=dec, vmag=rng.uniform(9, 15, nb)))
+    assert index.fov == pytest.approx(640/3600)
+    xy, near = _field(index, 150.02, 19.98, scale, 25.0, shape, seed=5)
+    flux = 2e5*10**(-0.4*(index.vmag[near] - index.vmag[near].min()))
+    frame = SyntheticFrameSource(shape=shape, stars=np.column_stack((xy, flux)), noise=1.0).render(0.0)
+    solution = solve_frame(frame, scale, index)
+    assert solution.ra_deg == pytest.approx(150.02, abs=2/3600)
+    assert solution.dec_deg == pytest.approx(19.98, abs=2/3600)
@@ -0,0 +1,67 @@
+
+import datetime
+import numpy as np
+import pytest
+from astrocom import AstrocomError
+from astrocom.astro import Epoch, read_bsc
+from astrocom.catalog import build_catalog_store, BSC_FILE, BSC_FORMAT
+from astrocom.query import CatalogIndex, Predicate, Magnitude, SpectralType, Constellation, Near, HourAngle, Altitude, Azimuth, query, select, parse_query
+
+
+@pytest.fixture(scope='module')
+def bsc():
+    return read_bsc()
+
+
+@pytest.fixture(scope='module')
+def epoch():
+    return Epoch(datetime.datetime(2025, 1, 15, 21, 0, 0), 1.44, 43.6)
+
+
+def test_catalog_predicates(bsc):
+    """Test the indexed predicates against a scan of the catalog"""
+    index = CatalogIndex(bsc)
+    stars = query(index, Magnitude(max=4) & SpectralType('K', 'M') & Constellation('Tau', 'ORI'))
+    expected = [s for s in bsc if (s.vmag <= 4) and (s.sptype[:1] in 'KM') and (s.constell[-3:] in ['Tau', 'Ori'])]
+    assert [s.hr for s in stars] == [s.hr for s in expected]
+    assert stars[0].name == 'Betelgeuse'
+    stars = query(index, Magnitude(2, 3) & ~Constellation('UMa') | Constellation('Cru'))
+    assert all(((2 <= s.vmag <= 3) and not s.constell.endswith('UMa')) or s.constell.endswith('Cru') for s in stars)
+    assert len(query(index, Near(83.8, -5.4, 5) & Magnitude(max=3))) == len([s for s in bsc if s.vmag <= 3 and np.hypot((s.ra_degree-83.8)*np.cos(np.radians(5.4)), s.dec_degree+5.4) < 5])
+    assert query(index, Constellation('Xyz')) == []
+    # index candidates come brightest first, selections are not sorted again
+    for predicate in [Constellation('Ori', 'Tau', 'Ori'), SpectralType('K') | Magnitude(max=2)]:
+        rows = predicate.rows(index)
+        assert np.all(np.diff(index.vmag[rows]) >= 0)
+    with pytest.raises(TypeError):
+        type('NoMask', (Predicate,), {})()
+
+
+def test_sky_predicates(bsc, epoch):
+    """Test ALT-AZ and hour angle predicates, brightest first"""
+    index = CatalogIndex(bsc)
+    rows = select(index, Magnitude(max=5) & Altitude(min=30) & Azimuth(90, 180), epoch=epoch)
+    alt, az = epoch.radec_to_altaz(index.ra, index.dec)
+    expected = np.flatnonzero((index.vmag <= 5) & (alt >= 30) & (az >= 90) & (az <= 180))
+    assert sorted(rows) == sorted(expected)
+    assert np.all(np.diff(index.vmag[rows]) >= 0)
+    assert len(select(index, Altitude(min=30), epoch=epoch, limit=7)) == 7
+    rows = select(index, HourAngle(30), epoch=epoch)
+    ha = (epoch.sideral_time.degree - index.ra[rows] + 180) % 360 - 180
+    assert np.all(np.abs(ha) <= 30)
+    with pytest.raises(AstrocomError):
+        select(index, Altitude(min=30))
+
+
+def test_parse_query(tmp_path, bsc, epoch):
+    """Test the query words of the command line on a catalog store"""
+    store = build_catalog_store(BSC_FILE, str(tmp_path/'bsc'), **BSC_FORMAT)
+    predicate, limit = parse_query('vmag=0:3 sp=K con=Boo,Tau 5')
+    assert limit == 5
+    assert [s.hr for s in query(store, predicate)] == [s.hr for s in query(bsc, predicate)]
+    assert len(query(store, predicate)) > 0
+    predicate, limit = parse_query('alt>20 ha<40')
+    assert len(query(store, predicate, epoch=epoch, limit=limit)) == limit
+    for words in ['vmag<abc', 'color=red', 'visible']:
+        with pytest.raises(AstrocomError):
+            parse_query(words)
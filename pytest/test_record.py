@@ -0,0 +1,38 @@
+import time
+import pytest
+from astrocom.record import SessionRecorder, ReplayTransport, read_session, DIR_OUT, DIR_IN
+from astrocom.serialport import MountSW
+
+
+def test_record_and_replay(tmp_path):
+    """Test that a recorded session is replayed into MountSW"""
+    filename = str(tmp_path/'session.rec')
+    recorder = SessionRecorder(filename)
+    recorder.record(DIR_OUT, b':j1\r')
+    recorder.record(DIR_IN, b'=000080\r')
+    recorder.record(DIR_OUT, b':j2\r')
+    recorder.record(DIR_IN, b'=000040\r')
+    recorder.close()
+    _, frames = read_session(filename)
+    assert [f[0] for f in frames] == [DIR_OUT, DIR_IN, DIR_OUT, DIR_IN]
+    transport = ReplayTransport(filename, speed=None)
+    mount = MountSW(transport=transport)
+    ra, dec = mount.get_position()
+    assert ra == pytest.approx(0, abs=1e-6)
+    assert dec == pytest.approx(-0.5, abs=1e-6)
+    assert transport.mismatch == 0
+    assert transport.finished
+
+
+def test_replay_read_blocks(tmp_path):
+    """Test that a read without recorded answer waits for the timeout instead of spinning"""
+    filename = str(tmp_path/'session.rec')
+    recorder = SessionRecorder(filename)
+    recorder.record(DIR_OUT, b':j1\r')
+    recorder.record(DIR_OUT, b':j2\r')
+    recorder.close()
+    transport = ReplayTransport(filename, speed=None, timeout=0.05)
+    transport.write(b':j1\r')
+    t0 = time.monotonic()
+    assert transport.read() == b''
+    assert time.monotonic() - t0 >= 0.04
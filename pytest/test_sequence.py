@@ -0,0 +1,55 @@
+import datetime
+import pytest
+import numpy as np
+from astrocom.astro import MountPosition, RaDec
+from astrocom.clock import FixedClock
+from astrocom.sequence import slew_cost_matrix, plan_sequence, run_sequence, SequencePlan, _Route
+from astrocom.serialport import MountSW
+from astrocom.simulator import SimulatedTransport
+
+
+def test_cost_matrix():
+    """Test the RA half-turn wrap of the slew cost"""
+    cost = slew_cost_matrix([10, 350, 100], [0, 0, 60], rates=(2, 1))
+    assert cost[0,1] == pytest.approx(10) # 20 degrees through RA=0
+    assert cost[0,2] == pytest.approx(60) # DEC axis is the slowest
+    assert np.allclose(cost, cost.T)
+
+
+def test_plan_sequence():
+    """Test that planning removes back and forth slews"""
+    mp = MountPosition(0.0, 45.0)
+    utc = datetime.datetime(2025, 1, 1, 22, 0, 0)
+    targets = [RaDec(ra, 60) for ra in [0, 90, 10, 80, 20, 70]] + [RaDec(0, -80)]
+    plan = plan_sequence(targets, mp, start=RaDec(0, 60), utc=utc, alt_min=10)
+    assert len(plan) == 6
+    assert len(plan.skipped) == 1 # never above horizon
+    ra = [t.ra_degree for t in plan.targets]
+    assert ra == sorted(ra) or ra == sorted(ra)[::-1]
+    assert plan.slew_time < slew_cost_matrix([0, 90], [60, 60])[0,1] + 1e-6
+
+
+def test_visible_during_dwell():
+    """Test that a target hidden in the middle of the dwell is observed later"""
+    visible = np.array([[True, True, False, True, True, True, True]])
+    route = _Route(np.zeros((2, 2)), np.array([3.0]), visible, step=1.0)
+    assert route._wait_visible(0, 0.0) == 3.0
+    assert route._wait_visible(0, 4.0) is None
+
+
+def test_run_sequence():
+    """Test that the mount is driven to each target of a plan"""
+    utc = datetime.datetime(2025, 1, 1, 22, 0, 0)
+    mp = MountPosition(0.0, 45.0, clock=FixedClock(utc))
+    targets = [RaDec(30, 60), RaDec(40, 50)]
+    mount = MountSW(transport=SimulatedTransport(speed=50))
+    mount.init_mount()
+    observed = []
+    def callback(target):
+        observed.append((mount.get_position(), mount.get_axis_status_as_dict(1)))
+    run_sequence(mount, mp, SequencePlan(targets, [utc, utc], 0.0, []), callback=callback, timeout=30)
+    for target, (position, status) in zip(targets, observed):
+        assert position == pytest.approx(mp.radec_to_telescope(target), abs=1e-3)
+        assert status['TRACK'] and not status['STOP']
+    assert len(observed) == 2
+    mount.detach()
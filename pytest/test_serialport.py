@@ -0,0 +1,253 @@
+import threading
+import pytest
+import numpy as np
+from astrocom import serialport
+from astrocom.astro import SIDERAL_DAY_SEC
+from astrocom.serialport import hexa_response_to_int, int_to_hexa_cmd, discover_mounts
+from astrocom.serialport import predict_slew_time, goto_rate, SlewProfile
+from astrocom.stats import Stats
+from astrocom.simulator import SimulatedTransport
+
+
+def test_hexa_codec():
+    """Test hexadecimal command encoding and response decoding"""
+    for value in [0, 1, 255, 0x123456, 0xFFFFFF]:
+        assert hexa_response_to_int(int_to_hexa_cmd(value)) == value
+
+
+def test_discover_no_mount(tmp_path, monkeypatch):
+    """Test discovery on ports that cannot be opened"""
+    monkeypatch.setattr(serialport, 'LAST_PORT_FILE', str(tmp_path/'last_port.json'))
+    serialport.save_last_port({'port':'/dev/astrocom_none', 'baudrate':9600})
+    assert discover_mounts(ports=['/dev/astrocom_none', '/dev/astrocom_void']) == []
+
+
+def test_discover_cached_port(tmp_path, monkeypatch):
+    """Test that the cached port is confirmed with a single version query"""
+    written = []
+    class _FakeSerial:
+        def __init__(self, port, baudrate, **kwargs):
+            self.answer = b''
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            pass
+        def reset_input_buffer(self):
+            pass
+        def write(self, data):
+            written.append(data)
+            self.answer = b'=0304A3\r'
+        def read_until(self, expected):
+            answer, self.answer = self.answer, b''
+            return answer
+    monkeypatch.setattr(serialport, 'Serial', _FakeSerial)
+    monkeypatch.setattr(serialport, 'LAST_PORT_FILE', str(tmp_path/'last_port.json'))
+    serialport.save_last_port({'port':'/dev/astrocom_mount', 'baudrate':115200, 'version':0xA30403, 'cpr':2})
+    assert discover_mounts(ports=['/dev/astrocom_mount'])[0]['baudrate'] == 115200
+    assert written == [b':e1\r']
+    serialport.save_last_port({'port':'/dev/astrocom_mount', 'baudrate':115200, 'version':1, 'cpr':2})
+    assert serialport.confirm_port(serialport.load_last_port()) is None
+
+
+def test_negotiate_baudrate(monkeypatch):
+    """Test that baudrates are tried fastest first until the handshake succeeds"""
+    tried = []
+    def probe(portname, baudrate=9600, timeout=0.2):
+        tried.append(baudrate)
+        return {'port':portname, 'baudrate':baudrate, 'version':1, 'cpr':2} if baudrate <= 19200 else None
+    monkeypatch.setattr(serialport, 'probe_port', probe)
+    assert serialport.negotiate_baudrate('/dev/astrocom_none') == 19200
+    assert tried == [115200, 38400, 19200]
+    with pytest.raises(serialport.AstrocomError):
+        serialport.negotiate_baudrate('/dev/astrocom_none', baudrates=[115200, 57600])
+
+
+def test_stats_histogram():
+    """Test latency histogram and counters"""
+    stats = Stats()
+    for t in [0.001, 0.002, 0.003, 0.1]:
+        stats.add_latency('cmd.GET_CPR', t)
+    stats.increment('retry')
+    stats.increment('retry')
+    snap = stats.snapshot()
+    assert snap['latency']['cmd.GET_CPR']['count'] == 4
+    assert snap['latency']['cmd.GET_CPR']['max'] == pytest.approx(0.1)
+    assert snap['latency']['cmd.GET_CPR']['p50'] <= 0.00256
+    assert snap['counters']['retry'] == 2
+    stats.enabled = False
+    stats.increment('retry')
+    assert stats.counters['retry'] == 2
+
+
+def test_stats_threads_and_bytes():
+    """Test counters incremented from several threads and the byte counters per command"""
+    stats = Stats()
+    def work():
+        for _ in range(10000):
+            stats.increment('n')
+            stats.add_latency('t', 1e-3)
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stats.counters['n'] == 40000
+    assert stats.latency['t'].count == 40000
+    serialport.STATS.reset()
+    mount = serialport.MountSW(transport=SimulatedTransport())
+    mount.get_cpr(1)
+    counters = serialport.STATS.snapshot()['counters']
+    assert counters['bytes_out.GET_CPR'] == 4
+    assert counters['bytes_in.GET_CPR'] == 8
+    mount.detach()
+
+
+def test_predict_slew_time():
+    """Test slew time prediction with half-turn wrap and acceleration"""
+    rates = (2.0, 1.0)
+    # constant rate: 0.4 -> -0.4 is a 0.2 turn move through 0.5
+    assert predict_slew_time((0.4, 0), (-0.4, 0), rates) == pytest.approx(360*0.2/2)
+    assert predict_slew_time((0, 0), (0, 0), rates, SlewProfile()) == 0
+    # trapezoid: 2 s ramp at 1 deg/s^2 costs 2 s more than constant rate
+    profile = SlewProfile(acceleration=1.0, settle=0.5)
+    assert predict_slew_time((0, 0), (0.1, 0), rates, profile) == pytest.approx(36/2 + 2 + 0.5)
+    # short move never reaches full rate
+    assert predict_slew_time((0, 0), (1/360, 0), rates, profile) == pytest.approx(2 + 0.5)
+    # vectorized over targets
+    times = predict_slew_time((0, 0), (np.linspace(0, 0.4, 5), np.zeros(5)), rates)
+    assert np.all(np.diff(times) > 0)
+    assert goto_rate(9024000, 64935, 16) == pytest.approx(800*360/SIDERAL_DAY_SEC, rel=0.05) # step period rounding
+
+
+class _FlakyTransport:
+    """Simulated transport whose link breaks after some commands"""
+    def __init__(self, simulator, nb_ok):
+        self.simulator = simulator
+        self.nb_ok = nb_ok
+        self.timeout = simulator.timeout
+
+    def write(self, data):
+        if self.nb_ok <= 0:
+            raise OSError('link lost')
+        self.nb_ok -= 1
+        return self.simulator.write(data)
+
+    def read(self, size=1):
+        return self.simulator.read(size)
+
+    def reset_input_buffer(self):
+        self.simulator.reset_input_buffer()
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_reconnect_backoff():
+    """Test reconnection with backoff after an I/O error, without reinitialization"""
+    from astrocom.serialport import MountSW
+    from astrocom.simulator import SimulatedTransport
+    simulator = SimulatedTransport()
+    attempts = []
+    def factory():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError('port busy')
+        return _FlakyTransport(simulator, 100)
+    mount = MountSW(transport=_FlakyTransport(simulator, 4), transport_factory=factory)
+    mount.init_mount()
+    mount.set_position(0.1, 0.2)
+    assert mount.get_position() == pytest.approx((0.1, 0.2), abs=1e-6)
+    assert len(attempts) == 3
+    assert mount.nb_reconnect == 1
+    mount.detach()
+
+
+
+def test_delete_without_reconnect():
+    """Test that deleting a mount after a cable loss does not wait for a reconnection"""
+    from astrocom.serialport import MountSW
+    from astrocom.simulator import SimulatedTransport
+    attempts = []
+    def factory():
+        attempts.append(1)
+        raise OSError('cable lost')
+    mount = MountSW(transport=_FlakyTransport(SimulatedTransport(), 0), transport_factory=factory)
+    mount.__del__()
+    assert attempts == []
+
+
+def test_warm_start(tmp_path):
+    """Test saving a session and reattaching a new process to a powered mount"""
+    from astrocom.serialport import MountSW, save_session, load_session
+    from astrocom.simulator import SimulatedTransport
+    filename = str(tmp_path/'session.json')
+    simulator = SimulatedTransport(speed=10)
+    mount = MountSW(transport=simulator)
+    mount.portname = 'COM1'
+    mount.init_mount()
+    mount.set_position(0.1, 0.2)
+    mount.track()
+    save_session(mount.session_state(site=(1.44, 43.6)), filename)
+    mount.detach()
+    assert load_session(filename, portname='COM2') is None
+    session = load_session(filename, portname='COM1')
+    assert session['tracking'] and session['site'] == [1.44, 43.6]
+    # the motors kept tracking: warm start without static parameter queries
+    mount = MountSW(transport=simulator)
+    nb_command = simulator.nb_command
+    assert mount.warm_start(session)
+    assert simulator.nb_command - nb_command == 4 # two status and two position reads
+    assert mount.goto_rates()[0] > 0
+    assert simulator.nb_command - nb_command == 4
+    # stopped motors: tracking is resumed
+    mount.stop_motion(3)
+    session = mount.session_state()
+    session['tracking'] = True
+    assert mount.warm_start(session)
+    assert mount.is_moving()
+    mount.detach()
+    # power cycled mount: cold start needed
+    assert not MountSW(transport=SimulatedTransport()).warm_start(session)
+
+
+def test_retry_noisy_link():
+    """Test adaptive timeouts and resync on lost, late and corrupted answers"""
+    from astrocom.serialport import MountSW, RetryPolicy
+    from astrocom.simulator import SimulatedTransport, NoisyTransport
+    noisy = NoisyTransport(SimulatedTransport(), lost=0.05, late=0.05, corrupt=0.05, timeout=0.05, seed=2)
+    mount = MountSW(transport=noisy, retry_policy=RetryPolicy(min_count=5, max_timeout=0.05, retry=5))
+    mount.init_mount()
+    mount.set_position(0.25, -0.1)
+    for _ in range(60):
+        assert mount.get_position() == pytest.approx((0.25, -0.1), abs=1e-6)
+    stats = mount.retry_stats()
+    assert noisy.nb_degraded > 0
+    assert stats['counters']['retry'] > 0
+    assert stats['counters']['resync'] > 0
+    assert stats['commands']['GET_AXIS_POSITION']['timeout'] < 0.05
+    mount.detach()
+
+
+def test_retry_non_idempotent():
+    """Test that a start command whose answer is lost is checked, not sent twice"""
+    from astrocom.serialport import MountSW, RetryPolicy
+    from astrocom.simulator import SimulatedTransport
+    class _LostStartAnswer(SimulatedTransport):
+        nb_start = 0
+        def write(self, data):
+            ans = super().write(data)
+            if data.startswith(b':J'):
+                self.nb_start += 1
+                self._buffer = bytearray()
+            return ans
+    simulator = _LostStartAnswer()
+    mount = MountSW(transport=simulator, retry_policy=RetryPolicy(max_timeout=0.02))
+    mount.init_mount()
+    mount.start_motion(1)
+    assert simulator.nb_start == 1
+    assert mount.retry_stats()['counters']['verified'] == 1
+    assert mount.is_moving()
+    mount.detach()
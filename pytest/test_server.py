@@ -0,0 +1,58 @@
+
+import threading
+import pytest
+from astrocom import AstrocomError
+from astrocom.serialport import MountSW
+from astrocom.simulator import SimulatedTransport
+from astrocom.server import MountServer, MountClient
+
+
+@pytest.fixture
+def server():
+    mount = MountSW(transport=SimulatedTransport(baudrate=9600, speed=100))
+    server = MountServer(mount, port=0, poll_period=0.1).start_in_thread()
+    yield server
+    server.stop()
+
+
+def test_server_clients(server):
+    """Test that several clients share the mount and get state events"""
+    clients = [MountClient(port=server.port) for _ in range(4)]
+    results = [None]*len(clients)
+    def read(k):
+        results[k] = [clients[k].get_state() for _ in range(5)]
+    threads = [threading.Thread(target=read, args=(k,)) for k in range(len(clients))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(len(r) == 5 for r in results)
+    assert len(results[0][0]['status']) == 2
+    assert server.nb_transaction + server.nb_coalesced == 20
+    assert server.nb_coalesced > 0
+    with pytest.raises(AstrocomError):
+        clients[0].call('unknown_command')
+    clients[1].subscribe()
+    assert clients[1].next_event()['event'] == 'state'
+    clients[0].init_mount()
+    clients[0].goto(0.4, -0.4)
+    clients[0].start(3)
+    for _ in range(20):
+        state = clients[1].next_event()['state']
+        if not state['status'][0]['STOP']:
+            break
+    assert not state['status'][0]['STOP']
+    for c in clients:
+        c.close()
+
+
+def test_server_unexpected_error(server):
+    """Test that an unexpected exception of the mount is answered as an error"""
+    def broken():
+        raise OSError('cable lost')
+    server.mount.get_goto = broken
+    client = MountClient(port=server.port)
+    with pytest.raises(AstrocomError):
+        client.call('get_goto')
+    assert len(client.call('get_position')) == 2
+    client.close()
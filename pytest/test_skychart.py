@@ -0,0 +1,58 @@
+
+import datetime
+import time
+import numpy as np
+import pytest
+from astrocom.astro import Epoch, read_bsc
+from astrocom.skychart import SkyChart, project, to_ppm, SKY_COLOR
+
+
+@pytest.fixture(scope='module')
+def epoch():
+    return Epoch(datetime.datetime(2025, 1, 15, 21, 0, 0), 2.35, 48.85)
+
+
+class _Columns:
+    """Minimal catalog exposing columns, like CatalogStore"""
+    def __init__(self, n, seed=0):
+        rng = np.random.default_rng(seed)
+        self.data = {'ra': rng.uniform(0, 360, n), 'dec': np.degrees(np.arcsin(rng.uniform(-1, 1, n))), 'vmag': rng.uniform(-1, 6.5, n)}
+
+    def column(self, name):
+        return self.data[name]
+
+
+def test_project():
+    """Test zenith at the center, North up and East left"""
+    assert np.allclose(project(90, 0, 400), (200, 200))
+    x, y = project(0, 0, 400)
+    assert x == pytest.approx(200) and y < 20
+    x, y = project(0, 90, 400)
+    assert x < 20 and y == pytest.approx(200)
+    with pytest.raises(ValueError):
+        project(0, 0, 400, 'mercator')
+
+
+def test_render(epoch):
+    """Test the image of the BSC and the brightness of a visible star"""
+    catalog = read_bsc()
+    chart = SkyChart(catalog)
+    image = chart.render(epoch)
+    assert image.shape == (chart.size, chart.size, 3) and image.dtype == np.uint8
+    star = min(catalog, key=lambda s: s.vmag) # Sirius, above the horizon in January evening
+    alt, az = epoch.radec_to_altaz(star.ra_degree, star.dec_degree)
+    assert alt > 0
+    x, y = chart.pixel(alt, az)
+    assert image[int(round(y)), int(round(x))].min() > 200
+    assert tuple(image[chart.size//2, 1]) != SKY_COLOR # ground
+    data = to_ppm(image)
+    assert data.startswith(b'P6 400 400 255\n') and len(data) == 15 + 400*400*3
+
+
+def test_render_speed(epoch):
+    """Test that a large catalog is rendered in a fraction of second"""
+    chart = SkyChart(_Columns(50000))
+    chart.render(epoch)
+    t0 = time.perf_counter()
+    chart.render(epoch)
+    assert time.perf_counter() - t0 < 0.5
@@ -0,0 +1,49 @@
+
+import datetime
+import numpy as np
+import pytest
+from astrocom.astro import MountPosition
+from astrocom.clock import FixedClock
+from astrocom.serialport import MountSW
+from astrocom.simulator import SimulatedTransport
+from astrocom.telemetry import TelemetryWriter, load_telemetry, list_chunks, flags_to_status, TELEMETRY_COLUMNS
+
+
+def test_telemetry_roundtrip(tmp_path):
+    """Test that telemetry chunks are rotated and loaded back as memory maps"""
+    clock = FixedClock(datetime.datetime(2025, 3, 20, 21, 0, 0))
+    mount = MountSW(transport=SimulatedTransport())
+    mount.init_mount()
+    mount.set_position(0.1, -0.2)
+    itemsize = np.dtype(TELEMETRY_COLUMNS).itemsize
+    writer = TelemetryWriter(str(tmp_path), mount_position=MountPosition(5.2, 45.2), chunk_bytes=4*itemsize)
+    for _ in range(10):
+        writer.sample(mount, clock=clock)
+        clock.advance(1)
+    writer.close()
+    assert writer.nb_sample == 10
+    assert len(list_chunks(str(tmp_path))) == 3
+    data = load_telemetry(str(tmp_path))
+    assert isinstance(data['time'], np.memmap)
+    assert len(data['time']) == 10
+    assert np.all(np.diff(data['time']) == np.timedelta64(1, 's'))
+    assert data['ra_position'] == pytest.approx(0.1, abs=1e-6)
+    assert np.all(flags_to_status(data['ra_status'], 'INIT'))
+    assert np.all(np.isfinite(data['dec_deg']))
+    mount.close()
+
+
+def test_telemetry_bad_sample(tmp_path):
+    """Test that a bad sample is rejected without stopping the writer thread"""
+    clock = FixedClock(datetime.datetime(2025, 3, 20, 21, 0, 0))
+    mount = MountSW(transport=SimulatedTransport())
+    mount.init_mount()
+    writer = TelemetryWriter(str(tmp_path), mount_position=MountPosition(5.2, 45.2))
+    writer.add({'unknown_column':1})
+    writer.add({'time':'yesterday'})
+    writer.sample(mount, clock=clock)
+    writer.close()
+    assert writer.rejected == 2
+    assert writer.nb_sample == 1
+    assert len(load_telemetry(str(tmp_path))['time']) == 1
+    mount.close()
@@ -0,0 +1,58 @@
+
+import datetime
+import numpy as np
+import pytest
+from astrocom.kernel import AltAzKernel
+from astrocom.serialport import MountSW
+from astrocom.simulator import SimulatedTransport, SIM_CPR, SIM_TIF, SIM_HIGH_SPEED_RATIO
+from astrocom.trajectory import Trajectory, TrajectoryExecutor, RateSegments, rate_to_command, altaz_to_hadec
+
+
+def test_rate_to_command():
+    """Test the vectorized conversion of rates to step periods and directions"""
+    rate = np.array([1/360, -1/360, 0.0])
+    step, backward, moving = rate_to_command(rate, SIM_CPR, SIM_TIF, SIM_HIGH_SPEED_RATIO, fast=False)
+    assert list(backward) == [False, True, False]
+    assert list(moving) == [True, True, False]
+    assert step[0] == step[1] == round(SIM_TIF/(SIM_CPR/360))
+    fast, _, _ = rate_to_command(rate, SIM_CPR, SIM_TIF, SIM_HIGH_SPEED_RATIO, fast=True)
+    assert fast[0] == round(SIM_TIF*SIM_HIGH_SPEED_RATIO/(SIM_CPR/360))
+
+
+def test_segments_speed_mode():
+    """Test that only the fast axis runs in FAST mode, with one mode per axis"""
+    t = np.linspace(0, 10, 11)
+    trajectory = Trajectory(t, np.column_stack((t/360, t/360/3600))) # 1 deg/s and 1 arcsec/s
+    static = [{'cpr':SIM_CPR, 'tif':SIM_TIF, 'high_speed_ratio':SIM_HIGH_SPEED_RATIO}]*2
+    segments = RateSegments(trajectory, static)
+    assert len(segments) == 10
+    assert list(segments.fast) == [True, False]
+    assert np.all(segments.step[:,0] == segments.step[0,0])
+
+
+def test_altaz_to_hadec():
+    """Test ALT-AZ to HA-DEC against the apparent coordinates of the NumPy kernel"""
+    kernel, utc = AltAzKernel(), datetime.datetime(2025, 3, 20, 21, 0, 0)
+    ra, dec = np.array([10.0, 100.0, 200.0]), np.array([60.0, 20.0, -10.0])
+    alt, az = kernel.radec_to_altaz(ra, dec, 43.6, 1.44, utc)
+    ra_app, dec_app = kernel.apparent_radec(ra, dec, utc)
+    ha, dec2 = altaz_to_hadec(alt, az, 43.6)
+    assert dec2 == pytest.approx(dec_app, abs=1e-8)
+    assert (kernel.sideral_time(1.44, utc) - ra_app - ha + 180) % 360 - 180 == pytest.approx(0, abs=1e-8)
+
+
+def test_trajectory_tracking():
+    """Test that a fast path is tracked on the simulator, on schedule and without skipped updates"""
+    t = np.linspace(0, 2, 21)
+    trajectory = Trajectory(t, np.column_stack((0.02 + t**2/1440, 0.01 + 0.5*np.sin(2*t)/360)))
+    mount = MountSW(transport=SimulatedTransport())
+    mount.init_mount()
+    executor = TrajectoryExecutor(mount, trajectory, period=0.1)
+    executor.goto_start()
+    report = executor.run()
+    assert report.nb_update == len(executor.segments) == 20
+    assert report.nb_skipped == 0
+    assert report.jitter.max < 0.02
+    assert report.error_max < 30
+    assert report.update_rate == pytest.approx(10, rel=0.1)
+    mount.detach()
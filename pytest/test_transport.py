@@ -0,0 +1,45 @@
+
+import socket
+import pytest
+from astrocom import AstrocomError
+from astrocom.serialport import MountSW
+from astrocom.transport import UdpTransport, open_transport
+from astrocom.simulator import SimulatedUdpMount
+
+
+def test_udp_transport():
+    """Test MountSW over UDP with lost and duplicated answers"""
+    server = SimulatedUdpMount().start()
+    mount = MountSW(server.url)
+    assert mount.get_cpr(1) == server.transport.axes[1].cpr
+    mount.init_mount()
+    mount.set_position(0.25, -0.1)
+    server.drop = 1
+    assert mount.get_position() == pytest.approx((0.25, -0.1), abs=1e-6)
+    assert mount.transport.nb_retransmit == 1
+    server.duplicate = True
+    for _ in range(3):
+        assert mount.get_position() == pytest.approx((0.25, -0.1), abs=1e-6)
+    assert mount.transport.nb_stale > 0
+    mount.close()
+    server.stop()
+
+
+def test_udp_tagged_answers():
+    """Test that late answers of another command are dropped and start is never sent twice"""
+    mount_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    mount_sock.bind(('127.0.0.1', 0))
+    transport = UdpTransport('127.0.0.1', port=mount_sock.getsockname()[1], timeout=0.3, retransmit=0.05)
+    transport.write(b':j1\r')
+    _, client = mount_sock.recvfrom(64)
+    mount_sock.sendto(b'=101\r', client) # late status answer of a previous request
+    mount_sock.sendto(b'=000080\r', client)
+    assert transport.read(64) == b'=000080\r'
+    assert transport.nb_stale == 1
+    transport.write(b':J1\r')
+    assert transport.read(64) == b''
+    assert transport.nb_retransmit == 0
+    transport.close()
+    mount_sock.close()
+    with pytest.raises(AstrocomError):
+        open_transport(None)
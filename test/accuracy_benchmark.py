@@ -0,0 +1,13 @@
+"""
+Compare the coordinate engines with astropy: max/RMS error and throughput
+"""
+
+import logging
+from astrocom import logger
+from astrocom.accuracy import run_accuracy, accuracy_report
+
+logger.setLevel(logging.INFO) # debug messages of conversions would dominate the timings
+
+#%% RUN
+results = run_accuracy()
+print(accuracy_report(results))
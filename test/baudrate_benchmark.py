@@ -0,0 +1,45 @@
+"""
+Measure the time per command at each supported baudrate.
+
+Without argument the wire time is emulated by the simulator;
+with a port name (python baudrate_benchmark.py /dev/ttyUSB0) the rates
+answering on the real mount are measured.
+"""
+
+import sys
+import time
+from astrocom.serialport import MountSW, SUPPORTED_BAUDRATES, probe_port
+from astrocom.simulator import SimulatedTransport
+
+NB_REPEAT = 20
+
+def measure(mount):
+	"""Mean time [ms] of one command, of a position read and of a goto definition"""
+	t0 = time.perf_counter()
+	for _ in range(NB_REPEAT):
+		mount.get_axis_status(1)
+	command = (time.perf_counter()-t0)/NB_REPEAT
+	t0 = time.perf_counter()
+	for _ in range(NB_REPEAT):
+		mount.get_position()
+	position = (time.perf_counter()-t0)/NB_REPEAT
+	t0 = time.perf_counter()
+	for _ in range(NB_REPEAT):
+		mount.goto(0.01, 0.01)
+	goto = (time.perf_counter()-t0)/NB_REPEAT
+	mount.stop_motion(3)
+	return 1000*command, 1000*position, 1000*goto
+
+#%% RUN
+print('%8s %12s %12s %12s'%('BAUDS', 'COMMAND[ms]', 'POSITION[ms]', 'GOTO[ms]'))
+for baudrate in SUPPORTED_BAUDRATES:
+	if len(sys.argv) > 1:
+		if probe_port(sys.argv[1], baudrate=baudrate) is None:
+			print('%8u %12s'%(baudrate, 'no answer'))
+			continue
+		mount = MountSW(sys.argv[1], baudrate=baudrate)
+	else:
+		mount = MountSW(transport=SimulatedTransport(baudrate=baudrate))
+	mount.init_mount()
+	print('%8u %12.2f %12.2f %12.2f'%((baudrate,) + measure(mount)))
+	mount.detach()
@@ -2,24 +2,18 @@
 Test connection to a mount
 """
 
-from astrocom.serialport import list_ports, MountSW
+from astrocom.serialport import discover_mounts, MountSW
 
-#%% PARAMETERS TO MODIFY
-productname = 'EQDIR Stick' # USB product name
+#%% FIND MOUNT and PRINT ITS PARAMETERS
+mounts = discover_mounts()
 
-#%% FIND USB PORT and RUN COMMAND LINE INTERFACE
-port_found = False
-
-for pp in list_ports():
-	if pp.product==productname:
-		port_found = True
-		portname = pp.device
-		print('Initialize mount on %s'%portname)
-		mount = MountSW(portname)
-		print('Motor version: %u'%mount.get_motor_board_version(1))
-		print('High speed ratio: %s'%mount.get_high_speed_ratio(1))
-		print('Speed: %.3f °/h'%(3600*mount.get_rotation_speed(1)))
-		print('Axis tele pos: %.2f'%mount.get_axis_telemetry_position(1))
+for info in mounts:
+	print('Initialize mount on %s (%u bauds)'%(info['port'], info['baudrate']))
+	mount = MountSW(info['port'], baudrate=info['baudrate'])
+	print('Motor version: %u'%mount.get_motor_board_version(1))
+	print('High speed ratio: %s'%mount.get_high_speed_ratio(1))
+	print('Speed: %.3f °/h'%(3600*mount.get_rotation_speed(1)))
+	print('Axis tele pos: %.2f'%mount.get_axis_telemetry_position(1))
 		
-if not port_found:
-	print('Did not find any port matching <%s>'%productname)
+if len(mounts)==0:
+	print('Did not find any mount on the serial ports')
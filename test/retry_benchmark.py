@@ -0,0 +1,36 @@
+"""
+Compare the fixed and adaptive answer timeouts on a noisy simulated link
+"""
+
+import time
+import numpy as np
+from astrocom.serialport import MountSW, RetryPolicy, TIMEOUT
+from astrocom.simulator import SimulatedTransport, NoisyTransport
+
+NB_READ = 300
+NOISE = {'lost':0.02, 'late':0.02, 'corrupt':0.02}
+
+POLICIES = {
+	'fixed':RetryPolicy(min_count=10**9), # TIMEOUT for every command, as before
+	'adaptive':RetryPolicy()}
+
+#%% READ POSITIONS THROUGH A NOISY LINK (9600 bauds wire time)
+for name, policy in POLICIES.items():
+	mount = MountSW(transport=NoisyTransport(SimulatedTransport(baudrate=9600), seed=1, **NOISE), retry_policy=policy)
+	mount.init_mount()
+	mount.set_position(0.25, -0.1)
+	latency = []
+	errors = 0
+	t0 = time.perf_counter()
+	for _ in range(NB_READ):
+		t1 = time.perf_counter()
+		ra, dec = mount.get_position()
+		latency.append(time.perf_counter() - t1)
+		errors += (abs(ra-0.25) > 1e-3) or (abs(dec+0.1) > 1e-3)
+	duration = time.perf_counter() - t0
+	lat = 1000*np.array(latency)
+	counters = mount.retry_stats()['counters']
+	print('%-8s %.0f reads/s, latency p50 %.1f ms, p99 %.1f ms, max %.0f ms, %u wrong reads, %s'%(
+		name, NB_READ/duration, np.percentile(lat, 50), np.percentile(lat, 99), lat.max(), errors, counters))
+	print('         position timeout %.1f ms (fixed %.0f ms)'%(1000*policy.timeout('j'), 1000*TIMEOUT))
+	mount.detach()
@@ -0,0 +1,44 @@
+"""
+Measure latency and throughput of the mount server against a simulated mount
+"""
+
+import time
+import threading
+import numpy as np
+from astrocom.serialport import MountSW
+from astrocom.simulator import SimulatedTransport
+from astrocom.server import MountServer, MountClient
+
+NB_CLIENT = [1, 2, 4, 8]
+NB_REQUEST = 50
+
+#%% START SERVER ON A SIMULATED MOUNT (9600 bauds wire time)
+mount = MountSW(transport=SimulatedTransport(baudrate=9600))
+server = MountServer(mount, port=0).start_in_thread()
+
+#%% RUN CLIENTS
+for nb_client in NB_CLIENT:
+	clients = [MountClient(port=server.port) for _ in range(nb_client)]
+	latency = [[] for _ in range(nb_client)]
+	def run(k):
+		for _ in range(NB_REQUEST):
+			t0 = time.perf_counter()
+			clients[k].get_position()
+			latency[k].append(time.perf_counter() - t0)
+	transaction = server.nb_transaction
+	threads = [threading.Thread(target=run, args=(k,)) for k in range(nb_client)]
+	t0 = time.perf_counter()
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	duration = time.perf_counter() - t0
+	lat = 1000*np.concatenate(latency)
+	print('%u clients: %.0f req/s, latency p50 %.1f ms, p95 %.1f ms, %u serial transactions for %u requests'%(
+		nb_client, len(lat)/duration, np.percentile(lat, 50), np.percentile(lat, 95),
+		server.nb_transaction-transaction, len(lat)))
+	for c in clients:
+		c.close()
+
+server.stop()
+mount.close()
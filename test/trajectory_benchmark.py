@@ -0,0 +1,35 @@
+"""
+Track a fast synthetic path on the simulator: update rate, timing jitter and
+tracking error, open and closed loop, at several baudrates.
+"""
+
+import logging
+import numpy as np
+from astrocom import logger
+from astrocom.serialport import MountSW
+from astrocom.simulator import SimulatedTransport
+from astrocom.trajectory import Trajectory, TrajectoryExecutor
+
+DURATION = 3.0 # second
+PERIOD = 0.1 # second
+
+logger.setLevel(logging.INFO) # one debug message per command would dominate the timings
+
+def satellite_like():
+	"""Axis 1 accelerating up to 1.5 deg/s, axis 2 reversing its direction (turn)"""
+	t = np.linspace(0, DURATION, 61)
+	return Trajectory(t, np.column_stack((0.02 + t**2/1440, 0.01 + 0.5*np.sin(t)/360)))
+
+#%% RUN
+print('%8s %8s %8s %10s %11s %8s %8s %8s'%('BAUDS', 'LOOP', 'RATE[Hz]', 'JITTER[ms]', 'LATENCY[ms]', 'SKIPPED', 'RMS["]', 'MAX["]'))
+for baudrate in [None, 115200, 9600]:
+	for closed_loop in [False, True]:
+		mount = MountSW(transport=SimulatedTransport(baudrate=baudrate))
+		mount.init_mount()
+		executor = TrajectoryExecutor(mount, satellite_like(), period=PERIOD, closed_loop=closed_loop)
+		executor.goto_start()
+		report = executor.run()
+		print('%8s %8s %8.1f %10.2f %11.2f %8u %8.1f %8.1f'%(baudrate, 'closed' if closed_loop else 'open',
+			report.update_rate, 1e3*report.jitter.percentile(99), 1e3*report.latency.percentile(50),
+			report.nb_skipped, report.error_rms, report.error_max))
+		mount.detach()